@@ -0,0 +1,88 @@
+"""
+Benchmark the extraction of imports from large modules.
+
+Compares walking every node of the syntax tree (as Layer Linter used to), visiting only
+statements, and the lexical scan that extract_imports tries first.
+
+Usage:
+    python benchmarks/extraction.py [FILENAME ...]
+
+If no filenames are supplied, some large modules are generated.
+"""
+from typing import Callable, List, Tuple
+import ast
+import sys
+import timeit
+
+from layer_linter.dependencies.extraction import (
+    RawImport, _extract_imports_with_ast, extract_imports)
+
+
+REPEAT = 5
+
+
+def extract_imports_with_ast_walk(source: bytes) -> List[RawImport]:
+    """
+    Find imports by walking every node in the syntax tree.
+    """
+    raw_imports: List[RawImport] = []
+    for node in ast.walk(ast.parse(source)):
+        if isinstance(node, ast.ImportFrom):
+            for alias in node.names:
+                raw_imports.append((node.level, node.module or '', alias.name))
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                raw_imports.append((0, alias.name, None))
+    return raw_imports
+
+
+EXTRACTORS: List[Tuple[str, Callable[[bytes], List[RawImport]]]] = [
+    ('ast.walk', extract_imports_with_ast_walk),
+    ('statement visitor', _extract_imports_with_ast),
+    ('extract_imports', extract_imports),
+]
+
+
+def generate_data_table_module(rows: int = 20000) -> bytes:
+    lines = ['import collections', 'from .base import Record', '', 'TABLE = [']
+    for row in range(rows):
+        lines.append("    Record({0}, 'name-{0}', {{'weight': {0}.5, 'tags': ['a', 'b']}}),"
+                     .format(row))
+    lines.append(']')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def generate_long_functions_module(functions: int = 500) -> bytes:
+    lines = ['import os', 'from . import helpers', '']
+    for function in range(functions):
+        lines.append('def function_{}(values):'.format(function))
+        lines.append('    from .lazy import loader')
+        for statement in range(20):
+            lines.append('    total = sum(x * {} for x in values if x % 3) + len('
+                         'str([v for v in values]))'.format(statement))
+        lines.append('    return total')
+        lines.append('')
+    return '\n'.join(lines).encode('utf-8')
+
+
+def benchmark(name: str, source: bytes) -> None:
+    print('{} ({:.1f} kB)'.format(name, len(source) / 1024))
+    expected_raw_imports = sorted(extract_imports_with_ast_walk(source))
+    for extractor_name, extractor in EXTRACTORS:
+        assert sorted(extractor(source)) == expected_raw_imports
+        duration = min(timeit.repeat(lambda: extractor(source), number=1, repeat=REPEAT))
+        print('    {:<20}{:>10.2f} ms'.format(extractor_name, duration * 1000))
+
+
+def main(filenames: List[str]) -> None:
+    if filenames:
+        for filename in filenames:
+            with open(filename, 'rb') as file:
+                benchmark(filename, file.read())
+    else:
+        benchmark('Data table module', generate_data_table_module())
+        benchmark('Long functions module', generate_long_functions_module())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,138 @@
+"""
+Benchmark the graph engine against networkx, on a generated import graph.
+
+Compares the time and memory taken to build each graph, and the time taken to find paths
+between random pairs of modules. Paths are found both in a graph with some cycles, and in a
+strictly layered graph without any, where most pairs can be ruled out without searching.
+
+Usage:
+    python benchmarks/graph.py [MODULE_COUNT]
+
+networkx must be installed to compare against it.
+"""
+from typing import Callable, List, Tuple
+import random
+import sys
+import time
+import tracemalloc
+
+from layer_linter.dependencies.engine import CompactGraphBuilder
+from layer_linter.module import Module
+
+try:
+    import networkx  # type: ignore
+except ImportError:
+    networkx = None
+
+
+IMPORTS_PER_MODULE = 8
+PAIR_COUNT = 2000
+
+
+def generate_import_graph(module_count: int, has_cycles: bool = True
+                          ) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Return module names, and imports between them as pairs of indexes.
+
+    Most imports are of modules shortly before the importer in the list, as in a layered
+    package. A small proportion are of any module, which if the graph has cycles may be the
+    other way round.
+    """
+    generator = random.Random(0)
+    names = ['package.sub{}.module{}'.format(index // 100, index) for index in range(module_count)]
+    imports = []
+    for importer in range(1, module_count):
+        for _ in range(IMPORTS_PER_MODULE):
+            if generator.random() < 0.02:
+                imported = generator.randrange(module_count if has_cycles else importer)
+            else:
+                imported = generator.randrange(max(0, importer - 2000), importer)
+            imports.append((importer, imported))
+    return names, imports
+
+
+def measure(description: str, function: Callable, measure_memory: bool = False) -> object:
+    """
+    Print the time taken to call the function, and optionally the memory taken up by its
+    result (measured in a separate call, as tracing memory slows everything down).
+    """
+    start = time.perf_counter()
+    result = function()
+    duration = time.perf_counter() - start
+    line = '    {:<30}{:>10.0f} ms'.format(description, duration * 1000)
+    if measure_memory:
+        del result
+        tracemalloc.start()
+        result = function()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        line += '{:>10.1f} MB'.format(memory / 1024 / 1024)
+    print(line)
+    return result
+
+
+def build_networkx_graph(names, imports):
+    graph = networkx.DiGraph()
+    for importer, imported in imports:
+        graph.add_edge(Module(names[importer]), Module(names[imported]))
+    return graph
+
+
+def build_compact_graph(names, imports):
+    ids_by_name = {name: index for index, name in enumerate(names)}
+    modules_by_id = [Module(name) for name in names]
+    builder = CompactGraphBuilder()
+    for importer, imported in imports:
+        builder.add_edge(ids_by_name[names[importer]], ids_by_name[names[imported]])
+    return ids_by_name, modules_by_id, builder.build(node_count=len(names))
+
+
+def find_networkx_paths(graph, names, pairs):
+    for downstream, upstream in pairs:
+        try:
+            networkx.shortest_path(graph, Module(names[downstream]), Module(names[upstream]))
+        except (networkx.NetworkXNoPath, networkx.NodeNotFound):
+            pass
+
+
+def find_compact_paths(compact, names, pairs):
+    ids_by_name, modules_by_id, graph = compact
+    for downstream, upstream in pairs:
+        path = graph.find_shortest_path(ids_by_name[names[downstream]],
+                                        ids_by_name[names[upstream]])
+        if path is not None:
+            [modules_by_id[module_id] for module_id in path]
+
+
+def main(module_count: int) -> None:
+    names, imports = generate_import_graph(module_count)
+    generator = random.Random(1)
+    pairs = [(generator.randrange(module_count), generator.randrange(module_count))
+             for _ in range(PAIR_COUNT)]
+    print('{} modules, {} imports, {} path searches'.format(
+        module_count, len(imports), len(pairs)))
+
+    print('Building:')
+    compact = measure('CompactGraph', lambda: build_compact_graph(names, imports),
+                      measure_memory=True)
+    if networkx:
+        networkx_graph = measure('networkx.DiGraph',
+                                 lambda: build_networkx_graph(names, imports),
+                                 measure_memory=True)
+
+    print('Finding paths:')
+    measure('CompactGraph', lambda: find_compact_paths(compact, names, pairs))
+    if networkx:
+        measure('networkx.DiGraph', lambda: find_networkx_paths(networkx_graph, names, pairs))
+
+    names, imports = generate_import_graph(module_count, has_cycles=False)
+    compact = build_compact_graph(names, imports)
+    print('Finding paths without cycles:')
+    measure('CompactGraph', lambda: find_compact_paths(compact, names, pairs))
+    if networkx:
+        networkx_graph = build_networkx_graph(names, imports)
+        measure('networkx.DiGraph', lambda: find_networkx_paths(networkx_graph, names, pairs))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 40000)
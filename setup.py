@@ -12,7 +12,6 @@ with open('HISTORY.rst') as history_file:
     history = history_file.read()
 
 requirements = [
-    'networkx~=2.2',
     'PyYAML~=4.2b1',
     'click>=6.7,<8',
 ]
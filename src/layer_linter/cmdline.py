@@ -1,4 +1,4 @@
-from typing import List
+from typing import Any, Dict, List, Optional, Tuple
 import argparse
 import os
 import sys
@@ -7,7 +7,9 @@ import importlib.util
 
 from .module import SafeFilenameModule
 from .dependencies import DependencyGraph
-from .contract import get_contracts, Contract, ContractParseError
+from .contract import (
+    contracts_from_yaml, exclude_patterns_from_yaml, read_contracts_file, Contract,
+    ContractParseError)
 from .report import (
     get_report_class, ConsolePrinter, VERBOSITY_QUIET, VERBOSITY_NORMAL, VERBOSITY_HIGH)
 
@@ -36,6 +38,89 @@ def create_parser():
 
     )
 
+    parser.add_argument(
+        '--cache-dir',
+        required=False,
+        dest='cache_dir',
+        help="A directory in which to cache information about the package, to speed up "
+             "subsequent runs. If not supplied, nothing is cached.",
+    )
+
+    parser.add_argument(
+        '--git-index',
+        required=False,
+        action='store_true',
+        dest='use_git_index',
+        help="Use the blob ids in the git index to identify files that haven't changed since "
+             "a previous run, without reading them. Requires --cache-dir.",
+    )
+
+    parser.add_argument(
+        '--use-bytecode',
+        required=False,
+        action='store_true',
+        dest='use_bytecode',
+        help="Read imports from the .pyc files that Python has cached, where they are up to "
+             "date, rather than parsing the source code.",
+    )
+
+    parser.add_argument(
+        '--max-file-size',
+        required=False,
+        type=int,
+        dest='max_file_size',
+        metavar='KB',
+        help="The size in kilobytes above which files, such as generated modules, are not "
+             "parsed in full: only the imports at the start of the file are found.",
+    )
+
+    parser.add_argument(
+        '--skip-large-files',
+        required=False,
+        action='store_true',
+        dest='skip_large_files',
+        help="Skip files above the maximum file size altogether. Requires --max-file-size.",
+    )
+
+    parser.add_argument(
+        '--low-memory',
+        required=False,
+        action='store_true',
+        dest='low_memory',
+        help="Hold the imports found in each module in a temporary database on disk while "
+             "the package is analyzed, rather than in memory. Slower, but uses much less "
+             "memory for very large packages.",
+    )
+
+    parser.add_argument(
+        '--exclude-dir',
+        required=False,
+        action='append',
+        dest='exclude_directories',
+        metavar='PATTERN',
+        help="A glob pattern of directories not to analyze, such as 'generated' or "
+             "'one/vendor'. May be supplied more than once.",
+    )
+
+    parser.add_argument(
+        '--exclude-file',
+        required=False,
+        action='append',
+        dest='exclude_files',
+        metavar='PATTERN',
+        help="A glob pattern of files not to analyze, such as '*_pb2.py'. "
+             "May be supplied more than once.",
+    )
+
+    parser.add_argument(
+        '-j',
+        '--jobs',
+        required=False,
+        type=int,
+        default=1,
+        help="The number of processes to use when parsing modules. Defaults to 1.",
+    )
+
     parser.add_argument(
         '-v',
         '--verbose',
@@ -72,12 +157,23 @@ def main():
     return _main(
         package_name=args.package_name,
         config_filename=args.config,
+        cache_dir=args.cache_dir,
+        use_git_index=args.use_git_index,
+        use_bytecode=args.use_bytecode,
+        max_file_size=args.max_file_size,
+        skip_large_files=args.skip_large_files,
+        low_memory=args.low_memory,
+        exclude_directories=args.exclude_directories,
+        exclude_files=args.exclude_files,
+        jobs=args.jobs,
         is_debug=args.is_debug,
         verbosity_count=args.verbosity_count,
         is_quiet=args.is_quiet)
 
 
-def _main(package_name, config_filename=None, is_debug=False,
+def _main(package_name, config_filename=None, cache_dir=None, use_git_index=False,
+          use_bytecode=False, max_file_size=None, skip_large_files=False, low_memory=False,
+          exclude_directories=None, exclude_files=None, jobs=1, is_debug=False,
           verbosity_count=0, is_quiet=False):
 
     if is_debug:
@@ -89,13 +185,42 @@ def _main(package_name, config_filename=None, is_debug=False,
         _print_package_name_error_and_help(str(e))
         return EXIT_STATUS_ERROR
 
+    if jobs < 1:
+        ConsolePrinter.print_error('The number of jobs must be at least 1.')
+        return EXIT_STATUS_ERROR
+
+    if use_git_index and not cache_dir:
+        ConsolePrinter.print_error('Using the git index requires a cache directory.')
+        return EXIT_STATUS_ERROR
+
+    if max_file_size is not None and max_file_size < 0:
+        ConsolePrinter.print_error('The maximum file size must not be negative.')
+        return EXIT_STATUS_ERROR
+
+    if skip_large_files and max_file_size is None:
+        ConsolePrinter.print_error('Skipping large files requires a maximum file size.')
+        return EXIT_STATUS_ERROR
+
     try:
-        contracts = _get_contracts(config_filename, package_name)
+        config_data = _read_config(config_filename)
+        contracts = _get_contracts(config_data, package_name)
+        config_exclude_directories, config_exclude_files = _get_exclude_patterns(config_data)
     except Exception as e:
         ConsolePrinter.print_error(str(e))
         return EXIT_STATUS_ERROR
 
-    graph = DependencyGraph(package=package)
+    graph = DependencyGraph(
+        package=package,
+        cache_dir=cache_dir,
+        exclude_directories=config_exclude_directories + list(exclude_directories or []),
+        exclude_files=config_exclude_files + list(exclude_files or []),
+        jobs=jobs,
+        use_git_index=use_git_index,
+        use_bytecode=use_bytecode,
+        max_file_size=max_file_size * 1024 if max_file_size is not None else None,
+        skip_large_files=skip_large_files,
+        low_memory=low_memory,
+    )
 
     try:
         verbosity = _normalise_verbosity(verbosity_count, is_quiet)
@@ -113,6 +238,8 @@ def _main(package_name, config_filename=None, is_debug=False,
             ConsolePrinter.print_error(str(e))
             return EXIT_STATUS_ERROR
         report.add_contract(contract)
+    logger.debug('{} of {} searches for paths were answered from the cache.'.format(
+        graph.search_cache_hit_count, graph.search_count))
 
     report.output()
 
@@ -175,18 +302,37 @@ def _get_package(package_name: str) -> SafeFilenameModule:
     return SafeFilenameModule(name=package_name, filename=package_filename.origin)
 
 
-def _get_contracts(config_filename: str, package_name: str) -> List[Contract]:
-    # Parse contracts file.
-    if config_filename is None:
-        config_filename = os.path.join(os.getcwd(), 'layers.yml')
+def _read_config(config_filename: Optional[str]) -> Dict[str, Any]:
+    # Parse contracts file, once for both the contracts and the patterns to exclude.
     try:
-        return get_contracts(filename=config_filename, package_name=package_name)
+        return read_contracts_file(_get_config_filename(config_filename))
     except FileNotFoundError as e:
         raise RuntimeError("{}: {}".format(e.strerror, e.filename))
     except ContractParseError as e:
         raise RuntimeError('Error parsing contract: {}'.format(e))
 
 
+def _get_contracts(config_data: Dict[str, Any], package_name: str) -> List[Contract]:
+    try:
+        return contracts_from_yaml(config_data, package_name=package_name)
+    except ContractParseError as e:
+        raise RuntimeError('Error parsing contract: {}'.format(e))
+
+
+def _get_exclude_patterns(config_data: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    # Any directory and file patterns to exclude from the contracts file.
+    try:
+        return exclude_patterns_from_yaml(config_data)
+    except ContractParseError as e:
+        raise RuntimeError('Error parsing contract: {}'.format(e))
+
+
+def _get_config_filename(config_filename: Optional[str]) -> str:
+    if config_filename is None:
+        return os.path.join(os.getcwd(), 'layers.yml')
+    return config_filename
+
+
 def _print_package_name_error_and_help(error_text):
     ConsolePrinter.print_heading('Invalid package name',
                                  ConsolePrinter.HEADING_LEVEL_TWO,
@@ -1,11 +1,10 @@
-from typing import List, Dict, Iterable, Optional
+from typing import Any, List, Dict, Iterable, Optional, Set, Tuple
 import re
 import yaml
 import importlib
 import logging
-from copy import copy
 
-from .dependencies import DependencyGraph, ImportPath
+from .dependencies import CompiledImportPaths, DependencyGraph, ImportPath
 from .module import Module
 
 
@@ -51,9 +50,52 @@ class Contract:
 
         logger.debug('Checking dependencies for contract {}...'.format(self))
 
+        if not self.containers:
+            return
+
+        # Look up the modules of the whitelisted paths once, rather than on every search.
+        ignore_paths = None
+        if self.whitelisted_paths:
+            ignore_paths = dependencies.compile_import_paths(self.whitelisted_paths)
+        # The modules in each layer are looked up once, and searched for by id.
+        layer_module_ids = {
+            (container, layer): self._get_module_ids_in_layer(layer, container, dependencies)
+            for container in self.containers for layer in self.layers
+        }
+        depended_on_layers = self._find_depended_on_layers(layer_module_ids, dependencies)
+
         for container in self.containers:
             for layer in reversed(self.layers):
-                self._check_layer_does_not_import_downstream(layer, container, dependencies)
+                if depended_on_layers[container, layer].isdisjoint(
+                        self._get_layers_downstream_of(layer)):
+                    # There's no need to search for paths to layers it doesn't depend on.
+                    logger.debug("Layer '{}' in container '{}' doesn't depend on any "
+                                 "downstream layers.".format(layer, container))
+                    continue
+                self._check_layer_does_not_import_downstream(layer, container, dependencies,
+                                                             layer_module_ids, ignore_paths)
+
+    def _find_depended_on_layers(
+        self, layer_module_ids: Dict[Tuple[Module, Layer], List[int]],
+        dependencies: DependencyGraph,
+    ) -> Dict[Tuple[Module, Layer], Set[Layer]]:
+        """
+        Return the layers in the same container that each layer depends on, keyed by container
+        and layer.
+
+        Whitelisted paths and paths via other layers count, so depending on a layer doesn't
+        necessarily mean the contract is broken.
+        """
+        layer_keys = list(layer_module_ids)
+        depended_on_groups = dependencies.find_depended_on_groups(
+            [layer_module_ids[layer_key] for layer_key in layer_keys])
+        return {
+            (container, layer): {
+                layer_keys[group_index][1] for group_index in group_indexes
+                if layer_keys[group_index][0] == container
+            }
+            for (container, layer), group_indexes in zip(layer_keys, depended_on_groups)
+        }
 
     def _check_all_layers_exist_for_all_containers(self, dependencies: DependencyGraph) -> None:
         """
@@ -76,72 +118,79 @@ class Contract:
                 raise ValueError(f"Missing layer in container '{container}': "
                                  f"module {layer_module} does not exist.")
 
-    def _check_layer_does_not_import_downstream(self, layer: Layer, container: Module,
-                                                dependencies: DependencyGraph) -> None:
+    def _check_layer_does_not_import_downstream(
+        self, layer: Layer, container: Module, dependencies: DependencyGraph,
+        layer_module_ids: Dict[Tuple[Module, Layer], List[int]],
+        ignore_paths: Optional[CompiledImportPaths],
+    ) -> None:
 
         logger.debug("Layer '{}' in container '{}'.".format(layer, container))
 
-        modules_in_this_layer = self._get_modules_in_layer(layer, container, dependencies)
-        modules_in_downstream_layers = self._get_modules_in_downstream_layers(
-            layer, container, dependencies)
-        logger.debug('Modules in this layer: {}'.format(modules_in_this_layer))
-        logger.debug('Modules in downstream layer: {}'.format(modules_in_downstream_layers))
-
-        for upstream_module in modules_in_this_layer:
-            for downstream_module in modules_in_downstream_layers:
-                logger.debug('Upstream {}, downstream {}.'.format(upstream_module,
-                                                                  downstream_module))
-                path = dependencies.find_path(
-                    upstream=downstream_module,
-                    downstream=upstream_module,
-                    ignore_paths=self.whitelisted_paths,
-                )
-                logger.debug('Path is {}.'.format(path))
-                if path and not self._path_is_via_another_layer(path, layer, container):
-                    logger.debug('Illegal dependency found: {}'.format(path))
-                    self._update_illegal_dependencies(path)
-
-    def _get_modules_in_layer(
+        ids_in_this_layer = layer_module_ids[container, layer]
+        ids_in_downstream_layers = [
+            module_id
+            for downstream_layer in self._get_layers_downstream_of(layer)
+            for module_id in layer_module_ids[container, downstream_layer]
+        ]
+
+        # The sets are made once, rather than on every search.
+        upstream_ids = frozenset(ids_in_downstream_layers)
+        avoid_ids = frozenset(self._get_other_layer_module_ids(layer, container, dependencies))
+        positions = {module_id: index for index, module_id in enumerate(ids_in_downstream_layers)}
+
+        # Search from each module in the layer to all the downstream modules at once, so that
+        # every module that imports a downstream module is reported. The searches don't pass
+        # through the modules of the other layers, as any illegal dependency along those paths
+        # will be reported when checking that layer. So if the shortest path goes through
+        # another layer, a longer path around the other layers is still reported.
+        for module_id in ids_in_this_layer:
+            paths = dependencies.find_shortest_paths(
+                downstream_ids=[module_id],
+                upstream_ids=upstream_ids,
+                ignore_paths=ignore_paths,
+                avoid_ids=avoid_ids,
+            )
+            for downstream_id in sorted(paths, key=positions.__getitem__):
+                # Only the paths that are reported are turned back into modules.
+                path = [dependencies.get_module(path_id) for path_id in paths[downstream_id]]
+                logger.debug('Illegal dependency found: {}'.format(path))
+                self._update_illegal_dependencies(path)
+
+    def _get_module_ids_in_layer(
         self, layer: Layer, container: Module, dependencies: DependencyGraph
-    ) -> List[Module]:
+    ) -> List[int]:
         """
         Args:
             layer: The Layer object.
             container: absolute name of the package containing the layer (string).
             dependencies: the DependencyGraph object.
         Returns:
-            List of modules names within that layer, including the layer module itself.
-            Includes grandchildren and deeper.
+            List of the ids of the modules within that layer, including the layer module
+            itself, if it is in the graph. Includes grandchildren and deeper.
         """
         layer_module = self._get_layer_module(layer, container)
-        modules = [layer_module]
-        modules.extend(
-            dependencies.get_descendants(layer_module)
+        module_ids = []
+        layer_module_id = dependencies.get_module_id(layer_module)
+        if layer_module_id is not None:
+            module_ids.append(layer_module_id)
+        module_ids.extend(
+            dependencies.get_descendant_ids(layer_module)
         )
-        return modules
+        return module_ids
 
     def _get_layer_module(self, layer: Layer, container: Module) -> Module:
         return Module("{}.{}".format(container, layer.name))
 
-    def _get_modules_in_downstream_layers(
-        self, layer: Layer, container: Module, dependencies: DependencyGraph
-    ) -> List[Module]:
-        modules = []
-        for downstream_layer in self._get_layers_downstream_of(layer):
-            modules.extend(
-                self._get_modules_in_layer(layer=downstream_layer, container=container,
-                                           dependencies=dependencies)
-            )
-        return modules
-
-    def _path_is_via_another_layer(self, path, current_layer, container):
-        other_layers = list(copy(self.layers))
-        other_layers.remove(current_layer)
-
-        layer_modules = ['{}.{}'.format(container, layer.name) for layer in other_layers]
-        modules_via = path[1:-1]
-
-        return any(path_module in layer_modules for path_module in modules_via)
+    def _get_other_layer_module_ids(self, current_layer: Layer, container: Module,
+                                    dependencies: DependencyGraph) -> List[int]:
+        other_ids = []
+        for layer in self.layers:
+            if layer is current_layer:
+                continue
+            layer_module_id = dependencies.get_module_id(self._get_layer_module(layer, container))
+            if layer_module_id is not None:
+                other_ids.append(layer_module_id)
+        return other_ids
 
     def _update_illegal_dependencies(self, path):
         # Don't duplicate path. So if the path is already present in another dependency,
@@ -193,6 +242,9 @@ class Contract:
 
 PARENTHESES_REGEX = re.compile(r'^\(.*\)$')
 
+# The top level key in the contracts file under which excluded directories and files are listed.
+EXCLUDE_KEY = 'exclude'
+
 
 def contract_from_yaml(key: str, data: Dict, package_name: str) -> Contract:
     layers: List[Layer] = []
@@ -238,20 +290,82 @@ def contract_from_yaml(key: str, data: Dict, package_name: str) -> Contract:
 def get_contracts(filename: str, package_name: str) -> List[Contract]:
     """Read in any contracts from the given filename.
     """
-    contracts = []
+    return contracts_from_yaml(read_contracts_file(filename), package_name)
+
 
+def get_exclude_patterns(filename: str) -> Tuple[List[str], List[str]]:
+    """Read in any patterns of directories and files to exclude from the given filename.
+
+    Returns:
+        Tuple of the directory patterns and the file patterns.
+    """
+    return exclude_patterns_from_yaml(read_contracts_file(filename))
+
+
+def read_contracts_file(filename: str) -> Dict[str, Any]:
+    """Parse the given contracts file, so that both the contracts and the patterns to exclude
+    can be read from it without parsing it again.
+    """
     with open(filename, 'r') as file:
         try:
-            data_from_yaml = yaml.load(file)
+            return yaml.load(file)
         except Exception as e:
             logger.debug(e)
             raise ContractParseError('Could not parse {}.'.format(filename))
-        for key, data in data_from_yaml.items():
-            contracts.append(contract_from_yaml(key, data, package_name))
+
+
+def contracts_from_yaml(data_from_yaml: Dict[str, Any], package_name: str) -> List[Contract]:
+    """Return the contracts in the parsed contracts file.
+
+    The 'exclude' key is reserved for the patterns to exclude (see
+    exclude_patterns_from_yaml), so it can't be the name of a contract.
+    """
+    contracts = []
+
+    for key, data in data_from_yaml.items():
+        if key == EXCLUDE_KEY:
+            if isinstance(data, dict) and {'layers', 'containers', 'packages'} & set(data):
+                raise ContractParseError(
+                    f"'{EXCLUDE_KEY}' is reserved for the directories and files to exclude, "
+                    f"so it can't be the name of a contract.")
+            continue
+        contracts.append(contract_from_yaml(key, data, package_name))
 
     return contracts
 
 
+def exclude_patterns_from_yaml(data_from_yaml: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """Return the patterns of directories and files to exclude in the parsed contracts file.
+
+    These are listed under the 'exclude' key, in the form:
+
+        exclude:
+            directories:
+                - generated
+            files:
+                - "*_pb2.py"
+
+    Returns:
+        Tuple of the directory patterns and the file patterns.
+    """
+    data = data_from_yaml.get(EXCLUDE_KEY)
+    if data is None:
+        return [], []
+
+    error_message = (f"'{EXCLUDE_KEY}' must contain lists of patterns under "
+                     f"'directories' and/or 'files'.")
+    if not isinstance(data, dict) or not set(data).issubset({'directories', 'files'}):
+        raise ContractParseError(error_message)
+    patterns = []
+    for kind in ('directories', 'files'):
+        kind_patterns = data.get(kind) or []
+        if not isinstance(kind_patterns, list) or not all(
+                isinstance(pattern, str) for pattern in kind_patterns):
+            raise ContractParseError(error_message)
+        patterns.append(kind_patterns)
+    return patterns[0], patterns[1]
+
+
 def _validate_container_name(container_name, package_name):
     """Raise a ValueError if the suppled container name is not a valid container for the supplied
     package name.
@@ -1,2 +1,2 @@
-from .graph import DependencyGraph  # noqa: F401
+from .graph import CompiledImportPaths, DependencyGraph  # noqa: F401
 from .path import ImportPath  # noqa: F401
@@ -1,138 +1,348 @@
-from typing import List
-import ast
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
 
 import logging
+import multiprocessing
+import os
+import sys
 
 from ..module import Module, SafeFilenameModule
+from .bytecode import extract_imports_from_bytecode
+from .cache import ImportCache
+from .extraction import (
+    RawImport, extract_imports, extract_imports_from_files, extract_leading_imports)
 from .path import ImportPath
+from .store import SqliteImportStore
+from .table import ModuleTable
 
 
 logger = logging.getLogger(__name__)
 
 
+# When parsing in multiple processes, each process is sent this many modules at a time.
+PARSE_BATCH_SIZE = 32
+
+# How the parsing processes are started. The modules may still be being scanned in other
+# threads, and forking a process with running threads can deadlock, so they aren't forked.
+PARSE_START_METHOD = (
+    'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
 class DependencyAnalyzer:
     """
     Analyzes a set of Python modules for imports between them.
 
+    The modules may be supplied as any iterable, such as a generator that is still scanning the
+    package: each module is parsed as soon as it arrives. Imports can only be resolved once all
+    the modules are known, after which they are produced lazily, either as the ids of the
+    modules each module imports (see ModuleTable) or as ImportPaths.
+
+    If a cache directory is supplied, the imports found in each file are cached against a hash
+    of its contents, so files that haven't changed since a previous run aren't parsed again.
+    If the git blob ids of unchanged files are also supplied, those files needn't even be read.
+
+    Optionally, imports may be read from the bytecode that Python has cached for each file, if
+    it is up to date, instead of from the source code.
+
+    Files larger than the maximum file size, such as generated modules, are not parsed in full:
+    only the imports in their import section (at the start of the file) are found, or if
+    skip_large_files is set, the files are skipped altogether.
+
+    To save memory with very large packages, the imports found in each module can be held in
+    a temporary database on disk until they are resolved, rather than in memory.
+
     Args:
-        modules: list of all SafeFilenameModules that make up the package.
+        modules: all SafeFilenameModules that make up the package.
         package: the Python package that contains all the modules.
+        jobs: the number of processes to parse the modules with (default 1). If more than one,
+              modules are sent to a process pool in batches; the results are the same.
+        cache_dir: the directory in which to cache the imports found in each file (optional).
+        git_blob_ids: the git blob ids of files known to match the git index, keyed by
+                      filename (optional). Only used if there is a cache directory.
+        use_bytecode: whether to read imports from fresh .pyc files, where there are any
+                      (default False).
+        max_file_size: the size in bytes above which files are not parsed in full (optional).
+        skip_large_files: whether to skip files above the maximum size, rather than finding
+                          the imports in their import section (default False).
+        module_table: the table in which to give each module an id as it is read (optional).
+                      If only some of the modules in the package are to be analyzed, the
+                      table must already hold all of them. Otherwise, the modules supplied
+                      are taken to be all of them.
+        low_memory: whether to hold the imports found in each module on disk until they are
+                    resolved (default False). If so, the imports can only be produced once.
 
     Usage:
         analyzer = DependencyAnalyzer(modules)
         import_paths = analyzer.determine_import_paths()
     """
-    def __init__(self, modules: List[SafeFilenameModule], package: Module) -> None:
-        self.modules = modules
+    def __init__(self, modules: Iterable[SafeFilenameModule], package: Module,
+                 jobs: int = 1, cache_dir: Optional[str] = None,
+                 git_blob_ids: Optional[Dict[str, str]] = None,
+                 use_bytecode: bool = False, max_file_size: Optional[int] = None,
+                 skip_large_files: bool = False,
+                 module_table: Optional[ModuleTable] = None, low_memory: bool = False) -> None:
         self.package = package
+        self.jobs = jobs
+        self.use_bytecode = use_bytecode
+        self.max_file_size = max_file_size
+        self.skip_large_files = skip_large_files
+        self.modules: List[SafeFilenameModule] = []
+        self._unread_modules = iter(modules)
+        self._raw_imports_by_module: Union[List[List[RawImport]], SqliteImportStore] = (
+            SqliteImportStore() if low_memory else [])
+        self.module_table = module_table if module_table is not None else ModuleTable()
+        self._cache = ImportCache(cache_dir) if cache_dir else None
+        self._git_blob_ids = git_blob_ids or {}
 
     def determine_import_paths(self) -> List[ImportPath]:
         """
         Return a list of the ImportPaths for all the modules.
         """
-        import_paths: List[ImportPath] = []
-        for module in self.modules:
-            import_paths.extend(
-                self._determine_import_paths_for_module(module)
-            )
-        return import_paths
+        return list(self.iter_import_paths())
 
-    def _determine_import_paths_for_module(self, module: SafeFilenameModule) -> List[ImportPath]:
+    def iter_import_paths(self) -> Iterator[ImportPath]:
         """
-        Return a list of all the ImportPaths for which a given Module is the importer.
+        Parse any modules not yet read, then yield the ImportPaths for all the modules.
         """
-        import_paths: List[ImportPath] = []
-        imported_modules = self._get_imported_modules(module)
-        for imported_module in imported_modules:
-            import_paths.append(
-                ImportPath(
-                    importer=module,
-                    imported=imported_module
-                )
-            )
-        return import_paths
+        get_module = self.module_table.get_module
+        for module, imported_ids in self._iter_imported_ids_by_module():
+            for imported_id in imported_ids:
+                yield ImportPath(importer=module, imported=get_module(imported_id))
+
+    def iter_imported_ids(self) -> Iterator[Tuple[int, List[int]]]:
+        """
+        Parse any modules not yet read, then yield the id of each module along with the ids of
+        the modules it imports, without duplicates.
+
+        This is much quicker than producing ImportPaths, as no objects are created for each
+        import.
+        """
+        ids = self.module_table.ids
+        for module, imported_ids in self._iter_imported_ids_by_module():
+            yield ids[module.name], imported_ids
+
+    def _iter_imported_ids_by_module(self) -> Iterator[Tuple[SafeFilenameModule, List[int]]]:
+        try:
+            if self.jobs > 1:
+                self._read_modules_in_parallel()
+            else:
+                for module in self._unread_modules:
+                    self._add_module(module)
+                    self._raw_imports_by_module.append(self._get_raw_imports(module))
+            if self._cache:
+                self._cache.save()
+
+            for module, raw_imports in zip(self.modules, self._raw_imports_by_module):
+                yield module, self._get_imported_module_ids(module, raw_imports)
+        finally:
+            if isinstance(self._raw_imports_by_module, SqliteImportStore):
+                # The raw imports aren't needed once they have been resolved, so the database
+                # is deleted straight away.
+                self._raw_imports_by_module.close()
+
+    def _add_module(self, module: SafeFilenameModule) -> None:
+        self.modules.append(module)
+        self.module_table.add(module.name)
+
+    def _read_modules_in_parallel(self) -> None:
+        """
+        Parse any modules not yet read using a pool of processes.
+
+        Batches are submitted as soon as enough modules have arrived. Modules found in the
+        cache (or read without a full parse) aren't sent to the pool. The others are sent as
+        filenames, so that the workers read them, unless they had to be read to be hashed: then
+        they are sent as source code, so that the cache is keyed with the contents that were
+        actually parsed.
+        """
+        # Each pending batch is made up of the positions of the modules that need parsing,
+        # the hashes of their contents (if there is a cache), and the future that will hold
+        # their imports.
+        pending_batches: List[Tuple[List[int], List[Optional[str]], Future]] = []
+        with self._make_process_pool() as executor:
+            while True:
+                batch = list(islice(self._unread_modules, PARSE_BATCH_SIZE))
+                if not batch:
+                    break
+                positions: List[int] = []
+                digests: List[Optional[str]] = []
+                files: List[Union[str, bytes]] = []
+                for module in batch:
+                    raw_imports = self._get_raw_imports_without_parsing_source(module)
+                    digest: Optional[str] = None
+                    source: Optional[bytes] = None
+                    if raw_imports is None and self._cache:
+                        # The contents are only hashed if there's a cache to look them up in.
+                        digest, source = self._get_digest(module)
+                        raw_imports = self._cache.get(digest)
+                    if raw_imports is None:
+                        positions.append(len(self.modules))
+                        digests.append(digest)
+                        files.append(module.filename if source is None else source)
+                    self._add_module(module)
+                    # If not cached, this is a placeholder until the batch has been parsed.
+                    self._raw_imports_by_module.append(raw_imports or [])
+                if files:
+                    pending_batches.append(
+                        (positions, digests, executor.submit(extract_imports_from_files, files))
+                    )
 
-    def _get_imported_modules(self, module: SafeFilenameModule) -> List[Module]:
+            for positions, digests, future in pending_batches:
+                for position, digest, raw_imports in zip(positions, digests, future.result()):
+                    self._raw_imports_by_module[position] = raw_imports
+                    if self._cache and digest is not None:
+                        self._cache.set(digest, raw_imports)
+
+    def _make_process_pool(self) -> ProcessPoolExecutor:
+        if sys.version_info < (3, 7):
+            # The start method can't be chosen, so the processes will be forked: finish
+            # scanning the modules first, so that no other threads are running.
+            self._unread_modules = iter(list(self._unread_modules))
+            return ProcessPoolExecutor(max_workers=self.jobs)
+        return ProcessPoolExecutor(max_workers=self.jobs,
+                                   mp_context=multiprocessing.get_context(PARSE_START_METHOD))
+
+    def _get_raw_imports(self, module: SafeFilenameModule) -> List[RawImport]:
+        """
+        Statically analyses the given module and returns the imports within it, as written.
         """
-        Statically analyses the given module and returns a list of Modules that it imports.
+        raw_imports = self._get_raw_imports_without_parsing_source(module)
+        if raw_imports is not None:
+            return raw_imports
+
+        if not self._cache:
+            return extract_imports(self._read_source(module))
+
+        digest, source = self._get_digest(module)
+        raw_imports = self._cache.get(digest)
+        if raw_imports is None:
+            if source is None:
+                source = self._read_source(module)
+            raw_imports = extract_imports(source)
+            self._cache.set(digest, raw_imports)
+        return raw_imports
+
+    def _get_raw_imports_without_parsing_source(
+        self, module: SafeFilenameModule
+    ) -> Optional[List[RawImport]]:
+        """
+        Return the imports in the module if they can be found without parsing all of its
+        source code, from its bytecode or because it is too large, otherwise None.
+
+        These imports aren't cached, since the cache is keyed with the full source.
+        """
+        if self.use_bytecode:
+            raw_imports = extract_imports_from_bytecode(module.filename)
+            if raw_imports is not None:
+                return raw_imports
+
+        if self.max_file_size is None:
+            return None
+        size = os.path.getsize(module.filename)
+        if size <= self.max_file_size:
+            return None
+        if self.skip_large_files:
+            logger.warning(
+                'Skipping {} ({} bytes), as it is larger than the maximum file size. Any '
+                'imports within it are ignored.'.format(module.filename, size))
+            return []
+        logger.info(
+            'Only reading the imports at the start of {} ({} bytes), as it is larger than the '
+            'maximum file size.'.format(module.filename, size))
+        with open(module.filename, 'rb') as file:
+            return extract_leading_imports(file)
+
+    def _get_digest(self, module: SafeFilenameModule) -> Tuple[str, Optional[bytes]]:
+        """
+        Return the hash of the module's contents, along with its source if it had to be read.
+        """
+        blob_id = self._git_blob_ids.get(module.filename)
+        if blob_id is not None:
+            return blob_id, None
+        source = self._read_source(module)
+        return ImportCache.hash_source(source), source
+
+    def _read_source(self, module: SafeFilenameModule) -> bytes:
+        with open(module.filename, 'rb') as file:
+            return file.read()
+
+    def _get_imported_module_ids(self, module: SafeFilenameModule,
+                                 raw_imports: List[RawImport]) -> List[int]:
+        """
+        Returns the ids of the modules that the given module imports, without duplicates.
 
         Note: this method only analyses the module in question and will not load any other code,
-        so it relies on self.modules to deduce which modules it imports. (This is because you
-        can't know whether "from foo.bar import baz" is importing a module called `baz`,
+        so it relies on the module table to deduce which modules it imports. (This is because
+        you can't know whether "from foo.bar import baz" is importing a module called `baz`,
         or a function `baz` from the module `bar`.)
         """
-        imported_modules = []
-
-        with open(module.filename) as file:
-            module_contents = file.read()
-
-        ast_tree = ast.parse(module_contents)
-        for node in ast.walk(ast_tree):
-            if isinstance(node, ast.ImportFrom):
-                # Parsing something in the form 'from x import ...'.
-                assert isinstance(node.level, int)
-                if node.level == 0:
-                    # Absolute import.
-                    # Let the type checker know we expect node.module to be set here.
-                    assert isinstance(node.module, str)
-                    if not node.module.startswith(self.package.name):
-                        # Don't include imports of modules outside this package.
-                        continue
-                    module_base = node.module
-                elif node.level >= 1:
-                    # Relative import. The level corresponds to how high up the tree it goes;
-                    # for example 'from ... import foo' would be level 3.
-                    importing_module_components = module.name.split('.')
-                    # TODO: handle level that is too high.
-                    # Trim the base module by the number of levels.
-                    if module.filename.endswith('__init__.py'):
-                        # If the scanned module an __init__.py file, we don't want
-                        # to go up an extra level.
-                        number_of_levels_to_trim_by = node.level - 1
-                    else:
-                        number_of_levels_to_trim_by = node.level
-                    if number_of_levels_to_trim_by:
-                        module_base = '.'.join(
-                            importing_module_components[:-number_of_levels_to_trim_by]
-                        )
-                    else:
-                        module_base = '.'.join(importing_module_components)
-                    if node.module:
-                        module_base = '.'.join([module_base, node.module])
-
-                # node.names corresponds to 'a', 'b' and 'c' in 'from x import a, b, c'.
-                for alias in node.names:
-                    full_module_name = '.'.join([module_base, alias.name])
-                    imported_modules.append(Module(full_module_name))
-
-            elif isinstance(node, ast.Import):
-                # Parsing a line in the form 'import x'.
-                for alias in node.names:
-                    if not alias.name.startswith(self.package.name):
-                        # Don't include imports of modules outside this package.
-                        continue
-                    imported_modules.append(Module(alias.name))
-            else:
-                # Not an import statement; move on.
+        ids = self.module_table.ids
+        imported_ids: List[int] = []
+        seen_ids: Set[int] = set()
+
+        # Remove any duplicates, so each name is only resolved once.
+        for raw_import in dict.fromkeys(raw_imports):
+            full_module_name = self._resolve_raw_import(module, raw_import)
+            if full_module_name is None:
                 continue
+            imported_id = ids.get(full_module_name)
+            if imported_id is None:
+                # The module isn't in the known modules. This is because it's something
+                # *within* a module (e.g. a function): the result of something like
+                # 'from .subpackage import my_function'. So we trim the components back to the
+                # module.
+                imported_id = ids.get(full_module_name.rpartition('.')[0])
+                if imported_id is None:
+                    # TODO: we may want to warn the user about this.
+                    logger.debug('{} not found in modules.'.format(full_module_name))
+                    continue
+            # Several names imported from the same module are trimmed to the same module.
+            if imported_id not in seen_ids:
+                seen_ids.add(imported_id)
+                imported_ids.append(imported_id)
+        return imported_ids
 
-        imported_modules = self._trim_each_to_known_modules(imported_modules)
-        return imported_modules
+    def _resolve_raw_import(self, module: SafeFilenameModule,
+                            raw_import: RawImport) -> Optional[str]:
+        """
+        Return the absolute name of the imported object, or None if it is outside the package.
+        """
+        level, imported_module_name, name = raw_import
 
-    def _trim_each_to_known_modules(self, imported_modules: List[Module]) -> List[Module]:
-        known_modules = []
-        for imported_module in imported_modules:
-            if imported_module in self.modules:
-                known_modules.append(imported_module)
+        if name is None:
+            # Parsing a line in the form 'import x'.
+            if not imported_module_name.startswith(self.package.name):
+                # Don't include imports of modules outside this package.
+                return None
+            return imported_module_name
+
+        # Parsing something in the form 'from x import ...'.
+        if level == 0:
+            # Absolute import.
+            if not imported_module_name.startswith(self.package.name):
+                # Don't include imports of modules outside this package.
+                return None
+            module_base = imported_module_name
+        else:
+            # Relative import. The level corresponds to how high up the tree it goes;
+            # for example 'from ... import foo' would be level 3.
+            importing_module_components = module.name.split('.')
+            # TODO: handle level that is too high.
+            # Trim the base module by the number of levels.
+            if module.filename.endswith('__init__.py'):
+                # If the scanned module an __init__.py file, we don't want
+                # to go up an extra level.
+                number_of_levels_to_trim_by = level - 1
             else:
-                # The module isn't in the known modules. This is because it's something *within*
-                # a module (e.g. a function): the result of something like 'from .subpackage
-                # import my_function'. So we trim the components back to the module.
-                components = imported_module.name.split('.')[:-1]
-                trimmed_module = Module('.'.join(components))
-                if trimmed_module in self.modules:
-                    known_modules.append(trimmed_module)
-                else:
-                    # TODO: we may want to warn the user about this.
-                    logger.debug('{} not found in modules.'.format(trimmed_module))
-        return known_modules
+                number_of_levels_to_trim_by = level
+            if number_of_levels_to_trim_by:
+                module_base = '.'.join(
+                    importing_module_components[:-number_of_levels_to_trim_by]
+                )
+            else:
+                module_base = '.'.join(importing_module_components)
+            if imported_module_name:
+                module_base = '.'.join([module_base, imported_module_name])
+
+        # The name corresponds to 'a' in 'from x import a'.
+        return '.'.join([module_base, name])
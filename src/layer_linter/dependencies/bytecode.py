@@ -0,0 +1,183 @@
+from typing import List, Optional, Tuple
+from bisect import bisect_right
+from types import CodeType
+import dis
+import importlib.util
+import logging
+import marshal
+import os
+import sys
+
+from .extraction import RawImport
+
+
+logger = logging.getLogger(__name__)
+
+
+# Python 3.7 added a four byte field of flags to the header of .pyc files (PEP 552).
+HEADER_SIZE = 16 if sys.version_info >= (3, 7) else 12
+
+IMPORT_NAME = dis.opmap['IMPORT_NAME']
+EXTENDED_ARG = dis.opmap['EXTENDED_ARG']
+LOAD_CONST = dis.opmap['LOAD_CONST']
+# From Python 3.14, small integers such as the level of an import are loaded by their own opcode.
+LOAD_SMALL_INT = dis.opmap.get('LOAD_SMALL_INT')
+
+
+def extract_imports_from_bytecode(filename: str) -> Optional[List[RawImport]]:
+    """
+    Return the imports within a Python file, read from the bytecode that Python cached for it
+    in __pycache__, in the order they appear.
+
+    Returns None if there is no cached bytecode, or it can't be trusted to match the file: it
+    must be for this version of Python, and record the current modification time and size of
+    the file. (Like Python itself, this won't notice a change that keeps the size the same
+    within a second of the bytecode being written.) Bytecode validated by hashing the source
+    is not used, as the source would have to be read anyway.
+
+    Note that the compiler leaves out code it knows to be unreachable, so any imports under
+    something like 'if False:' aren't found.
+    """
+    try:
+        code = _load_fresh_code(filename)
+    except (OSError, NotImplementedError, ValueError, EOFError, TypeError) as e:
+        logger.debug('Could not load bytecode for {}: {}'.format(filename, e))
+        return None
+    if code is None:
+        return None
+
+    # The imports in each code object (the module, and the functions and classes within it)
+    # are found along with their line numbers, so they can be put in order.
+    numbered_imports: List[Tuple[int, RawImport]] = []
+    code_objects = [code]
+    while code_objects:
+        code = code_objects.pop()
+        code_imports = _find_imports_in_code(code)
+        if code_imports is None:
+            return None
+        numbered_imports.extend(code_imports)
+        code_objects.extend(
+            constant for constant in reversed(code.co_consts) if isinstance(constant, CodeType)
+        )
+    # The sort is stable, so imports on the same line stay in order.
+    numbered_imports.sort(key=lambda numbered_import: numbered_import[0])
+    return [raw_import for _, raw_import in numbered_imports]
+
+
+def _load_fresh_code(filename: str) -> Optional[CodeType]:
+    """
+    Return the module code object from the cached bytecode of the file, if it is fresh.
+    """
+    # Always use the unoptimized bytecode, as optimization removes code such as asserts.
+    bytecode_filename = importlib.util.cache_from_source(filename, optimization='')
+    source_stat = os.stat(filename)
+    with open(bytecode_filename, 'rb') as file:
+        data = file.read()
+
+    if data[:4] != importlib.util.MAGIC_NUMBER:
+        return None
+    if HEADER_SIZE == 16:
+        flags = int.from_bytes(data[4:8], 'little')
+        if flags:
+            # The bytecode is validated with a hash of the source, rather than its timestamp.
+            return None
+    mtime = int.from_bytes(data[HEADER_SIZE - 8:HEADER_SIZE - 4], 'little')
+    size = int.from_bytes(data[HEADER_SIZE - 4:HEADER_SIZE], 'little')
+    if (mtime != int(source_stat.st_mtime) & 0xFFFFFFFF
+            or size != source_stat.st_size & 0xFFFFFFFF):
+        return None
+
+    code = marshal.loads(data[HEADER_SIZE:])
+    if not isinstance(code, CodeType):
+        return None
+    return code
+
+
+def _find_imports_in_code(code: CodeType) -> Optional[List[Tuple[int, RawImport]]]:
+    """
+    Return the imports directly within the code object, each with its line number, or None if
+    the instructions for any of them aren't in the expected form.
+
+    Each import is compiled to an IMPORT_NAME instruction, preceded by instructions that load
+    its level and its 'from' list (the names imported, or None for 'import x'):
+
+        from ..a import b, c    ->    LOAD_CONST 2; LOAD_CONST ('b', 'c'); IMPORT_NAME a
+    """
+    bytecode = code.co_code
+    import_offsets = _find_opcode(bytecode, IMPORT_NAME)
+    if not import_offsets:
+        return []
+
+    line_starts = [
+        (offset, line) for offset, line in dis.findlinestarts(code) if line is not None
+    ]
+    line_offsets = [offset for offset, _ in line_starts]
+
+    numbered_imports: List[Tuple[int, RawImport]] = []
+    for import_offset in import_offsets:
+        name_index, offset = _read_argument(bytecode, import_offset)
+        fromlist_opcode, fromlist_index, offset = _read_previous_instruction(bytecode, offset)
+        level_opcode, level_argument, offset = _read_previous_instruction(bytecode, offset)
+        if fromlist_opcode != LOAD_CONST:
+            return None
+        if level_opcode == LOAD_CONST:
+            level = code.co_consts[level_argument]
+        elif LOAD_SMALL_INT is not None and level_opcode == LOAD_SMALL_INT:
+            level = level_argument
+        else:
+            return None
+        module = code.co_names[name_index]
+        fromlist = code.co_consts[fromlist_index]
+        if not isinstance(level, int) or not (fromlist is None or isinstance(fromlist, tuple)):
+            return None
+
+        line_index = bisect_right(line_offsets, import_offset) - 1
+        line = line_starts[line_index][1] if line_index >= 0 else 0
+        if fromlist is None:
+            # Parsing a line in the form 'import x'.
+            numbered_imports.append((line, (0, module, None)))
+        else:
+            # Parsing something in the form 'from x import ...'.
+            for name in fromlist:
+                numbered_imports.append((line, (level, module, name)))
+    return numbered_imports
+
+
+def _find_opcode(bytecode: bytes, opcode: int) -> List[int]:
+    """
+    Return the offsets of the instructions with the opcode.
+
+    Instructions are two bytes long, so a match at an odd offset is an argument instead.
+    """
+    offsets = []
+    offset = bytecode.find(opcode)
+    while offset != -1:
+        if offset % 2 == 0:
+            offsets.append(offset)
+        offset = bytecode.find(opcode, offset + 1)
+    return offsets
+
+
+def _read_argument(bytecode: bytes, offset: int) -> Tuple[int, int]:
+    """
+    Return the full argument of the instruction at the offset, including any EXTENDED_ARG
+    prefixes, and the offset of the first of those prefixes.
+    """
+    argument = bytecode[offset + 1]
+    shift = 8
+    while offset >= 2 and bytecode[offset - 2] == EXTENDED_ARG:
+        offset -= 2
+        argument |= bytecode[offset + 1] << shift
+        shift += 8
+    return argument, offset
+
+
+def _read_previous_instruction(bytecode: bytes, offset: int) -> Tuple[int, int, int]:
+    """
+    Return the opcode and full argument of the instruction before the offset, and the offset
+    at which it starts (or -1 values if there isn't one).
+    """
+    if offset < 2:
+        return -1, -1, 0
+    argument, start_offset = _read_argument(bytecode, offset - 2)
+    return bytecode[offset - 2], argument, start_offset
@@ -0,0 +1,253 @@
+from typing import IO, Any, Callable, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from .. import __version__
+from .extraction import RawImport
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_filename(cache_dir: str, prefix: str, key: str, extension: str = 'json') -> str:
+    """
+    Return the name of a file within the cache directory that is unique to the supplied key.
+
+    Args:
+        cache_dir: the directory used to store the cache files.
+        prefix: a human readable name for the kind of file, e.g. 'scan-manifest'.
+        key: a string, such as a directory path, that the file relates to.
+        extension: the extension of the file (default 'json').
+    """
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, '{}-{}.{}'.format(prefix, digest, extension))
+
+
+def read_json_file(filename: str) -> Optional[Any]:
+    """
+    Return the data stored in a JSON file, or None if it is missing or can't be read.
+    """
+    try:
+        with open(filename, 'r') as file:
+            return json.load(file)
+    except (OSError, ValueError) as e:
+        logger.debug('Could not read cache file {}: {}'.format(filename, e))
+        return None
+
+
+def write_json_file_atomically(filename: str, data: Any) -> None:
+    """
+    Write the data to a JSON file, so that readers never see a partially written file.
+    """
+    write_file_atomically(
+        filename, lambda file: json.dump(data, file, separators=(',', ':')), mode='w')
+
+
+def write_file_atomically(filename: str, write: Callable[[IO], None], mode: str = 'wb') -> None:
+    """
+    Write a file using the supplied function, so that readers never see it partially written.
+
+    The function is passed a temporary file in the same directory, which is then moved into
+    place. Caching is an optimisation, so failure to write is logged rather than raised.
+    """
+    directory = os.path.dirname(filename)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        file_descriptor, temporary_filename = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    except OSError as e:
+        logger.debug('Could not write cache file {}: {}'.format(filename, e))
+        return
+    try:
+        with os.fdopen(file_descriptor, mode) as file:
+            write(file)
+        os.replace(temporary_filename, filename)
+    except OSError as e:
+        logger.debug('Could not write cache file {}: {}'.format(filename, e))
+        try:
+            os.remove(temporary_filename)
+        except OSError:
+            pass
+
+
+class ScanManifest:
+    """
+    A persistent record of the entries of each directory in a package, so that a directory
+    only needs to be listed again if its modification time has changed.
+
+    Args:
+        cache_dir: the directory used to store the manifest.
+        package_directory: the full path of the top level Python package directory.
+
+    Usage:
+        manifest = ScanManifest('/path/to/cache', '/path/to/mypackage')
+        listing = manifest.get_listing(directory, mtime_ns)
+        if listing is None:
+            listing = list_directory(directory)
+        manifest.record_listing(directory, mtime_ns, listing)
+        ...
+        manifest.save()
+    """
+    VERSION = 1
+
+    # Adding or removing an entry within the timestamp granularity of the filesystem can leave
+    # a directory's mtime unchanged. Listings of directories modified this many seconds or
+    # fewer before the scan started are therefore not trusted on the next run.
+    RACY_INTERVAL_SECONDS = 2
+
+    def __init__(self, cache_dir: str, package_directory: str) -> None:
+        self.package_directory = package_directory
+        self.filename = get_cache_filename(cache_dir, 'scan-manifest', package_directory)
+        self._scan_started_ns = int(time.time() * 1e9)
+        self._listings = self._load()
+        self._recorded_listings: Dict[str, List[Any]] = {}
+
+    def get_listing(self, directory: str, mtime_ns: int) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Return the files and subdirectories of the directory, if they were recorded when it
+        had the supplied modification time.
+        """
+        recorded = self._listings.get(self._get_key(directory))
+        if recorded is None or recorded[0] != mtime_ns:
+            return None
+        return recorded[1], recorded[2]
+
+    def record_listing(self, directory: str, mtime_ns: int,
+                       listing: Tuple[List[str], List[str]]) -> None:
+        """
+        Record the files and subdirectories of the directory, to be written on save.
+
+        Only directories recorded during this scan are kept, so any that no longer exist
+        drop out of the manifest.
+        """
+        racy_threshold_ns = self._scan_started_ns - self.RACY_INTERVAL_SECONDS * 10 ** 9
+        if mtime_ns >= racy_threshold_ns:
+            return
+        files, subdirectories = listing
+        self._recorded_listings[self._get_key(directory)] = [mtime_ns, files, subdirectories]
+
+    def save(self) -> None:
+        if self._recorded_listings == self._listings:
+            # Nothing has changed, so don't rewrite the file.
+            return
+        write_json_file_atomically(self.filename, {
+            'version': self.VERSION,
+            'package_directory': self.package_directory,
+            'directories': self._recorded_listings,
+        })
+
+    def _load(self) -> Dict[str, List[Any]]:
+        data = read_json_file(self.filename)
+        if not isinstance(data, dict):
+            return {}
+        if (data.get('version') != self.VERSION
+                or data.get('package_directory') != self.package_directory):
+            return {}
+        return data.get('directories', {})
+
+    def _get_key(self, directory: str) -> str:
+        # Directories are always found by joining names onto the package directory,
+        # so the relative part can be sliced off cheaply.
+        return directory[len(self.package_directory):]
+
+
+class ImportCache:
+    """
+    A persistent mapping of the content hashes of Python files to the raw imports within them,
+    so that unchanged files don't need to be parsed again.
+
+    Raw imports don't depend on where a file lives, so files with identical contents share an
+    entry. Contents are hashed in the same way as git hashes blobs, so the blob ids in a git
+    index can be used as keys without reading the files. A separate cache file is kept for each
+    version of Python and Layer Linter, since either may affect the results of parsing.
+
+    The number of entries is capped; when it is exceeded, the least recently used entries are
+    discarded on save. The file is replaced atomically, and entries written by any other run in
+    the meantime are merged in, so concurrent runs sharing a cache directory don't corrupt it.
+
+    Args:
+        cache_dir: the directory used to store the cache.
+        max_entries: the maximum number of files whose imports are kept.
+
+    Usage:
+        cache = ImportCache('/path/to/cache')
+        digest = ImportCache.hash_source(source)
+        raw_imports = cache.get(digest)
+        if raw_imports is None:
+            raw_imports = extract_imports(source)
+            cache.set(digest, raw_imports)
+        ...
+        cache.save()
+    """
+    VERSION = 2
+    DEFAULT_MAX_ENTRIES = 100000
+
+    def __init__(self, cache_dir: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self.max_entries = max_entries
+        tag = '{}-{}.{}-{}'.format(
+            sys.implementation.name, sys.version_info[0], sys.version_info[1], __version__)
+        self.filename = get_cache_filename(cache_dir, 'imports', tag)
+        # Entries are kept in order of use, least recently used first.
+        self._entries: OrderedDict = self._load()
+        self._has_new_entries = False
+
+    @staticmethod
+    def hash_source(source: bytes) -> str:
+        """
+        Return the git blob id of the source.
+        """
+        digest = hashlib.sha1('blob {}\0'.format(len(source)).encode('ascii'))
+        digest.update(source)
+        return digest.hexdigest()
+
+    def get(self, digest: str) -> Optional[List[RawImport]]:
+        """
+        Return the raw imports for the file with the supplied content hash, if known.
+        """
+        raw_imports = self._entries.get(digest)
+        if raw_imports is None:
+            return None
+        self._entries.move_to_end(digest)
+        return [(level, module, name) for level, module, name in raw_imports]
+
+    def set(self, digest: str, raw_imports: List[RawImport]) -> None:
+        self._entries[digest] = raw_imports
+        self._entries.move_to_end(digest)
+        self._has_new_entries = True
+
+    def save(self) -> None:
+        """
+        Write the cache, if any entries have been added.
+
+        Entries that were only read are not worth rewriting the file for; their recency is
+        recorded the next time the cache is saved.
+        """
+        if not self._has_new_entries:
+            return
+
+        # Merge in any entries saved by other runs since this cache was loaded, treating them
+        # as less recently used than the entries used in this run.
+        entries = self._load()
+        for digest in self._entries:
+            entries.pop(digest, None)
+        entries.update(self._entries)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+        write_json_file_atomically(self.filename, {
+            'version': self.VERSION,
+            'entries': list(entries.items()),
+        })
+        self._entries = entries
+        self._has_new_entries = False
+
+    def _load(self) -> OrderedDict:
+        data = read_json_file(self.filename)
+        if not isinstance(data, dict) or data.get('version') != self.VERSION:
+            return OrderedDict()
+        return OrderedDict(data.get('entries', []))
@@ -0,0 +1,466 @@
+from typing import (
+    AbstractSet, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union)
+from array import array
+from collections import Counter
+from itertools import accumulate
+
+
+# The typecode of the arrays that hold node ids and offsets: signed integers of (at least)
+# 32 bits.
+ARRAY_TYPECODE = 'i'
+
+# An array of node ids or offsets: either an array with the typecode above, or a memoryview
+# in the same format (such as of a memory mapped file).
+IntArray = Union[array, memoryview]
+
+# An edge between two nodes, in the form (source, target).
+Edge = Tuple[int, int]
+
+
+class CompactGraph:
+    """
+    A directed graph whose nodes are the integers from zero up to the number of nodes.
+
+    Edges are stored in compressed sparse row (CSR) form: the targets of the edges from each
+    node are held contiguously in one array, with a second array holding the offset at which
+    each node's targets begin. The same is done in reverse for the sources of the edges to
+    each node, so both successors and predecessors can be found without any per-node objects.
+
+    The strongly connected components of the graph are found the first time a path is
+    searched for, and numbered in topological order, so that no edge runs from a component to
+    one with a lower number. A node can't reach a node in a lower numbered component, so
+    searches rule these out without visiting them.
+
+    Build the graph with a CompactGraphBuilder.
+    """
+    def __init__(self, node_count: int, successor_offsets: IntArray, successors: IntArray,
+                 predecessor_offsets: IntArray, predecessors: IntArray) -> None:
+        self.node_count = node_count
+        self.edge_count = len(successors)
+        self._successor_offsets = successor_offsets
+        self._successors = successors
+        self._predecessor_offsets = predecessor_offsets
+        self._predecessors = predecessors
+        self._topological_indexes: Optional[array] = None
+        self._topological_order: Optional[array] = None
+
+    def get_successors(self, node: int) -> IntArray:
+        """
+        Return the nodes that the node has an edge to, in the order the edges were added.
+        """
+        return self._successors[self._successor_offsets[node]:self._successor_offsets[node + 1]]
+
+    def get_predecessors(self, node: int) -> IntArray:
+        """
+        Return the nodes that have an edge to the node, in order.
+        """
+        return self._predecessors[
+            self._predecessor_offsets[node]:self._predecessor_offsets[node + 1]
+        ]
+
+    def get_arrays(self) -> Tuple[IntArray, IntArray, IntArray, IntArray]:
+        """
+        Return the arrays the graph is stored in, in the order they are passed to the
+        constructor. They must not be modified.
+        """
+        return (self._successor_offsets, self._successors,
+                self._predecessor_offsets, self._predecessors)
+
+    def replace_successors(self, replacements: Mapping[int, Iterable[int]]) -> 'CompactGraph':
+        """
+        Return a copy of the graph in which the edges from each of the nodes in the
+        replacements are replaced with edges to the supplied nodes, ignoring any duplicates.
+        """
+        builder = CompactGraphBuilder()
+        for node in range(self.node_count):
+            builder.add_successors(
+                node, replacements[node] if node in replacements else self.get_successors(node))
+        return builder.build(self.node_count)
+
+    def get_topological_indexes(self) -> array:
+        """
+        Return the topological index of the strongly connected component of each node.
+
+        Nodes in the same component share an index, and every edge between components runs
+        from a lower index to a higher one. The components are found with Tarjan's algorithm
+        the first time this is called.
+        """
+        if self._topological_indexes is None:
+            self._topological_indexes = self._find_topological_indexes()
+        return self._topological_indexes
+
+    def get_topological_order(self) -> array:
+        """
+        Return the nodes in order of the topological index of their strongly connected
+        components (see get_topological_indexes). This is worked out the first time it is
+        called.
+        """
+        if self._topological_order is None:
+            topological_indexes = self.get_topological_indexes()
+            self._topological_order = array(ARRAY_TYPECODE, sorted(
+                range(self.node_count), key=topological_indexes.__getitem__))
+        return self._topological_order
+
+    def find_shortest_path(self, source: int, target: int,
+                           excluded_edges: AbstractSet[Edge] = frozenset()) -> Optional[List[int]]:
+        """
+        Return a shortest path from the source to the target, as a list of nodes including
+        both, or None if there is no path.
+
+        The search proceeds breadth first from both ends at once, each time expanding
+        whichever frontier is smaller, so it usually visits far fewer nodes than a search
+        from one end.
+
+        Args:
+            source: the node to start from.
+            target: the node to finish at.
+            excluded_edges: edges that the path may not use (optional).
+        """
+        if source == target:
+            return [source]
+        topological_indexes = self.get_topological_indexes()
+        source_index, target_index = topological_indexes[source], topological_indexes[target]
+        if source_index > target_index:
+            return None
+
+        successor_offsets, successors = self._successor_offsets, self._successors
+        predecessor_offsets, predecessors = self._predecessor_offsets, self._predecessors
+        # The node each visited node was reached from, in each direction.
+        forward_parents: Dict[int, int] = {source: source}
+        backward_parents: Dict[int, int] = {target: target}
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        while forward_frontier and backward_frontier:
+            if len(forward_frontier) <= len(backward_frontier):
+                next_frontier = []
+                for node in forward_frontier:
+                    start, end = successor_offsets[node], successor_offsets[node + 1]
+                    for successor in successors[start:end]:
+                        if successor in forward_parents:
+                            continue
+                        if topological_indexes[successor] > target_index:
+                            # The target can't be reached from here.
+                            continue
+                        if excluded_edges and (node, successor) in excluded_edges:
+                            continue
+                        forward_parents[successor] = node
+                        if successor in backward_parents:
+                            return self._join_paths(successor, forward_parents,
+                                                    backward_parents)
+                        next_frontier.append(successor)
+                forward_frontier = next_frontier
+            else:
+                next_frontier = []
+                for node in backward_frontier:
+                    start, end = predecessor_offsets[node], predecessor_offsets[node + 1]
+                    for predecessor in predecessors[start:end]:
+                        if predecessor in backward_parents:
+                            continue
+                        if topological_indexes[predecessor] < source_index:
+                            # This can't be reached from the source.
+                            continue
+                        if excluded_edges and (predecessor, node) in excluded_edges:
+                            continue
+                        backward_parents[predecessor] = node
+                        if predecessor in forward_parents:
+                            return self._join_paths(predecessor, forward_parents,
+                                                    backward_parents)
+                        next_frontier.append(predecessor)
+                backward_frontier = next_frontier
+        return None
+
+    def find_shortest_paths(self, sources: Iterable[int], targets: AbstractSet[int],
+                            excluded_nodes: AbstractSet[int] = frozenset(),
+                            excluded_edges: AbstractSet[Edge] = frozenset()
+                            ) -> Dict[int, List[int]]:
+        """
+        Return a shortest path to each of the targets that can be reached from any of the
+        sources, keyed by target.
+
+        A single breadth first search proceeds from all of the sources at once, so each path
+        starts from whichever source is nearest to its target. The search doesn't continue on
+        from a target, so no path passes through one target on the way to another, and it
+        stops as soon as every target has been reached.
+
+        Args:
+            sources: the nodes to start from.
+            targets: the nodes to finish at.
+            excluded_nodes: nodes that a path may start or finish at, but not pass
+                            through (optional).
+            excluded_edges: edges that the paths may not use (optional).
+        """
+        successor_offsets, successors = self._successor_offsets, self._successors
+        topological_indexes = self.get_topological_indexes()
+        sources = list(sources)
+        if not sources:
+            return {}
+        # Leave out any targets that none of the sources can reach.
+        lowest_source_index = min(topological_indexes[source] for source in sources)
+        targets = {
+            target for target in targets if topological_indexes[target] >= lowest_source_index
+        }
+        if not targets:
+            return {}
+        highest_target_index = max(topological_indexes[target] for target in targets)
+        # The node each visited node was reached from.
+        parents: Dict[int, int] = {}
+        paths: Dict[int, List[int]] = {}
+        frontier = []
+        for source in sources:
+            if source in parents:
+                continue
+            parents[source] = source
+            if source in targets:
+                paths[source] = [source]
+            else:
+                frontier.append(source)
+
+        unreached_count = len(targets) - len(paths)
+        while frontier and unreached_count:
+            next_frontier = []
+            for node in frontier:
+                start, end = successor_offsets[node], successor_offsets[node + 1]
+                for successor in successors[start:end]:
+                    if successor in parents:
+                        continue
+                    if topological_indexes[successor] > highest_target_index:
+                        # None of the targets can be reached from here.
+                        continue
+                    if excluded_edges and (node, successor) in excluded_edges:
+                        continue
+                    parents[successor] = node
+                    if successor in targets:
+                        paths[successor] = self._trace_path(successor, parents)
+                        unreached_count -= 1
+                    elif successor not in excluded_nodes:
+                        next_frontier.append(successor)
+            frontier = next_frontier
+        return paths
+
+    def find_ancestors(self, nodes: Iterable[int]) -> Set[int]:
+        """
+        Return the nodes that have a path to any of the supplied nodes, other than those nodes
+        themselves.
+
+        Only the nodes found, and the edges to them, are visited, so this takes time in
+        proportion to the size of the answer rather than of the graph.
+        """
+        offsets, predecessors = self._predecessor_offsets, self._predecessors
+        start_nodes = set(nodes)
+        seen = set(start_nodes)
+        unvisited = list(start_nodes)
+        while unvisited:
+            node = unvisited.pop()
+            for predecessor in predecessors[offsets[node]:offsets[node + 1]]:
+                if predecessor not in seen:
+                    seen.add(predecessor)
+                    unvisited.append(predecessor)
+        return seen - start_nodes
+
+    def find_reachable_groups(self, groups: Sequence[Iterable[int]]) -> List[Set[int]]:
+        """
+        Return, for each of the groups of nodes, the indexes of the groups that any of its
+        nodes has a path to. A group reaches itself, as long as it has any nodes.
+
+        The groups reached from each strongly connected component are held as a bitset, in an
+        integer with a bit for each group. Visiting the components in reverse topological
+        order, each one's bitset is combined with those of the components it has edges to,
+        so a single pass over the edges answers the question for every pair of groups.
+        """
+        topological_indexes = self.get_topological_indexes()
+        groups = [list(group) for group in groups]
+        successor_offsets, successors = self._successor_offsets, self._successors
+
+        reached_groups = [0] * self.node_count
+        for group_index, group in enumerate(groups):
+            bit = 1 << group_index
+            for node in group:
+                reached_groups[topological_indexes[node]] |= bit
+        # The components an edge leads to come later in topological order, so they are
+        # complete by the time the edge is followed. (Edges within a component just combine
+        # its bitset with itself.)
+        for node in reversed(self.get_topological_order()):
+            component = topological_indexes[node]
+            bitset = reached_groups[component]
+            for successor in successors[successor_offsets[node]:successor_offsets[node + 1]]:
+                bitset |= reached_groups[topological_indexes[successor]]
+            reached_groups[component] = bitset
+
+        results = []
+        for group in groups:
+            bitset = 0
+            for node in group:
+                bitset |= reached_groups[topological_indexes[node]]
+            results.append({
+                group_index for group_index in range(bitset.bit_length())
+                if bitset >> group_index & 1
+            })
+        return results
+
+    def _find_topological_indexes(self) -> array:
+        """
+        Return the topological index of the strongly connected component of each node, found
+        with an iterative version of Tarjan's algorithm (so deep graphs don't hit the
+        recursion limit).
+
+        Tarjan's algorithm completes each component after all the components it has edges to,
+        so the components are numbered in reverse order of completion.
+        """
+        successor_offsets, successors = self._successor_offsets, self._successors
+        unvisited = -1
+        # The order in which each node was first visited, and the lowest such order of any
+        # node known to be in the same component.
+        visit_orders = array(ARRAY_TYPECODE, [unvisited]) * self.node_count
+        low_links = array(ARRAY_TYPECODE, [0]) * self.node_count
+        completion_orders = array(ARRAY_TYPECODE, [0]) * self.node_count
+        is_on_stack = bytearray(self.node_count)
+        # The visited nodes whose components haven't been completed yet.
+        stack: List[int] = []
+        visit_count = 0
+        component_count = 0
+
+        for root in range(self.node_count):
+            if visit_orders[root] != unvisited:
+                continue
+            visit_orders[root] = low_links[root] = visit_count
+            visit_count += 1
+            stack.append(root)
+            is_on_stack[root] = 1
+            # Each node being visited, with the position of the next of its edges to follow.
+            call_stack = [(root, successor_offsets[root])]
+
+            while call_stack:
+                node, position = call_stack[-1]
+                end = successor_offsets[node + 1]
+                while position < end:
+                    successor = successors[position]
+                    position += 1
+                    if visit_orders[successor] == unvisited:
+                        break
+                    if is_on_stack[successor] and visit_orders[successor] < low_links[node]:
+                        low_links[node] = visit_orders[successor]
+                else:
+                    # All of the node's edges have been followed.
+                    call_stack.pop()
+                    if low_links[node] == visit_orders[node]:
+                        # The node is the first visited in its component, so the component is
+                        # complete.
+                        while True:
+                            member = stack.pop()
+                            is_on_stack[member] = 0
+                            completion_orders[member] = component_count
+                            if member == node:
+                                break
+                        component_count += 1
+                    if call_stack:
+                        caller = call_stack[-1][0]
+                        if low_links[node] < low_links[caller]:
+                            low_links[caller] = low_links[node]
+                    continue
+
+                # Visit the successor, resuming the node's edges afterwards.
+                call_stack[-1] = (node, position)
+                visit_orders[successor] = low_links[successor] = visit_count
+                visit_count += 1
+                stack.append(successor)
+                is_on_stack[successor] = 1
+                call_stack.append((successor, successor_offsets[successor]))
+
+        last_index = component_count - 1
+        return array(ARRAY_TYPECODE, (last_index - order for order in completion_orders))
+
+    def _trace_path(self, node: int, parents: Dict[int, int]) -> List[int]:
+        """
+        Return the path from the root of the search to the node, following the parents.
+        """
+        path = [node]
+        while parents[node] != node:
+            node = parents[node]
+            path.append(node)
+        path.reverse()
+        return path
+
+    def _join_paths(self, meeting_node: int, forward_parents: Dict[int, int],
+                    backward_parents: Dict[int, int]) -> List[int]:
+        path = self._trace_path(meeting_node, forward_parents)
+        node = meeting_node
+        while backward_parents[node] != node:
+            node = backward_parents[node]
+            path.append(node)
+        return path
+
+
+class CompactGraphBuilder:
+    """
+    Collects the edges of a CompactGraph, ignoring any duplicates.
+
+    The targets of the edges from each source are kept together as they are added, so the
+    successors of each node need no sorting when the graph is built. Edges may be added one
+    at a time, or all the edges from a source at once, which is quicker.
+
+    Usage:
+        builder = CompactGraphBuilder()
+        builder.add_edge(0, 1)
+        builder.add_successors(1, [2, 3])
+        ...
+        graph = builder.build(node_count=4)
+    """
+    def __init__(self) -> None:
+        # The targets of the edges from each source, in the order they were added. They are
+        # held as the keys of dictionaries, which removes any duplicates.
+        self._successors_by_source: Dict[int, Dict[int, None]] = {}
+        self.edge_count = 0
+
+    def add_edge(self, source: int, target: int) -> None:
+        self.add_successors(source, (target,))
+
+    def add_edges(self, edges: Iterable[Edge]) -> None:
+        for source, target in edges:
+            self.add_successors(source, (target,))
+
+    def add_successors(self, source: int, targets: Iterable[int]) -> None:
+        """
+        Add edges from the source to each of the targets.
+        """
+        successors = self._successors_by_source.get(source)
+        if successors is None:
+            successors = self._successors_by_source[source] = dict.fromkeys(targets)
+            self.edge_count += len(successors)
+        else:
+            previous_count = len(successors)
+            successors.update(dict.fromkeys(targets))
+            self.edge_count += len(successors) - previous_count
+
+    def build(self, node_count: int) -> CompactGraph:
+        """
+        Return the graph, which must have at least enough nodes for all of the edges.
+        """
+        sources = array(ARRAY_TYPECODE)
+        successors = array(ARRAY_TYPECODE)
+        successor_offsets = array(ARRAY_TYPECODE, [0])
+        for node in range(node_count):
+            node_successors = self._successors_by_source.get(node)
+            if node_successors:
+                successors.extend(node_successors)
+                sources.extend([node] * len(node_successors))
+            successor_offsets.append(len(successors))
+        predecessor_offsets, predecessors = _build_compressed_rows(
+            successors, sources, node_count)
+        return CompactGraph(node_count, successor_offsets, successors,
+                            predecessor_offsets, predecessors)
+
+
+def _build_compressed_rows(rows: array, columns: array, row_count: int) -> Tuple[array, array]:
+    """
+    Return the offsets and the columns, grouped by row, of the supplied (row, column) pairs.
+
+    Within each row, the columns stay in the order they were supplied.
+    """
+    # The sort is stable, so it keeps the order of each row's columns.
+    order = sorted(range(len(rows)), key=rows.__getitem__)
+    sorted_columns = array(ARRAY_TYPECODE, map(columns.__getitem__, order))
+    counts = Counter(rows)
+    offsets = array(ARRAY_TYPECODE, [0])
+    offsets.extend(accumulate(counts[row] for row in range(row_count)))
+    return offsets, sorted_columns
@@ -0,0 +1,342 @@
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple, Union
+import ast
+import io
+import re
+import tokenize
+
+
+# A single imported name, exactly as written in the source code. It doesn't depend on where the
+# importing module lives, or on what other modules exist: the DependencyAnalyzer resolves it to a
+# module later. It is in the form (level, module, name):
+#
+#     import a.b                  -> (0, 'a.b', None)
+#     from a import b, c          -> (0, 'a', 'b'), (0, 'a', 'c')
+#     from ..a import b           -> (2, 'a', 'b')
+#     from . import b             -> (1, '', 'b')
+RawImport = Tuple[int, str, Optional[str]]
+
+
+def extract_imports(source: bytes) -> List[RawImport]:
+    """
+    Statically analyse the supplied source code and return the imports within it, in the order
+    they appear.
+
+    The source is supplied as bytes, so that the parser can take any encoding declaration
+    into account.
+
+    Most modules are handled by a lexical scan, which only steps over the comments and string
+    literals before the last import, rather than parsing the whole module. Anything the scan
+    can't be sure about (such as a module name split over lines with a backslash) is handed
+    to the ast module instead. Note that the scan doesn't check that the rest of the module is
+    valid Python.
+    """
+    raw_imports = _extract_imports_lexically(source)
+    if raw_imports is None:
+        raw_imports = _extract_imports_with_ast(source)
+    return raw_imports
+
+
+def extract_imports_from_files(files: List[Union[str, bytes]]) -> List[List[RawImport]]:
+    """
+    Return the imports within each of the supplied files, in the same order. Each file is
+    either the filename, in which case it is read here, or its source code, if that has
+    already been read.
+
+    This is run in worker processes, so files are read as well as parsed in parallel, and only
+    the compact raw imports are passed back.
+    """
+    raw_imports_by_file = []
+    for file in files:
+        if isinstance(file, str):
+            with open(file, 'rb') as opened_file:
+                file = opened_file.read()
+        raw_imports_by_file.append(extract_imports(file))
+    return raw_imports_by_file
+
+
+def extract_leading_imports(file: BinaryIO) -> List[RawImport]:
+    """
+    Return the imports in the import section at the start of a file, without reading the rest
+    of it.
+
+    The import section ends at the first top level statement that isn't an import, a string
+    (such as the module docstring), an assignment to a name such as __all__, or a compound
+    statement that often guards imports ('if' and 'try'). Any imports after that, for example
+    within functions, aren't found.
+    """
+    lines: List[bytes] = []
+
+    def readline() -> bytes:
+        line = file.readline()
+        lines.append(line)
+        return line
+
+    at_statement_start = True
+    try:
+        for token in tokenize.tokenize(readline):
+            if token.type in _NON_STATEMENT_TOKEN_TYPES:
+                if token.type == tokenize.NEWLINE:
+                    at_statement_start = True
+                continue
+            if at_statement_start:
+                at_statement_start = False
+                # Only the statements at the top level (at column zero) are considered.
+                if token.start[1] == 0 and not _can_be_in_import_section(token):
+                    # Leave out the line that starts the statement, and any read after it.
+                    del lines[token.start[0] - 1:]
+                    break
+    except (tokenize.TokenError, SyntaxError):
+        # Leave any errors for the parser to report.
+        pass
+    return extract_imports(b''.join(lines))
+
+
+_NON_STATEMENT_TOKEN_TYPES = frozenset((
+    tokenize.ENCODING, tokenize.NEWLINE, tokenize.NL, tokenize.COMMENT, tokenize.INDENT,
+    tokenize.DEDENT,
+))
+# The first words of top level statements that can be in the import section.
+_IMPORT_SECTION_KEYWORDS = frozenset(
+    ('import', 'from', 'if', 'elif', 'else', 'try', 'except', 'finally')
+)
+
+
+def _can_be_in_import_section(token: tokenize.TokenInfo) -> bool:
+    if token.type == tokenize.STRING:
+        return True
+    if token.type != tokenize.NAME:
+        return False
+    name = token.string
+    return (name in _IMPORT_SECTION_KEYWORDS
+            or (name.startswith('__') and name.endswith('__')))
+
+
+def _extract_imports_with_ast(source: bytes) -> List[RawImport]:
+    raw_imports: List[RawImport] = []
+    ast_tree = ast.parse(source)
+    import_nodes: List[Union[ast.Import, ast.ImportFrom]] = []
+    _find_import_nodes(ast_tree.body, import_nodes)
+    for node in import_nodes:
+        if isinstance(node, ast.ImportFrom):
+            # Parsing something in the form 'from x import ...'.
+            assert isinstance(node.level, int)
+            # node.module is None for imports in the form 'from . import ...'.
+            module = node.module or ''
+            # node.names corresponds to 'a', 'b' and 'c' in 'from x import a, b, c'.
+            for alias in node.names:
+                raw_imports.append((node.level, module, alias.name))
+        else:
+            # Parsing a line in the form 'import x'.
+            for alias in node.names:
+                raw_imports.append((0, alias.name, None))
+    return raw_imports
+
+
+# The fields of ast nodes that can hold lists of statements (or of except handlers and match
+# cases, which hold statements in turn). They are looked up once for each type of node.
+_STATEMENT_LIST_FIELDS = ('body', 'handlers', 'orelse', 'finalbody', 'cases')
+_statement_list_fields_by_type: Dict[type, Tuple[str, ...]] = {}
+
+
+def _find_import_nodes(statements: Sequence[ast.AST],
+                       import_nodes: List[Union[ast.Import, ast.ImportFrom]]) -> None:
+    """
+    Add the import statements among the supplied statements, and any nested within them, to
+    import_nodes in the order they appear.
+
+    Imports can only be statements, so only the bodies of compound statements (functions,
+    classes, if, try, with, loops and so on) are visited, never expressions.
+    """
+    for node in statements:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            import_nodes.append(node)
+            continue
+        node_type = type(node)
+        try:
+            fields = _statement_list_fields_by_type[node_type]
+        except KeyError:
+            # The fields are declared in the order they appear in the source.
+            fields = _statement_list_fields_by_type[node_type] = tuple(
+                field for field in node_type._fields if field in _STATEMENT_LIST_FIELDS
+            )
+        for field in fields:
+            _find_import_nodes(getattr(node, field), import_nodes)
+
+
+# Only ASCII names are recognised by the lexical scan: the parser normalises other identifiers,
+# so modules that use them are left to the ast module.
+_NAME = r'[A-Za-z_][A-Za-z0-9_]*'
+_DOTTED_NAME = r'{name}(?:\s*\.\s*{name})*'.format(name=_NAME)
+
+# The tokens that the lexical scan needs to find, so that the word 'import' is only seen where
+# it is a keyword. A quote that doesn't start a complete string literal is also matched, as the
+# rest of the module can't then be scanned reliably.
+_TOKEN_PATTERN = re.compile(
+    r'(?P<comment>#[^\n]*)'
+    r'|(?P<string>[rRbBuUfFtT]{0,2}(?:'
+    r"'''[^'\\]*(?:(?:\\.|'(?!''))[^'\\]*)*'''"
+    r'|"""[^"\\]*(?:(?:\\.|"(?!""))[^"\\]*)*"""'
+    r"|'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    r'|"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
+    r'))'
+    r'|(?P<keyword>(?<!\w)import(?!\w))'
+    r'|(?P<unknown>[\'"])',
+    re.DOTALL,
+)
+
+# The text on the line before an 'import' keyword, for each form of import statement. The
+# statement must start the line, or follow a semicolon or the colon of a compound statement.
+_IMPORT_PREFIX_PATTERN = re.compile(r'(?:^|[;:])[ \t]*\Z')
+_FROM_PREFIX_PATTERN = re.compile(
+    r'(?:^|[;:])[ \t]*from(?![\w])[ \t]*((?:\.[ \t]*)*)({dotted})?[ \t]*\Z'.format(
+        dotted=_DOTTED_NAME)
+)
+
+# The names after an 'import' keyword: either a star, a parenthesized list (which may span
+# lines and contain comments) or a list that runs to the end of the statement (which may be
+# continued with backslashes).
+_IMPORTED_NAMES_PATTERN = re.compile(
+    r'[ \t]*(?:(?P<star>\*)'
+    r'|\((?P<parenthesized>(?:[^)#\\]|#[^\n]*)*)\)'
+    r'|(?P<unparenthesized>(?:[^\n;#\\()]|\\\n)*)(?=[\n;#]|\Z))'
+)
+_COMMENT_PATTERN = re.compile(r'#[^\n]*')
+_IMPORTED_MODULE_PATTERN = re.compile(r'({dotted})(?:\s+as\s+{name})?\Z'.format(
+    dotted=_DOTTED_NAME, name=_NAME))
+_IMPORTED_NAME_PATTERN = re.compile(r'({name})(?:\s+as\s+{name})?\Z'.format(name=_NAME))
+
+
+def _extract_imports_lexically(source: bytes) -> Optional[List[RawImport]]:
+    """
+    Return the imports within the source code, or None if they can't be found with certainty
+    without parsing it.
+    """
+    if b'import' not in source:
+        return []
+
+    text = _decode_source(source)
+    if text is None:
+        return None
+    # Nothing after the last occurrence of the word can affect the result.
+    last_keyword_position = text.rfind('import')
+
+    raw_imports: List[RawImport] = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        if match.start() > last_keyword_position:
+            break
+        token_type = match.lastgroup
+        if token_type == 'keyword':
+            statement_imports = _parse_import_statement(text, match.start(), match.end())
+            if statement_imports is None:
+                return None
+            raw_imports.extend(statement_imports)
+        elif token_type == 'string':
+            if not _is_string_safely_terminated(match.group()):
+                return None
+        elif token_type == 'unknown':
+            return None
+    return raw_imports
+
+
+def _decode_source(source: bytes) -> Optional[str]:
+    """
+    Decode the source as the parser would, or return None if it can't be decoded.
+    """
+    try:
+        encoding, _ = tokenize.detect_encoding(io.BytesIO(source).readline)
+        text = source.decode(encoding)
+    except (SyntaxError, LookupError, UnicodeDecodeError):
+        return None
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+
+def _is_string_safely_terminated(string: str) -> bool:
+    """
+    Return whether the end of the string literal was definitely found.
+
+    From Python 3.12, the replacement fields of f-strings may contain the same quotes as the
+    string itself, which would end the match early. That can only happen inside an unclosed
+    replacement field (doubled braces are literal, so they are discounted).
+    """
+    if '{' not in string:
+        return True
+    quote_position = min(position for position in (string.find("'"), string.find('"'))
+                         if position != -1)
+    prefix = string[:quote_position].lower()
+    if 'f' not in prefix and 't' not in prefix:
+        return True
+    fields = string.replace('{{', '').replace('}}', '')
+    return fields.count('{') == fields.count('}')
+
+
+def _parse_import_statement(text: str, keyword_start: int,
+                            keyword_end: int) -> Optional[List[RawImport]]:
+    """
+    Return the imports in the statement containing the 'import' keyword at the supplied
+    position, or None if the statement can't be parsed lexically.
+    """
+    line_start = text.rfind('\n', 0, keyword_start) + 1
+    if line_start >= 2 and text[line_start - 2] == '\\':
+        # The line is a continuation of the previous one.
+        return None
+    prefix = text[line_start:keyword_start]
+
+    names_match = _IMPORTED_NAMES_PATTERN.match(text, keyword_end)
+    if names_match is None:
+        return None
+
+    if _IMPORT_PREFIX_PATTERN.search(prefix):
+        # Parsing a line in the form 'import x'.
+        if names_match.lastgroup != 'unparenthesized':
+            return None
+        module_names = _parse_names(names_match.group('unparenthesized'),
+                                    _IMPORTED_MODULE_PATTERN)
+        if module_names is None:
+            return None
+        return [(0, module_name, None) for module_name in module_names]
+
+    from_match = _FROM_PREFIX_PATTERN.search(prefix)
+    if from_match is None:
+        return None
+    # Parsing something in the form 'from x import ...'.
+    level = from_match.group(1).count('.')
+    module = _remove_whitespace(from_match.group(2) or '')
+    if not (level or module):
+        return None
+    if names_match.lastgroup == 'star':
+        names: Optional[List[str]] = ['*']
+    elif names_match.lastgroup == 'parenthesized':
+        names = _parse_names(
+            _COMMENT_PATTERN.sub('', names_match.group('parenthesized')),
+            _IMPORTED_NAME_PATTERN,
+            allow_trailing_comma=True,
+        )
+    else:
+        names = _parse_names(names_match.group('unparenthesized'), _IMPORTED_NAME_PATTERN)
+    if names is None:
+        return None
+    return [(level, module, name) for name in names]
+
+
+def _parse_names(names_text: str, name_pattern, allow_trailing_comma=False) -> Optional[List[str]]:
+    """
+    Return the names in a comma separated list of imported names (ignoring any aliases), or
+    None if any of them isn't valid.
+    """
+    items = [item.strip() for item in names_text.replace('\\\n', ' ').split(',')]
+    if allow_trailing_comma and len(items) > 1 and not items[-1]:
+        items.pop()
+    names = []
+    for item in items:
+        name_match = name_pattern.match(item)
+        if name_match is None:
+            return None
+        names.append(_remove_whitespace(name_match.group(1)))
+    return names
+
+
+def _remove_whitespace(text: str) -> str:
+    # Whitespace is allowed around the dots in a module name.
+    return ''.join(text.split())
@@ -0,0 +1,56 @@
+from typing import Dict, List, Optional
+import logging
+import os
+import subprocess
+
+
+logger = logging.getLogger(__name__)
+
+
+# The git file modes of regular files (as opposed to symlinks and submodules).
+REGULAR_FILE_MODES = ('100644', '100755')
+
+
+def get_unchanged_blob_ids(directory: str) -> Optional[Dict[str, str]]:
+    """
+    Return the git blob ids of the files within the directory whose contents match the git
+    index, keyed by full filename.
+
+    The blob ids are read from the index, so the files themselves don't need to be read. Files
+    with unstaged changes are left out, as are untracked files.
+
+    Returns None if git isn't available or the directory isn't within a git working tree.
+    """
+    try:
+        index_entries = _run_git(directory, 'ls-files', '--stage', '-z')
+        changed_filenames = set(_run_git(directory, 'diff-files', '--name-only', '--relative',
+                                         '-z'))
+    except (OSError, subprocess.CalledProcessError) as e:
+        logger.debug('Could not read the git index for {}: {}'.format(directory, e))
+        return None
+
+    blob_ids = {}
+    for index_entry in index_entries:
+        # Each entry is in the form '<mode> <blob id> <stage>\t<path>'.
+        metadata, path = index_entry.split('\t', 1)
+        mode, blob_id, stage = metadata.split(' ')
+        if stage != '0' or mode not in REGULAR_FILE_MODES or path in changed_filenames:
+            # Skip unmerged files, symlinks, submodules and files that have changed.
+            continue
+        blob_ids[os.path.join(directory, *path.split('/'))] = blob_id
+    return blob_ids
+
+
+def _run_git(directory: str, *args: str) -> List[str]:
+    """
+    Run a git command in the directory, returning the null-terminated items of its output.
+    """
+    result = subprocess.run(
+        ['git'] + list(args),
+        cwd=directory,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    output = os.fsdecode(result.stdout)
+    return [item for item in output.split('\0') if item]
@@ -1,21 +1,72 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import partial
 import logging
-from typing import List, Optional, Any
-import networkx  # type: ignore
-from networkx.algorithms import shortest_path  # type: ignore
+import os
+import threading
+import time
+from typing import (
+    Any, Callable, Dict, FrozenSet, Hashable, Iterable, List, Optional, Sequence, Set, Tuple,
+    TypeVar, Union)
 
 from ..module import Module, SafeFilenameModule
 from .path import ImportPath
 from .scanner import PackageScanner
+from .snapshot import GraphSnapshot
 from .analysis import DependencyAnalyzer
+from .engine import CompactGraphBuilder, Edge
+from .table import ModuleTable
+from .git import get_unchanged_blob_ids
+from .cache import get_cache_filename
 
 
 logger = logging.getLogger(__name__)
 
 
+class CompiledImportPaths:
+    """
+    ImportPaths compiled into the edges between module ids in a DependencyGraph, so that
+    they can be ignored by any number of searches without looking up their modules each time.
+
+    Create these with DependencyGraph.compile_import_paths; they only apply to the graph that
+    created them.
+    """
+    def __init__(self, edges: FrozenSet[Edge]) -> None:
+        self.edges = edges
+
+
+# The ImportPaths for a search to ignore, either as they are or compiled.
+IgnorePaths = Union[Iterable[ImportPath], CompiledImportPaths]
+
+SearchResult = TypeVar('SearchResult')
+
+
 class DependencyGraph:
     """
     A graph of the internal dependencies in a Python package.
 
+    Args:
+        package: the Python package to analyze.
+        cache_dir: a directory in which to store data that speeds up subsequent runs (optional).
+                   This includes a snapshot of the graph: if the same modules are found on
+                   the next run, only those whose files have changed are analyzed again.
+        exclude_directories: glob patterns of directories not to analyze (optional).
+        exclude_files: glob patterns of files not to analyze (optional).
+        jobs: the number of processes to parse modules with (default 1).
+        use_git_index: whether to use the blob ids in the git index to identify files that
+                       haven't changed, rather than reading them (default False). Only used
+                       if there is a cache directory.
+        use_bytecode: whether to read imports from up to date .pyc files where possible,
+                      rather than from the source code (default False).
+        max_file_size: the size in bytes above which files are not parsed in full, only
+                       their import section (optional).
+        skip_large_files: whether to skip files above the maximum size altogether
+                          (default False).
+        low_memory: whether to hold the imports found in each module in a temporary
+                    database on disk while the package is analyzed, rather than in memory
+                    (default False). This is slower, but uses much less memory for very large
+                    packages.
+
     Usage:
         graph = DependencyGraph(
             SafeFilenameModule('mypackage', '/path/to/mypackage/__init__.py')
@@ -34,33 +85,189 @@ class DependencyGraph:
 
         descendants = graph.get_descendants(Module('mypackage.foo'))
     """
-    def __init__(self, package: SafeFilenameModule) -> None:
-        scanner = PackageScanner(package)
-        self.modules = scanner.scan_for_modules()
+    # The most search results to keep. There is one search for each module in each layer that
+    # is checked, so this is enough for contracts over tens of thousands of modules.
+    MAX_CACHED_SEARCHES = 50000
 
-        self._networkx_graph = networkx.DiGraph()
-        self.dependency_count = 0
+    def __init__(self, package: SafeFilenameModule, cache_dir: Optional[str] = None,
+                 exclude_directories: Optional[Iterable[str]] = None,
+                 exclude_files: Optional[Iterable[str]] = None, jobs: int = 1,
+                 use_git_index: bool = False, use_bytecode: bool = False,
+                 max_file_size: Optional[int] = None, skip_large_files: bool = False,
+                 low_memory: bool = False) -> None:
+        started_ns = int(time.time() * 1e9)
+        scanner = PackageScanner(
+            package,
+            cache_dir=cache_dir,
+            exclude_directories=exclude_directories,
+            exclude_files=exclude_files,
+        )
 
-        analyzer = DependencyAnalyzer(modules=self.modules, package=package)
-        for import_path in analyzer.determine_import_paths():
-            self._add_path_to_networkx_graph(import_path)
-            self.dependency_count += 1
+        git_blob_ids = None
+        if use_git_index and cache_dir:
+            git_blob_ids = get_unchanged_blob_ids(os.path.dirname(package.filename))
+            if git_blob_ids is None:
+                logger.warning('Could not read the git index, so all files will be read.')
+
+        make_analyzer = partial(
+            DependencyAnalyzer,
+            package=package,
+            jobs=jobs,
+            cache_dir=cache_dir,
+            git_blob_ids=git_blob_ids,
+            use_bytecode=use_bytecode,
+            max_file_size=max_file_size,
+            skip_large_files=skip_large_files,
+            low_memory=low_memory,
+        )
+
+        snapshot = None
+        if cache_dir:
+            # Everything that affects which imports are found.
+            snapshot_key = repr((
+                package.name, package.filename, sorted(exclude_directories or ()),
+                sorted(exclude_files or ()), use_bytecode, max_file_size, skip_large_files,
+            ))
+            snapshot_filename = get_cache_filename(cache_dir, 'graph', snapshot_key,
+                                                   extension='bin')
+            snapshot = GraphSnapshot.load(snapshot_filename, snapshot_key)
+
+        if snapshot is None:
+            # Stream the modules into the analyzer as they are found, so that parsing overlaps
+            # with scanning.
+            self._build(make_analyzer(modules=scanner.iter_modules()))
+            has_changed = True
+        else:
+            modules = scanner.scan_for_modules()
+            module_names = {module.name for module in modules}
+            if (len(module_names) == len(snapshot.module_names)
+                    and module_names.issuperset(snapshot.module_names)):
+                has_changed = self._build_from_snapshot(snapshot, modules, make_analyzer,
+                                                        git_blob_ids or {})
+            else:
+                # Adding or removing a module can change which modules the others import.
+                logger.info('Modules have been added or removed since the graph snapshot was '
+                            'saved, so all modules will be analyzed.')
+                self._build(make_analyzer(modules=modules))
+                has_changed = True
+
+        if cache_dir and has_changed:
+            GraphSnapshot(self._table.names, self._graph).save(
+                snapshot_filename, snapshot_key,
+                filenames=[module.filename for module in self._modules_by_id],
+                git_blob_ids=git_blob_ids or {},
+                started_ns=started_ns,
+            )
+
+        # The names of the modules are kept in sorted order, so that the descendants of a
+        # module, which share its name as a prefix, are next to each other.
+        self._sorted_ids = sorted(range(len(self._table)), key=self._table.names.__getitem__)
+        self._sorted_names = [self._table.names[module_id] for module_id in self._sorted_ids]
 
         self.module_count = len(self.modules)
+        self.dependency_count = self._graph.edge_count
+
+        # The results of path searches, keyed by everything that affects them, so that a search
+        # repeated in the same run (for example, by contracts with the same containers) is only
+        # done once. The graph doesn't change once built, so the results never go stale, but
+        # only the most recently used are kept. The lock guards the cache and the counts, so
+        # that searches may run concurrently.
+        self._search_cache: OrderedDict = OrderedDict()
+        self._search_lock = threading.Lock()
+        self.search_count = 0
+        self.search_cache_hit_count = 0
+
+    def _build(self, analyzer: DependencyAnalyzer) -> None:
+        """
+        Build the graph from scratch, adding the imports of each module as they are resolved.
+        """
+        # Modules are stored in the graph engine as integer ids, which the analyzer assigns in
+        # the order the modules are scanned.
+        self._table = analyzer.module_table
+        builder = CompactGraphBuilder()
+        for importer_id, imported_ids in analyzer.iter_imported_ids():
+            builder.add_successors(importer_id, imported_ids)
+
+        self.modules = analyzer.modules
+        self._set_modules(self.modules)
+        self._graph = builder.build(node_count=len(self._table))
+
+    def _build_from_snapshot(self, snapshot: GraphSnapshot, modules: List[SafeFilenameModule],
+                             make_analyzer: Callable[..., DependencyAnalyzer],
+                             git_blob_ids: Dict[str, str]) -> bool:
+        """
+        Build the graph from a snapshot with the same modules, analyzing only the modules whose
+        files have changed and replacing their imports. Return whether any had changed.
+        """
+        self.modules = modules
+        self._table = ModuleTable(snapshot.module_names)
+        self._set_modules(modules)
+        ids = self._table.ids
+
+        changed_modules = [
+            module for module in modules
+            if not snapshot.is_file_unchanged(ids[module.name], module.filename,
+                                              git_blob_ids.get(module.filename))
+        ]
+        if not changed_modules:
+            self._graph = snapshot.graph
+            return False
+
+        logger.info('Analyzing {} modules that have changed since the graph snapshot was '
+                    'saved.'.format(len(changed_modules)))
+        analyzer = make_analyzer(modules=changed_modules, module_table=self._table)
+        self._graph = snapshot.graph.replace_successors(dict(analyzer.iter_imported_ids()))
+        return True
+
+    def _set_modules(self, modules: Iterable[SafeFilenameModule]) -> None:
+        """
+        Index the modules by name and by id, once all of them are in the module table.
+        """
+        self._modules_by_name = {module.name: module for module in modules}
+        self._modules_by_id = [self._modules_by_name[name] for name in self._table.names]
 
     def get_modules_directly_imported_by(self, importer: Module) -> List[Module]:
         """
         Returns all the modules directly imported by the importer.
         """
-        if importer in self._networkx_graph:
-            return self._networkx_graph.successors(importer)
-        else:
-            # Nodes that do not import anything are not present in the networkx graph.
+        importer_id = self._table.get_id(importer.name)
+        if importer_id is None:
             return []
+        return [self._modules_by_id[imported_id]
+                for imported_id in self._graph.get_successors(importer_id)]
+
+    def get_modules_that_directly_import(self, imported: Module) -> List[Module]:
+        """
+        Returns all the modules that directly import the imported module.
+        """
+        imported_id = self._table.get_id(imported.name)
+        if imported_id is None:
+            return []
+        return [self._modules_by_id[importer_id]
+                for importer_id in self._graph.get_predecessors(imported_id)]
+
+    def find_downstream_modules(self, modules: Iterable[Module]) -> Set[Module]:
+        """
+        Return the modules that depend on any of the supplied modules, even indirectly: that
+        is, those that could be affected by changes to them. The supplied modules themselves
+        are left out.
+
+        The graph holds the importers of each module as well as the modules it imports, so
+        this only visits the modules that are found.
+
+        For example, given modules a, b, c and d, where d imports c, which imports a:
+
+                - {c, d} will be returned for [a].
+                - {d} will be returned for [b, c].
+        """
+        ancestor_ids = self._graph.find_ancestors(
+            module_id for module_id in map(self.get_module_id, modules) if module_id is not None
+        )
+        return {self._modules_by_id[module_id] for module_id in ancestor_ids}
 
     def find_path(self,
                   downstream: Module, upstream: Module,
-                  ignore_paths: Optional[List[ImportPath]] = None) -> List[Module]:
+                  ignore_paths: Optional[IgnorePaths] = None) -> Optional[Tuple[Module, ...]]:
         """
         Find a list of module names showing the dependency path between the downstream and the
         upstream module, or None if there is no dependency.
@@ -70,65 +277,165 @@ class DependencyGraph:
                 - [d, a] will be returned if d directly imports a.
                 - [d, c, b, a] will be returned if d imports c, which imports b, which imports a.
                 - None will be returned if d does not import a (even indirectly).
+
+        Any ignore_paths, either ImportPaths or compiled with compile_import_paths, are not
+        used in the path. Searches are cached for the life of the graph, so repeating one is
+        almost free. The cache is guarded by a lock, so searches may run concurrently.
         """
         logger.debug("Finding path from '{}' up to '{}'.".format(downstream, upstream))
-        ignore_paths = ignore_paths if ignore_paths else []
+        downstream_id = self._table.get_id(downstream.name)
+        upstream_id = self._table.get_id(upstream.name)
+        if downstream_id is None or upstream_id is None:
+            # One of the modules doesn't even exist.
+            return None
 
-        removed_paths = self._remove_paths_from_networkx_graph(ignore_paths)
+        excluded_edges = self._get_excluded_edges(ignore_paths)
+        path = self._search(
+            ('path', downstream_id, upstream_id, excluded_edges),
+            lambda: self._graph.find_shortest_path(downstream_id, upstream_id,
+                                                   excluded_edges=excluded_edges),
+        )
+        if path is None:
+            return None
+        return tuple(self._modules_by_id[module_id] for module_id in path)
 
-        try:
-            path = shortest_path(self._networkx_graph, downstream, upstream)
-        except (networkx.NetworkXNoPath, networkx.exception.NodeNotFound):
-            # Either there is no path, or one of the modules doesn't even exist.
-            path = None
-        else:
-            path = tuple(path)
+    def find_shortest_paths(
+        self, downstream_ids: Iterable[int], upstream_ids: Iterable[int],
+        ignore_paths: Optional[IgnorePaths] = None, avoid_ids: Optional[Iterable[int]] = None,
+    ) -> Dict[int, Tuple[int, ...]]:
+        """
+        Find a shortest dependency path to each of the upstream modules that any of the
+        downstream modules depend on, keyed by upstream module. Modules are passed in and out
+        by id (see get_module_id), so that searches needn't look up or create any Modules.
+
+        This is a single search, so it is much quicker than finding the path between each pair
+        of modules. Each path starts from whichever downstream module is nearest, and doesn't
+        pass through another of the upstream modules, or any of the modules to avoid.
+
+        Searches are cached for the life of the graph, so repeating one is almost free.
+
+        For example, given downstream modules d and e, and upstream modules a and b:
+
+                - {a: (d, a)} will be returned if d directly imports a, and neither d nor e
+                  imports b (even indirectly).
+                - {a: (e, c, a)} will be returned if e imports c, which imports a, which
+                  imports b. The path to b passes through a, so it isn't included.
+        """
+        downstream_ids = tuple(downstream_ids)
+        upstream_id_set = frozenset(upstream_ids)
+        if not upstream_id_set:
+            return {}
+        avoid_id_set = frozenset(avoid_ids) if avoid_ids else frozenset()
+        excluded_edges = self._get_excluded_edges(ignore_paths)
+
+        def search() -> Dict[int, Tuple[int, ...]]:
+            paths = self._graph.find_shortest_paths(
+                downstream_ids, upstream_id_set, excluded_nodes=avoid_id_set,
+                excluded_edges=excluded_edges,
+            )
+            return {upstream_id: tuple(path) for upstream_id, path in paths.items()}
+
+        # The cached result is copied, so that the caller can't change it.
+        return dict(self._search(
+            ('paths', downstream_ids, upstream_id_set, avoid_id_set, excluded_edges), search))
+
+    def find_depended_on_groups(self, id_groups: Sequence[Iterable[int]]) -> List[Set[int]]:
+        """
+        Return, for each of the groups of module ids, the indexes of the groups that any of its
+        modules depends on (even indirectly). A group depends on itself, as long as it isn't
+        empty.
 
-        self._restore_paths_to_networkx_graph(removed_paths)
+        This is worked out for every pair of groups at once, so it is much quicker than
+        searching for paths between them; paths need only be searched for between groups
+        known to depend on each other.
 
-        return path
+        For example, given groups [a, b], [c] and [d], where b imports c:
+
+                - [{0, 1}, {1}, {2}] will be returned.
+        """
+        return self._graph.find_reachable_groups([list(group) for group in id_groups])
 
     def get_descendants(self, module: Module) -> List[Module]:
         """
         Returns:
-            List of modules that are within the supplied module.
+            List of modules that are within the supplied module, in order of name.
         """
-        descendants: List[Module] = []
-        for candidate in self.modules:
-            if candidate.name.startswith('{}.'.format(module.name)):
-                descendants.append(candidate)
-        return descendants
+        return [self._modules_by_id[module_id] for module_id in self.get_descendant_ids(module)]
 
-    def _add_path_to_networkx_graph(self, import_path: ImportPath) -> None:
-        self._networkx_graph.add_edge(import_path.importer, import_path.imported)
+    def get_descendant_ids(self, module: Module) -> List[int]:
+        """
+        Returns:
+            List of the ids of the modules that are within the supplied module, in order of
+            name.
+        """
+        # The names of the descendants sort from the module's name followed by '.', up to
+        # (but not including) its name followed by '/', the character after '.'.
+        start = bisect_left(self._sorted_names, '{}.'.format(module.name))
+        end = bisect_left(self._sorted_names, '{}/'.format(module.name), start)
+        return self._sorted_ids[start:end]
 
-    def _remove_path_from_networkx_graph(self, import_path: ImportPath) -> None:
-        self._networkx_graph.remove_edge(import_path.importer, import_path.imported)
+    def get_module_id(self, module: Module) -> Optional[int]:
+        """
+        Return the id of the module within the graph, or None if it isn't in the graph.
+        """
+        return self._table.get_id(module.name)
 
-    def _import_path_is_in_networkx_graph(self, import_path: ImportPath) -> bool:
-        return self._networkx_graph.has_successor(
-            import_path.importer, import_path.imported
-        )
+    def get_module(self, module_id: int) -> SafeFilenameModule:
+        """
+        Return the module with the id.
+        """
+        return self._modules_by_id[module_id]
 
-    def _remove_paths_from_networkx_graph(
-        self, import_paths: List[ImportPath]
-    ) -> List[ImportPath]:
+    def compile_import_paths(self, import_paths: Iterable[ImportPath]) -> CompiledImportPaths:
         """
-        Given a list of ImportPaths, remove any that exist from the graph.
+        Compile ImportPaths for searches to ignore, which saves looking up their modules on
+        every search. Any ImportPaths between modules that aren't in the graph are left out.
 
-        Returns:
-             List of removed ImportPaths.
+        Usage:
+            ignore_paths = graph.compile_import_paths(whitelisted_paths)
+            for downstream, upstream in module_pairs:
+                path = graph.find_path(downstream, upstream, ignore_paths=ignore_paths)
+                ...
         """
-        removed_paths = []
+        edges = set()
         for import_path in import_paths:
-            if self._import_path_is_in_networkx_graph(import_path):
-                self._remove_path_from_networkx_graph(import_path)
-                removed_paths.append(import_path)
-        return removed_paths
+            importer_id = self._table.get_id(import_path.importer.name)
+            imported_id = self._table.get_id(import_path.imported.name)
+            if importer_id is not None and imported_id is not None:
+                edges.add((importer_id, imported_id))
+        return CompiledImportPaths(frozenset(edges))
 
-    def _restore_paths_to_networkx_graph(self, import_paths: List[ImportPath]) -> None:
-        for import_path in import_paths:
-            self._add_path_to_networkx_graph(import_path)
+    def _search(self, key: Hashable, search: Callable[[], SearchResult]) -> SearchResult:
+        """
+        Return the result of the search, from the cache if it has already been done.
+
+        The search itself runs without holding the lock, so that other searches aren't held
+        up; if two threads do the same search at once, both results are the same.
+        """
+        with self._search_lock:
+            self.search_count += 1
+            try:
+                result = self._search_cache[key]
+            except KeyError:
+                pass
+            else:
+                self.search_cache_hit_count += 1
+                self._search_cache.move_to_end(key)
+                return result
+        result = search()
+        with self._search_lock:
+            result = self._search_cache.setdefault(key, result)
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > self.MAX_CACHED_SEARCHES:
+                self._search_cache.popitem(last=False)
+            return result
+
+    def _get_excluded_edges(self, ignore_paths: Optional[IgnorePaths]) -> FrozenSet[Edge]:
+        if not ignore_paths:
+            return frozenset()
+        if isinstance(ignore_paths, CompiledImportPaths):
+            return ignore_paths.edges
+        return self.compile_import_paths(ignore_paths).edges
 
     def __contains__(self, item: Any) -> bool:
         """
@@ -138,4 +445,4 @@ class DependencyGraph:
             if module in graph:
                 ...
         """
-        return item in self.modules
+        return isinstance(item, Module) and item.name in self._modules_by_name
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Tuple
 
 from ..module import Module
 
@@ -11,10 +11,19 @@ class ImportPath:
             importer=Module('foo'),
             imported=Module('bar.baz'),
         )
+
+    ImportPaths are immutable.
     """
+    __slots__ = ('importer', 'imported', '_hash')
+
+    importer: Module
+    imported: Module
+    _hash: int
+
     def __init__(self, importer: Module, imported: Module) -> None:
-        self.importer = importer
-        self.imported = imported
+        object.__setattr__(self, 'importer', importer)
+        object.__setattr__(self, 'imported', imported)
+        object.__setattr__(self, '_hash', hash((importer, imported)))
 
     def __str__(self) -> str:
         return "{} <- {}".format(self.importer, self.imported)
@@ -23,10 +32,22 @@ class ImportPath:
         return '<{}: {}>'.format(self.__class__.__name__, self)
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
         if isinstance(other, ImportPath):
-            return (self.importer, self.imported) == (other.importer, other.imported)
+            # Modules are interned, so these are usually compared by identity.
+            return self.importer == other.importer and self.imported == other.imported
         else:
             return False
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return self._hash
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('{} objects are immutable.'.format(self.__class__.__name__))
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('{} objects are immutable.'.format(self.__class__.__name__))
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (ImportPath, (self.importer, self.imported))
@@ -1,40 +1,106 @@
-from typing import List, Iterator
+from typing import Any, List, Iterable, Iterator, Optional, Pattern, Tuple
+from concurrent.futures import ThreadPoolExecutor, Future
 import os
 import logging
+import queue
+import re
+import threading
 
 from ..module import SafeFilenameModule
+from .cache import ScanManifest
 
 
 logger = logging.getLogger(__name__)
 
 
+# The files and subdirectories found directly inside a directory, each sorted by name.
+DirectoryListing = Tuple[List[str], List[str]]
+
+# Skip directories that are hidden, or look like Django migrations.
+DEFAULT_EXCLUDED_DIRECTORIES = ('.*', 'migrations')
+
+# When iterating over modules, they are discovered in the background and handed over in
+# batches of this size, with at most this many batches waiting to be consumed.
+MODULE_BATCH_SIZE = 64
+MAX_PENDING_MODULE_BATCHES = 16
+
+# Marks the end of the items passed from a background thread.
+_FINISHED = object()
+
+
 class PackageScanner:
     """
     Scans a package for all the Python modules within it.
 
+    Subdirectories are listed concurrently using a bounded pool of threads, but the modules
+    are always returned in the same order: depth first, with each directory's files before
+    its subdirectories, and both sorted by name.
+
+    If a cache directory is supplied, the entries of each directory are stored in a scan
+    manifest, and on later scans only directories whose modification time has changed
+    are listed again.
+
+    Directories and files can be excluded using glob patterns. A pattern containing a '/' is
+    matched against the path relative to the package directory (e.g. 'one/generated'),
+    otherwise it is matched against the name alone (e.g. '*_pb2.py'). Excluded directories
+    are not entered at all. Hidden directories and 'migrations' directories are always excluded.
+
+    Args:
+        package: the Python package to scan.
+        max_workers: the maximum number of threads used to list directories. If not supplied,
+                     the ThreadPoolExecutor default is used.
+        cache_dir: the directory in which to store the scan manifest (optional).
+        exclude_directories: glob patterns of directories to exclude (optional).
+        exclude_files: glob patterns of files to exclude (optional).
+
     Usage:
         package = SafeFilenameModule('mypackage', '/path/to/mypackage/__init__.py')
         scanner = PackageScanner(package)
         modules = scanner.scan_for_modules()
+
+        # Alternatively, process each module while the rest of the package is being scanned:
+        for module in scanner.iter_modules():
+            ...
     """
-    def __init__(self, package: SafeFilenameModule) -> None:
+    def __init__(self, package: SafeFilenameModule, max_workers: Optional[int] = None,
+                 cache_dir: Optional[str] = None,
+                 exclude_directories: Optional[Iterable[str]] = None,
+                 exclude_files: Optional[Iterable[str]] = None) -> None:
         self.package = package
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self._manifest: Optional[ScanManifest] = None
+        self._excluded_directories_matcher = _compile_patterns(
+            DEFAULT_EXCLUDED_DIRECTORIES + tuple(exclude_directories or ())
+        )
+        self._excluded_files_matcher = _compile_patterns(exclude_files or ())
 
     def scan_for_modules(self) -> List[SafeFilenameModule]:
         """
         Returns:
             List of module names (list(str, ...)).
         """
-        package_directory = os.path.dirname(self.package.filename)
-        modules: List[SafeFilenameModule] = []
+        return list(self._generate_modules())
+
+    def iter_modules(self) -> Iterator[SafeFilenameModule]:
+        """
+        Yield the modules in the same order as scan_for_modules, while the scan continues
+        in a background thread.
 
+        The scan stays at most a bounded number of modules ahead of the caller, so
+        the caller can process each module while the file system is still being read.
+        """
+        return _iterate_in_background(
+            self._generate_modules(),
+            batch_size=MODULE_BATCH_SIZE,
+            max_pending_batches=MAX_PENDING_MODULE_BATCHES,
+        )
+
+    def _generate_modules(self) -> Iterator[SafeFilenameModule]:
+        package_directory = os.path.dirname(self.package.filename)
         for module_filename in self._get_python_files_inside_package(package_directory):
             module_name = self._module_name_from_filename(module_filename, package_directory)
-            modules.append(
-                SafeFilenameModule(module_name, module_filename)
-            )
-
-        return modules
+            yield SafeFilenameModule(module_name, module_filename)
 
     def _get_python_files_inside_package(self, directory: str) -> Iterator[str]:
         """
@@ -42,27 +108,119 @@ class PackageScanner:
          Return:
             Generator of Python file names.
         """
-        for root, dirs, files in os.walk(directory):
-            # Don't include directories that aren't Python packages,
-            # nor their subdirectories.
-            if '__init__.py' not in files:
-                for d in list(dirs):
-                    dirs.remove(d)
+        if self.cache_dir:
+            self._manifest = ScanManifest(self.cache_dir, directory)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from self._walk_directory(
+                directory, '', self._list_directory(directory), executor)
+
+        if self._manifest:
+            self._manifest.save()
+            self._manifest = None
+
+    def _walk_directory(self, directory: str, relative_directory: str,
+                        listing: DirectoryListing,
+                        executor: ThreadPoolExecutor) -> Iterator[str]:
+        """
+        Yield the Python files inside the supplied directory and its subpackages.
+
+        The listings of any subdirectories are requested from the executor before this
+        directory's files are yielded, so that they can be read while the caller is busy.
+
+        Args:
+            directory: the full path of the directory.
+            relative_directory: the path relative to the package directory, using forward
+                                slashes and with a leading slash (or '' for the package
+                                directory itself).
+            listing: the files and subdirectories inside the directory.
+            executor: the executor used to list subdirectories.
+        """
+        files, subdirectories = listing
+
+        # Don't include directories that aren't Python packages, nor their subdirectories.
+        if '__init__.py' not in files:
+            return
+
+        subdirectory_listings: List[Tuple[str, str, Future]] = []
+        for subdirectory in subdirectories:
+            relative_subdirectory = '{}/{}'.format(relative_directory, subdirectory)
+            if self._should_ignore_dir(relative_subdirectory):
                 continue
+            subdirectory_path = os.path.join(directory, subdirectory)
+            subdirectory_listings.append(
+                (subdirectory_path, relative_subdirectory,
+                 executor.submit(self._list_directory, subdirectory_path))
+            )
 
-            # Don't include hidden directories.
-            dirs_to_remove = [d for d in dirs if self._should_ignore_dir(d)]
-            for d in dirs_to_remove:
-                dirs.remove(d)
+        for filename in files:
+            if self._is_python_file(filename) and not self._should_ignore_file(
+                    '{}/{}'.format(relative_directory, filename)):
+                yield os.path.join(directory, filename)
+
+        for subdirectory_path, relative_subdirectory, future in subdirectory_listings:
+            yield from self._walk_directory(
+                subdirectory_path, relative_subdirectory, future.result(), executor)
+
+    def _list_directory(self, directory: str) -> DirectoryListing:
+        """
+        List the files and subdirectories directly inside the supplied directory, using the
+        scan manifest if the directory hasn't changed since it was last listed.
+        """
+        if not self._manifest:
+            return self._read_directory(directory)
 
-            for filename in files:
-                if self._is_python_file(filename):
-                    yield os.path.join(root, filename)
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return self._read_directory(directory)
 
-    def _should_ignore_dir(self, directory: str) -> bool:
-        # TODO: make this configurable.
-        # Skip adding directories that are hidden, or look like Django migrations.
-        return directory.startswith('.') or directory == 'migrations'
+        listing = self._manifest.get_listing(directory, mtime_ns)
+        if listing is None:
+            listing = self._read_directory(directory)
+        self._manifest.record_listing(directory, mtime_ns, listing)
+        return listing
+
+    def _read_directory(self, directory: str) -> DirectoryListing:
+        """
+        Read the files and subdirectories directly inside the supplied directory from disk.
+
+        The type information cached on each DirEntry is used, so on most platforms no extra
+        stat calls are made. As with os.walk, symbolic links to directories are not followed,
+        and directories that cannot be read are treated as empty.
+        """
+        files: List[str] = []
+        subdirectories: List[str] = []
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_directory = entry.is_dir()
+                    except OSError:
+                        is_directory = False
+                    if not is_directory:
+                        files.append(entry.name)
+                    elif not entry.is_symlink():
+                        subdirectories.append(entry.name)
+        except OSError as e:
+            logger.debug('Could not list directory {}: {}'.format(directory, e))
+        files.sort()
+        subdirectories.sort()
+        return files, subdirectories
+
+    def _should_ignore_dir(self, relative_path: str) -> bool:
+        """
+        Args:
+            relative_path: the path relative to the package directory, e.g. '/one/two'.
+        """
+        return bool(self._excluded_directories_matcher.match(relative_path))
+
+    def _should_ignore_file(self, relative_path: str) -> bool:
+        """
+        Args:
+            relative_path: the path relative to the package directory, e.g. '/one/two.py'.
+        """
+        return bool(self._excluded_files_matcher.match(relative_path))
 
     def _is_python_file(self, filename: str) -> bool:
         """
@@ -90,3 +248,116 @@ class PackageScanner:
         if components[-1] == '__init__':
             components.pop()
         return '.'.join(components)
+
+
+def _compile_patterns(patterns: Iterable[str]) -> Pattern:
+    """
+    Compile glob patterns into a single regular expression that matches relative paths,
+    in the form '/one/two', that match any of the patterns.
+
+    Patterns containing a '/' are anchored to the package directory; other patterns may
+    match the last component of the path at any depth.
+    """
+    regexes = []
+    for pattern in patterns:
+        if '/' in pattern:
+            regexes.append('/' + _translate_glob(pattern.strip('/')))
+        else:
+            regexes.append('.*/' + _translate_glob(pattern))
+    if not regexes:
+        # A regular expression that never matches.
+        return re.compile(r'(?!)')
+    return re.compile(r'(?:{})\Z'.format('|'.join(regexes)))
+
+
+def _translate_glob(pattern: str) -> str:
+    """
+    Translate a glob pattern into a regular expression.
+
+    Unlike fnmatch, '*' and '?' do not match '/', so they stay within a single path
+    component; '**' matches across components.
+    """
+    regex = ''
+    index = 0
+    while index < len(pattern):
+        character = pattern[index]
+        index += 1
+        if character == '*':
+            if pattern[index:index + 1] == '*':
+                index += 1
+                regex += '.*'
+            else:
+                regex += '[^/]*'
+        elif character == '?':
+            regex += '[^/]'
+        elif character == '[':
+            # Allow ']' as the first character in the set, as fnmatch does.
+            end = index
+            if pattern[end:end + 1] == '!':
+                end += 1
+            if pattern[end:end + 1] == ']':
+                end += 1
+            end = pattern.find(']', end)
+            if end == -1:
+                regex += re.escape(character)
+                continue
+            characters = pattern[index:end].replace('\\', '\\\\')
+            index = end + 1
+            if characters.startswith('!'):
+                characters = '^' + characters[1:]
+            elif characters.startswith('^'):
+                characters = '\\' + characters
+            regex += '[{}]'.format(characters)
+        else:
+            regex += re.escape(character)
+    return regex
+
+
+def _iterate_in_background(iterable: Iterable[Any], batch_size: int,
+                           max_pending_batches: int) -> Iterator[Any]:
+    """
+    Yield the items from the iterable, which is consumed in a background thread.
+
+    Items are passed between the threads in batches, through a bounded queue. Any exception
+    raised in the background thread is re-raised in the caller. If the caller stops iterating
+    early, the background thread stops too.
+    """
+    batches: queue.Queue = queue.Queue(maxsize=max_pending_batches)
+    is_stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        # Don't block indefinitely, in case the caller has stopped iterating.
+        while not is_stopped.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def produce() -> None:
+        batch: List[Any] = []
+        try:
+            for item in iterable:
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    if not put((batch, None)):
+                        return
+                    batch = []
+        except BaseException as e:
+            put((batch, e))
+        else:
+            put((batch, _FINISHED))
+
+    producer = threading.Thread(target=produce, name='layer-linter-scanner', daemon=True)
+    producer.start()
+    try:
+        while True:
+            batch, outcome = batches.get()
+            yield from batch
+            if outcome is _FINISHED:
+                return
+            elif outcome is not None:
+                raise outcome
+    finally:
+        is_stopped.set()
@@ -0,0 +1,285 @@
+from typing import IO, Callable, Dict, List, Optional, Sequence, Tuple, Union
+from array import array
+import logging
+import mmap
+import os
+import struct
+import sys
+
+from .. import __version__
+from .cache import write_file_atomically
+from .engine import ARRAY_TYPECODE, CompactGraph
+
+
+logger = logging.getLogger(__name__)
+
+
+class GraphSnapshot:
+    """
+    The modules in a dependency graph and the imports between them, saved in a binary file
+    along with the state of each module's file, so that the graph can be loaded again rather
+    than built from scratch.
+
+    The file is memory mapped when loaded, and the arrays of the graph engine are used
+    directly from it, so loading takes very little time or memory however large the graph.
+
+    The state of each file is its filename, its modification time and size, and if it was
+    unchanged from the git index when saved, its git blob id. A file is unchanged if its
+    module still has the same filename, and either its blob id or both its modification time
+    and size still match. (As with the scan manifest, the modification times of files changed
+    very shortly before the graph was built aren't trusted.) The filename matters because a
+    module moved into a package's __init__.py, with the same contents, resolves its relative
+    imports differently.
+
+    The file is laid out as a header, followed by these sections, each padded to a multiple
+    of eight bytes:
+
+        - the key, encoded as UTF-8;
+        - the module names, encoded as UTF-8 (keeping any surrogate escaped bytes from
+          their filenames) and joined together;
+        - the offsets of each module name within the joined names;
+        - the filenames of the modules, encoded with os.fsencode and joined together;
+        - the offsets of each filename within the joined filenames;
+        - the modification time of each module's file, in nanoseconds;
+        - the size of each module's file;
+        - the 20 byte git blob id of each module's file, or zeros if it isn't known;
+        - the arrays of the graph engine, in the order given by CompactGraph.get_arrays.
+
+    Args:
+        module_names: the names of the modules, in order of id.
+        graph: the graph engine holding the imports between the modules.
+
+    Usage:
+        GraphSnapshot(module_names, graph).save(filename, key, filenames, git_blob_ids,
+                                                started_ns)
+        ...
+        snapshot = GraphSnapshot.load(filename, key)
+        if snapshot and snapshot.is_file_unchanged(module_id, filename, blob_id):
+            ...
+    """
+    VERSION = 1
+
+    # The magic number, format version, byte length of the key, names and filenames, and the
+    # numbers of modules and imports.
+    HEADER = struct.Struct('<8sIIQQQQ')
+    MAGIC_NUMBER = b'LLGRAPH\0'
+
+    BLOB_ID_SIZE = 20
+    UNKNOWN_BLOB_ID = bytes(BLOB_ID_SIZE)
+    # Recorded in place of the size of a file whose modification time isn't trusted.
+    UNKNOWN_SIZE = -1
+
+    # Files modified this many seconds or fewer before the graph was built may have been
+    # modified again within the granularity of the filesystem's timestamps.
+    RACY_INTERVAL_SECONDS = 2
+
+    def __init__(self, module_names: List[str], graph: CompactGraph,
+                 mtimes: Optional[Sequence[int]] = None,
+                 sizes: Optional[Sequence[int]] = None,
+                 blob_ids: Optional[memoryview] = None,
+                 filenames: Optional[memoryview] = None,
+                 filename_offsets: Optional[Sequence[int]] = None) -> None:
+        self.module_names = module_names
+        self.graph = graph
+        self._filenames = filenames
+        self._filename_offsets = filename_offsets
+        self._mtimes = mtimes
+        self._sizes = sizes
+        self._blob_ids = blob_ids
+
+    @classmethod
+    def load(cls, filename: str, key: str) -> Optional['GraphSnapshot']:
+        """
+        Return the snapshot saved in the file, or None if it is missing, can't be read, or was
+        saved with a different key or by a different version of Layer Linter or Python.
+        """
+        try:
+            with open(filename, 'rb') as file:
+                data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.debug('Could not read graph snapshot {}: {}'.format(filename, e))
+            return None
+        try:
+            return cls._read(memoryview(data), key)
+        except (ValueError, TypeError, struct.error) as e:
+            logger.debug('Could not read graph snapshot {}: {}'.format(filename, e))
+            return None
+
+    def save(self, filename: str, key: str, filenames: Sequence[str],
+             git_blob_ids: Dict[str, str], started_ns: int) -> None:
+        """
+        Write the snapshot to the file, recording the current state of each module's file.
+
+        Args:
+            filename: the file to write.
+            key: a string identifying everything that affects how the graph is built.
+            filenames: the filename of each module, in order of id.
+            git_blob_ids: the git blob ids of files known to match the git index, keyed by
+                          filename.
+            started_ns: the time the graph started being built, in nanoseconds.
+        """
+        racy_threshold_ns = started_ns - self.RACY_INTERVAL_SECONDS * 10 ** 9
+        mtimes = array('q')
+        sizes = array('q')
+        blob_ids = bytearray()
+        for module_filename in filenames:
+            try:
+                stat = os.stat(module_filename)
+            except OSError:
+                mtime, size = 0, self.UNKNOWN_SIZE
+            else:
+                mtime = stat.st_mtime_ns
+                size = stat.st_size if mtime < racy_threshold_ns else self.UNKNOWN_SIZE
+            mtimes.append(mtime)
+            sizes.append(size)
+            blob_id = git_blob_ids.get(module_filename)
+            blob_ids += bytes.fromhex(blob_id) if blob_id else self.UNKNOWN_BLOB_ID
+
+        names, name_offsets = _join_strings(self.module_names)
+        joined_filenames, filename_offsets = _join_strings(filenames, encode=os.fsencode)
+        encoded_key = self._get_full_key(key).encode('utf-8', 'surrogateescape')
+
+        def write(file: IO) -> None:
+            file.write(self.HEADER.pack(
+                self.MAGIC_NUMBER, self.VERSION, len(encoded_key), len(names),
+                len(joined_filenames), len(self.module_names), self.graph.edge_count,
+            ))
+            sections: List[Union[bytes, bytearray, array, memoryview]] = [
+                encoded_key, names, name_offsets, joined_filenames, filename_offsets, mtimes,
+                sizes, blob_ids,
+            ]
+            sections.extend(self.graph.get_arrays())
+            for section in sections:
+                section_bytes = memoryview(section).cast('B')
+                file.write(section_bytes)
+                file.write(bytes(_get_padding(len(section_bytes))))
+
+        write_file_atomically(filename, write)
+
+    def is_file_unchanged(self, module_id: int, filename: str,
+                          blob_id: Optional[str] = None) -> bool:
+        """
+        Return whether the module's file is unchanged since the snapshot was saved.
+
+        Args:
+            module_id: the id of the module.
+            filename: the module's filename.
+            blob_id: the git blob id of the file, if known to match the git index (optional).
+        """
+        if (self._mtimes is None or self._sizes is None or self._blob_ids is None
+                or self._filenames is None or self._filename_offsets is None):
+            # The snapshot hasn't been saved.
+            return False
+        saved_filename = self._filenames[
+            self._filename_offsets[module_id]:self._filename_offsets[module_id + 1]]
+        if saved_filename != os.fsencode(filename):
+            # The module has moved, such as into a package's __init__.py.
+            return False
+        if blob_id is not None:
+            start = module_id * self.BLOB_ID_SIZE
+            if self._blob_ids[start:start + self.BLOB_ID_SIZE] == bytes.fromhex(blob_id):
+                return True
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return False
+        return (stat.st_size == self._sizes[module_id]
+                and stat.st_mtime_ns == self._mtimes[module_id])
+
+    @classmethod
+    def _read(cls, data: memoryview, key: str) -> Optional['GraphSnapshot']:
+        (magic_number, version, key_size, names_size, filenames_size, module_count,
+         edge_count) = cls.HEADER.unpack_from(data)
+        if magic_number != cls.MAGIC_NUMBER or version != cls.VERSION:
+            return None
+        reader = _SectionReader(data, cls.HEADER.size)
+        encoded_key = cls._get_full_key(key).encode('utf-8', 'surrogateescape')
+        if bytes(reader.read(key_size)) != encoded_key:
+            return None
+
+        names = bytes(reader.read(names_size)).decode('utf-8', 'surrogateescape')
+        name_offsets = reader.read_array('q', module_count + 1)
+        # The offsets are of the encoded names, so only match the string if it's all ASCII.
+        if len(names) != names_size:
+            names_bytes = _encode_name(names)
+            module_names = [
+                names_bytes[name_offsets[index]:name_offsets[index + 1]].decode(
+                    'utf-8', 'surrogateescape')
+                for index in range(module_count)
+            ]
+        else:
+            module_names = [
+                names[name_offsets[index]:name_offsets[index + 1]]
+                for index in range(module_count)
+            ]
+        filenames = reader.read(filenames_size)
+        filename_offsets = reader.read_array('q', module_count + 1)
+        mtimes = reader.read_array('q', module_count)
+        sizes = reader.read_array('q', module_count)
+        blob_ids = reader.read(module_count * cls.BLOB_ID_SIZE)
+        graph = CompactGraph(
+            module_count,
+            reader.read_array(ARRAY_TYPECODE, module_count + 1),
+            reader.read_array(ARRAY_TYPECODE, edge_count),
+            reader.read_array(ARRAY_TYPECODE, module_count + 1),
+            reader.read_array(ARRAY_TYPECODE, edge_count),
+        )
+        return cls(module_names, graph, mtimes=mtimes, sizes=sizes, blob_ids=blob_ids,
+                   filenames=filenames, filename_offsets=filename_offsets)
+
+    @staticmethod
+    def _get_full_key(key: str) -> str:
+        # The arrays are stored in the native format, so they can be used without conversion.
+        return '\n'.join([
+            key, __version__, sys.implementation.name, str(sys.version_info[:2]),
+            sys.byteorder, str(array(ARRAY_TYPECODE).itemsize),
+        ])
+
+
+class _SectionReader:
+    """
+    Reads the padded sections of a graph snapshot in turn.
+    """
+    def __init__(self, data: memoryview, offset: int) -> None:
+        self._data = data
+        self._offset = offset
+
+    def read(self, size: int) -> memoryview:
+        if self._offset + size > len(self._data):
+            raise ValueError('The file is too short.')
+        section = self._data[self._offset:self._offset + size]
+        self._offset += size + _get_padding(size)
+        return section
+
+    def read_array(self, typecode: str, length: int) -> memoryview:
+        return self.read(length * array(typecode).itemsize).cast(typecode)  # type: ignore
+
+
+def _encode_name(name: str) -> bytes:
+    """
+    Encode a module name as UTF-8.
+
+    Module names come from filenames, which os.scandir decodes with surrogate escapes if they
+    aren't valid UTF-8, so those bytes are encoded back as they were.
+    """
+    return name.encode('utf-8', 'surrogateescape')
+
+
+def _join_strings(strings: Sequence[str],
+                  encode: Callable[[str], bytes] = _encode_name) -> Tuple[bytes, array]:
+    """
+    Return the strings encoded and joined together, along with the offset of each within the
+    joined bytes (and the offset of the end).
+    """
+    encoded_strings = [encode(string) for string in strings]
+    offsets = array('q', [0])
+    for encoded_string in encoded_strings:
+        offsets.append(offsets[-1] + len(encoded_string))
+    return b''.join(encoded_strings), offsets
+
+
+def _get_padding(size: int) -> int:
+    """
+    Return the number of bytes needed to pad a section of the size to a multiple of eight.
+    """
+    return -size % 8
@@ -0,0 +1,88 @@
+from typing import Iterator, List
+import sqlite3
+
+from .extraction import RawImport
+
+
+class SqliteImportStore:
+    """
+    Holds the raw imports found in each module in a temporary SQLite database on disk, rather
+    than in memory.
+
+    Imports can only be resolved once every module in the package has been read, so the raw
+    imports of every module must be held until then. For very large packages they take up
+    much more memory than the finished graph; storing them on disk keeps the memory used
+    bounded, at the cost of speed.
+
+    Modules are identified by their position in the order they were read, and the store is
+    used in the same way as a list of each module's raw imports. The database is deleted when
+    the store is closed or garbage collected.
+
+    Usage:
+        store = SqliteImportStore()
+        store.append(raw_imports)
+        ...
+        for raw_imports in store:
+            ...
+    """
+    def __init__(self) -> None:
+        # An empty filename creates a private database in a temporary file.
+        self._connection = sqlite3.connect('')
+        self._connection.executescript(
+            'PRAGMA journal_mode = OFF;'
+            'PRAGMA synchronous = OFF;'
+            'CREATE TABLE raw_imports ('
+            '    position INTEGER NOT NULL, level INTEGER NOT NULL, module TEXT NOT NULL,'
+            '    name TEXT'
+            ');'
+            'CREATE INDEX raw_imports_position ON raw_imports (position);'
+        )
+        self._length = 0
+
+    def append(self, raw_imports: List[RawImport]) -> None:
+        """
+        Add the raw imports of the next module.
+        """
+        self._insert(self._length, raw_imports)
+        self._length += 1
+
+    def __setitem__(self, position: int, raw_imports: List[RawImport]) -> None:
+        """
+        Set the raw imports of a module that was appended with none, such as a placeholder
+        for imports still being found.
+        """
+        if not 0 <= position < self._length:
+            raise IndexError('Position {} is out of range.'.format(position))
+        self._insert(position, raw_imports)
+
+    def __iter__(self) -> Iterator[List[RawImport]]:
+        """
+        Yield the raw imports of each module in turn, in the order they appear in the module.
+        """
+        cursor = self._connection.execute(
+            'SELECT position, level, module, name FROM raw_imports ORDER BY position, rowid')
+        next_position = 0
+        raw_imports: List[RawImport] = []
+        for position, level, module, name in cursor:
+            while next_position < position:
+                yield raw_imports
+                raw_imports = []
+                next_position += 1
+            raw_imports.append((level, module, name))
+        while next_position < self._length:
+            yield raw_imports
+            raw_imports = []
+            next_position += 1
+
+    def __len__(self) -> int:
+        return self._length
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def _insert(self, position: int, raw_imports: List[RawImport]) -> None:
+        if raw_imports:
+            self._connection.executemany(
+                'INSERT INTO raw_imports VALUES (?, ?, ?, ?)',
+                [(position, level, module, name) for level, module, name in raw_imports],
+            )
@@ -0,0 +1,55 @@
+from typing import Dict, Iterable, List, Optional
+
+from ..module import Module
+
+
+class ModuleTable:
+    """
+    The names of the modules in a package, each assigned a dense integer id in the order it
+    was added.
+
+    A single table is shared by everything that builds and searches a dependency graph, so
+    that modules can be passed between them as ids, and only looked up by name at the edges.
+
+    Args:
+        names: the names of any modules to add straight away, in order of id (optional).
+
+    Usage:
+        table = ModuleTable()
+        module_id = table.add('mypackage.foo')
+        assert table.get_id('mypackage.foo') == module_id
+        assert table.get_module(module_id) == Module('mypackage.foo')
+    """
+    def __init__(self, names: Iterable[str] = ()) -> None:
+        # The name of each module, in order of id.
+        self.names: List[str] = []
+        # The id of each module, keyed by name.
+        self.ids: Dict[str, int] = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str) -> int:
+        """
+        Return the id of the module with the name, adding it if it isn't already in the table.
+        """
+        try:
+            return self.ids[name]
+        except KeyError:
+            module_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+            return module_id
+
+    def get_id(self, name: str) -> Optional[int]:
+        """
+        Return the id of the module with the name, or None if it isn't in the table.
+        """
+        return self.ids.get(name)
+
+    def get_module(self, module_id: int) -> Module:
+        return Module(self.names[module_id])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.ids
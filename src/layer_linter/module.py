@@ -1,16 +1,38 @@
-from typing import Any
+from typing import Any, Dict, Tuple
 
 
 class Module:
     """
     A Python module.
+
+    Modules are immutable, and interned: there is only ever one Module with a given name, so
+    creating one that already exists returns the existing instance. (SafeFilenameModules are
+    not interned, but are equal to the Module with the same name.)
+
+    Args:
+        name: The fully qualified name of a Python module, e.g. 'package.foo.bar'.
     """
-    def __init__(self, name: str) -> None:
-        """
-        Args:
-            name: The fully qualified name of a Python module, e.g. 'package.foo.bar'.
-        """
-        self.name = name
+    __slots__ = ('name', '_hash')
+
+    name: str
+    _hash: int
+
+    # Each interned Module, keyed by name.
+    _interned: Dict[str, 'Module'] = {}
+
+    def __new__(cls, name: str, *args: Any, **kwargs: Any) -> 'Module':
+        if cls is Module:
+            try:
+                return Module._interned[name]
+            except KeyError:
+                pass
+        module = super().__new__(cls)
+        object.__setattr__(module, 'name', name)
+        # Hashing a module hashes its name, so the hash only needs working out once.
+        object.__setattr__(module, '_hash', hash(name))
+        if cls is Module:
+            module = Module._interned.setdefault(name, module)
+        return module
 
     def __str__(self) -> str:
         return self.name
@@ -19,6 +41,8 @@ class Module:
         return "<{}: {}>".format(self.__class__.__name__, self)
 
     def __eq__(self, other: Any) -> bool:
+        if self is other:
+            return True
         # Only other Module instances with the same name are equal to each other.
         if isinstance(other, Module):
             return self.name == other.name
@@ -26,19 +50,34 @@ class Module:
             return False
 
     def __hash__(self) -> int:
-        return hash(str(self))
+        return self._hash
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError('{} objects are immutable.'.format(self.__class__.__name__))
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError('{} objects are immutable.'.format(self.__class__.__name__))
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Create the Module again by name when unpickled, so it is interned.
+        return (Module, (self.name,))
 
 
 class SafeFilenameModule(Module):
     """
     A Python module whose filename can be known safely, without importing the code.
+
+    Args:
+        name: The fully qualified name of a Python module, e.g. 'package.foo.bar'.
+        filename: The full filename and path to the Python file,
+        e.g. '/path/to/package/one.py'.
     """
+    __slots__ = ('filename',)
+
+    filename: str
+
     def __init__(self, name: str, filename: str) -> None:
-        """
-        Args:
-            name: The fully qualified name of a Python module, e.g. 'package.foo.bar'.
-            filename: The full filename and path to the Python file,
-            e.g. '/path/to/package/one.py'.
-        """
-        self.filename = filename
-        super().__init__(name)
+        object.__setattr__(self, 'filename', filename)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return (SafeFilenameModule, (self.name, self.filename))
@@ -1,8 +1,16 @@
 from typing import Tuple, List
+import compileall
 import os
+import shutil
+from unittest.mock import patch
+
+import pytest
 
 from layer_linter.dependencies.analysis import DependencyAnalyzer
+from layer_linter.dependencies.cache import ImportCache
 from layer_linter.dependencies.path import ImportPath
+from layer_linter.dependencies.scanner import PackageScanner
+from layer_linter.dependencies.store import SqliteImportStore
 from layer_linter.module import Module, SafeFilenameModule
 
 
@@ -45,6 +53,56 @@ class TestDependencyAnalyzer:
 
         assert set(import_paths) == set(expected_import_paths)
 
+    def test_modules_can_be_streamed(self):
+        package = Module('initfileimports')
+        modules = self._build_modules(
+            package_name=package.name,
+            tuples=(
+                ('initfileimports', '__init__.py'),
+                ('initfileimports.one', 'one/__init__.py'),
+                ('initfileimports.one.alpha', 'one/alpha.py'),
+            ),
+        )
+
+        analyzer = DependencyAnalyzer((module for module in modules), package)
+        import_paths = list(analyzer.iter_import_paths())
+
+        assert import_paths == self._build_import_paths(
+            tuples=(
+                ('initfileimports.one', 'initfileimports.one.alpha'),
+            )
+        )
+        assert analyzer.modules == modules
+
+    def test_imported_ids(self):
+        package = Module('analyzerpackage')
+        modules = self._build_modules(
+            package_name=package.name,
+            tuples=(
+                ('analyzerpackage', '__init__.py'),
+                ('analyzerpackage.utils', 'utils.py'),
+                ('analyzerpackage.one', 'one/__init__.py'),
+                ('analyzerpackage.one.alpha', 'one/alpha.py'),
+                ('analyzerpackage.two', 'two/__init__.py'),
+                ('analyzerpackage.two.alpha', 'two/alpha.py'),
+            ),
+        )
+
+        analyzer = DependencyAnalyzer(modules, package)
+        imported_ids = list(analyzer.iter_imported_ids())
+
+        # Each module has an id in the order it was supplied, including those that import
+        # nothing.
+        assert analyzer.module_table.names == [module.name for module in modules]
+        assert imported_ids == [
+            (0, []),
+            (1, [2, 5]),
+            (2, []),
+            (3, []),
+            (4, []),
+            (5, [3]),
+        ]
+
     def test_all_different_import_types(self):
         """
         Test a single file with lots of different import types. Note that all of the other
@@ -123,6 +181,265 @@ class TestDependencyAnalyzer:
 
         assert set(import_paths) == set(expected_import_paths)
 
+    def test_duplicate_imports_are_only_included_once(self, tmpdir):
+        package_directory = tmpdir.mkdir('duplicates')
+        package_directory.join('__init__.py').write('')
+        package_directory.join('one.py').write('def foo(): pass\ndef bar(): pass\n')
+        package_directory.join('two.py').write(
+            'from . import one\n'
+            'from .one import foo, bar\n'
+            'import duplicates.one\n'
+            'def baz():\n'
+            '    from . import one\n'
+        )
+        package = Module('duplicates')
+        modules = [
+            SafeFilenameModule(name, str(package_directory.join(filename)))
+            for name, filename in (
+                ('duplicates', '__init__.py'),
+                ('duplicates.one', 'one.py'),
+                ('duplicates.two', 'two.py'),
+            )
+        ]
+
+        import_paths = DependencyAnalyzer(modules, package).determine_import_paths()
+
+        assert import_paths == self._build_import_paths(
+            tuples=(
+                ('duplicates.two', 'duplicates.one'),
+            )
+        )
+
+    @pytest.mark.parametrize('jobs', (1, 2))
+    def test_low_memory_matches_default(self, jobs):
+        package = Module('differentimporttypes')
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name)
+        )
+        modules = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+
+        import_paths = DependencyAnalyzer(modules, package).determine_import_paths()
+        low_memory_import_paths = DependencyAnalyzer(
+            iter(modules), package, jobs=jobs, low_memory=True).determine_import_paths()
+
+        assert import_paths
+        assert low_memory_import_paths == import_paths
+
+    def test_low_memory_store_is_closed(self):
+        package = Module('differentimporttypes')
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name)
+        )
+        modules = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+
+        with patch.object(SqliteImportStore, 'close', autospec=True,
+                          side_effect=SqliteImportStore.close) as mock_close:
+            analyzer = DependencyAnalyzer(iter(modules), package, low_memory=True)
+            import_paths = analyzer.iter_import_paths()
+            next(import_paths)
+            mock_close.assert_not_called()
+            list(import_paths)
+
+        mock_close.assert_called_once_with(analyzer._raw_imports_by_module)
+
+    @pytest.mark.parametrize('package_name', ('analyzerpackage', 'differentimporttypes'))
+    def test_parallel_parsing_matches_serial_parsing(self, package_name):
+        package = Module(package_name)
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package_name,
+                         package_name)
+        )
+        modules = PackageScanner(
+            SafeFilenameModule(package_name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+
+        serial_import_paths = DependencyAnalyzer(modules, package).determine_import_paths()
+        parallel_analyzer = DependencyAnalyzer(iter(modules), package, jobs=2)
+        parallel_import_paths = parallel_analyzer.determine_import_paths()
+
+        assert serial_import_paths
+        assert parallel_import_paths == serial_import_paths
+        assert parallel_analyzer.modules == modules
+
+    def test_parallel_parsing_while_scanning(self):
+        package = Module('analyzerpackage')
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name)
+        )
+        scanner = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        )
+        serial_import_paths = DependencyAnalyzer(
+            scanner.scan_for_modules(), package).determine_import_paths()
+
+        # The scanner's threads are still running as the processes start, so they mustn't be
+        # forked from this one.
+        with patch('os.fork', side_effect=AssertionError('Process was forked.')):
+            parallel_import_paths = DependencyAnalyzer(
+                scanner.iter_modules(), package, jobs=2).determine_import_paths()
+
+        assert serial_import_paths
+        assert parallel_import_paths == serial_import_paths
+
+    def test_parallel_parsing_without_cache_leaves_reading_to_workers(self):
+        package = Module('differentimporttypes')
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name)
+        )
+        modules = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+
+        with patch.object(ImportCache, 'hash_source') as mock_hash_source:
+            with patch.object(DependencyAnalyzer, '_read_source') as mock_read_source:
+                import_paths = DependencyAnalyzer(
+                    iter(modules), package, jobs=2).determine_import_paths()
+
+        assert import_paths
+        mock_hash_source.assert_not_called()
+        mock_read_source.assert_not_called()
+
+    @pytest.mark.parametrize('jobs', (1, 2))
+    def test_cached_imports_are_not_parsed_again(self, tmpdir, jobs):
+        package = Module('differentimporttypes')
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name)
+        )
+        modules = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+        cache_dir = str(tmpdir)
+        import_paths = DependencyAnalyzer(
+            modules, package, cache_dir=cache_dir).determine_import_paths()
+
+        with patch('layer_linter.dependencies.analysis.extract_imports') as mock_extract:
+            with patch('layer_linter.dependencies.analysis.'
+                       'extract_imports_from_files') as mock_extract_from_files:
+                cached_import_paths = DependencyAnalyzer(
+                    iter(modules), package, jobs=jobs, cache_dir=cache_dir,
+                ).determine_import_paths()
+
+        assert import_paths
+        assert cached_import_paths == import_paths
+        mock_extract.assert_not_called()
+        mock_extract_from_files.assert_not_called()
+
+    def test_files_with_git_blob_ids_are_not_read_when_cached(self, tmpdir):
+        package = Module('differentimporttypes')
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name)
+        )
+        modules = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+        git_blob_ids = {}
+        for module in modules:
+            with open(module.filename, 'rb') as file:
+                git_blob_ids[module.filename] = ImportCache.hash_source(file.read())
+        cache_dir = str(tmpdir)
+        import_paths = DependencyAnalyzer(
+            modules, package, cache_dir=cache_dir).determine_import_paths()
+
+        with patch.object(DependencyAnalyzer, '_read_source') as mock_read_source:
+            cached_import_paths = DependencyAnalyzer(
+                modules, package, cache_dir=cache_dir, git_blob_ids=git_blob_ids,
+            ).determine_import_paths()
+
+        assert cached_import_paths == import_paths
+        mock_read_source.assert_not_called()
+
+    def test_files_with_git_blob_ids_are_read_by_workers(self, tmpdir):
+        package = Module('differentimporttypes')
+        package_path = os.path.abspath(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name)
+        )
+        modules = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+        git_blob_ids = {}
+        for module in modules:
+            with open(module.filename, 'rb') as file:
+                git_blob_ids[module.filename] = ImportCache.hash_source(file.read())
+        import_paths = DependencyAnalyzer(modules, package).determine_import_paths()
+
+        # The blob ids are the cache keys, so the files needn't be read to be hashed.
+        with patch.object(DependencyAnalyzer, '_read_source') as mock_read_source:
+            parallel_import_paths = DependencyAnalyzer(
+                iter(modules), package, jobs=2, cache_dir=str(tmpdir),
+                git_blob_ids=git_blob_ids,
+            ).determine_import_paths()
+
+        assert parallel_import_paths == import_paths
+        mock_read_source.assert_not_called()
+
+    def test_imports_can_be_read_from_bytecode(self, tmpdir):
+        package = Module('differentimporttypes')
+        package_path = str(tmpdir.join(package.name))
+        shutil.copytree(
+            os.path.join(os.path.dirname(__file__), '..', '..', 'assets', package.name,
+                         package.name),
+            package_path,
+        )
+        compileall.compile_dir(package_path, quiet=1)
+        modules = PackageScanner(
+            SafeFilenameModule(package.name, os.path.join(package_path, '__init__.py'))
+        ).scan_for_modules()
+        import_paths = DependencyAnalyzer(modules, package).determine_import_paths()
+
+        with patch('layer_linter.dependencies.analysis.extract_imports') as mock_extract:
+            bytecode_import_paths = DependencyAnalyzer(
+                modules, package, use_bytecode=True).determine_import_paths()
+
+        assert bytecode_import_paths == import_paths
+        mock_extract.assert_not_called()
+
+    @pytest.mark.parametrize('skip_large_files, expected_imported', (
+        (False, ['large.one']),
+        (True, []),
+    ))
+    def test_large_files_are_not_parsed(self, tmpdir, caplog, skip_large_files,
+                                        expected_imported):
+        package_directory = tmpdir.mkdir('large')
+        package_directory.join('__init__.py').write('')
+        package_directory.join('one.py').write('')
+        package_directory.join('two.py').write('')
+        package_directory.join('generated.py').write(
+            'from . import one\n'
+            'TABLE = [\n' + '    "row",\n' * 1000 + ']\n'
+            'from . import two\n'
+        )
+        package = Module('large')
+        modules = [
+            SafeFilenameModule(name, str(package_directory.join(filename)))
+            for name, filename in (
+                ('large', '__init__.py'),
+                ('large.one', 'one.py'),
+                ('large.two', 'two.py'),
+                ('large.generated', 'generated.py'),
+            )
+        ]
+
+        import_paths = DependencyAnalyzer(
+            modules, package, max_file_size=1000, skip_large_files=skip_large_files,
+        ).determine_import_paths()
+
+        assert import_paths == self._build_import_paths(
+            tuples=[('large.generated', imported) for imported in expected_imported]
+        )
+        assert skip_large_files == any(
+            'Skipping' in record.message for record in caplog.records)
+
     def _build_modules(self,
                        package_name: str,
                        tuples: Tuple[Tuple[str, str]]) -> List[SafeFilenameModule]:
@@ -0,0 +1,66 @@
+import glob
+import importlib.util
+import os
+import py_compile
+import shutil
+import sys
+
+import pytest
+
+from layer_linter.dependencies.bytecode import extract_imports_from_bytecode
+from layer_linter.dependencies.extraction import extract_imports
+
+
+ASSETS_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'assets')
+)
+
+
+@pytest.fixture
+def package_directory(tmpdir):
+    """
+    A copy of a package with up to date bytecode for each module.
+    """
+    directory = str(tmpdir.join('differentimporttypes'))
+    shutil.copytree(os.path.join(ASSETS_DIRECTORY, 'differentimporttypes',
+                                 'differentimporttypes'), directory)
+    # Enough constants that the indexes of the later ones need an EXTENDED_ARG prefix.
+    with open(os.path.join(directory, 'many_constants.py'), 'w') as file:
+        file.write(''.join('VALUE_{0} = {0}\n'.format(i) for i in range(300)))
+        file.write('from .one import alpha as a, beta\n')
+    for filename in glob.glob(os.path.join(directory, '**', '*.py'), recursive=True):
+        py_compile.compile(filename, doraise=True)
+    return directory
+
+
+def test_imports_match_source(package_directory):
+    filenames = glob.glob(os.path.join(package_directory, '**', '*.py'), recursive=True)
+
+    for filename in filenames:
+        with open(filename, 'rb') as file:
+            source = file.read()
+        assert extract_imports_from_bytecode(filename) == extract_imports(source)
+
+
+def test_stale_bytecode_is_not_used(package_directory):
+    filename = os.path.join(package_directory, 'one', 'importer.py')
+    with open(filename, 'a') as file:
+        file.write('import differentimporttypes.five\n')
+
+    assert extract_imports_from_bytecode(filename) is None
+
+
+def test_missing_bytecode(package_directory):
+    filename = os.path.join(package_directory, 'one', 'importer.py')
+    os.remove(importlib.util.cache_from_source(filename))
+
+    assert extract_imports_from_bytecode(filename) is None
+
+
+@pytest.mark.skipif(sys.version_info < (3, 7), reason='Hash-based .pyc files need Python 3.7.')
+def test_hash_based_bytecode_is_not_used(package_directory):
+    filename = os.path.join(package_directory, 'one', 'importer.py')
+    py_compile.compile(filename, doraise=True,
+                       invalidation_mode=py_compile.PycInvalidationMode.CHECKED_HASH)
+
+    assert extract_imports_from_bytecode(filename) is None
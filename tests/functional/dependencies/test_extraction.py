@@ -0,0 +1,26 @@
+import glob
+import os
+
+import pytest
+
+from layer_linter.dependencies.extraction import (
+    _extract_imports_lexically, _extract_imports_with_ast)
+
+
+ASSETS_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'assets')
+)
+SOURCE_DIRECTORY = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', '..', 'src')
+)
+
+
+@pytest.mark.parametrize('filename', sorted(
+    glob.glob(os.path.join(ASSETS_DIRECTORY, '**', '*.py'), recursive=True)
+    + glob.glob(os.path.join(SOURCE_DIRECTORY, '**', '*.py'), recursive=True)
+))
+def test_lexical_scan_matches_parsing(filename):
+    with open(filename, 'rb') as file:
+        source = file.read()
+
+    assert _extract_imports_lexically(source) == _extract_imports_with_ast(source)
@@ -0,0 +1,61 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from layer_linter.dependencies.cache import ImportCache
+from layer_linter.dependencies.git import get_unchanged_blob_ids
+
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='git is not installed.')
+
+
+def _git(directory, *args):
+    subprocess.run(['git'] + list(args), cwd=directory, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@pytest.fixture
+def repository(tmpdir):
+    directory = str(tmpdir.mkdir('repository'))
+    _git(directory, 'init')
+    package_directory = os.path.join(directory, 'mypackage')
+    os.makedirs(os.path.join(package_directory, 'sub'))
+    for filename, contents in (
+        ('__init__.py', b''),
+        ('committed.py', b'import os\n'),
+        ('modified.py', b'import sys\n'),
+        (os.path.join('sub', 'staged.py'), b'from . import foo\n'),
+    ):
+        with open(os.path.join(package_directory, filename), 'wb') as file:
+            file.write(contents)
+    _git(directory, 'add', '.')
+    _git(directory, '-c', 'user.name=Test', '-c', 'user.email=test@example.com',
+         'commit', '-m', 'Initial commit.')
+    with open(os.path.join(package_directory, 'sub', 'staged.py'), 'wb') as file:
+        file.write(b'from . import bar\n')
+    _git(directory, 'add', '.')
+    with open(os.path.join(package_directory, 'modified.py'), 'wb') as file:
+        file.write(b'import sys, os\n')
+    with open(os.path.join(package_directory, 'untracked.py'), 'wb') as file:
+        file.write(b'import re\n')
+    return package_directory
+
+
+def test_blob_ids_of_unchanged_files(repository):
+    blob_ids = get_unchanged_blob_ids(repository)
+
+    assert blob_ids == {
+        os.path.join(repository, '__init__.py'): ImportCache.hash_source(b''),
+        os.path.join(repository, 'committed.py'): ImportCache.hash_source(b'import os\n'),
+        os.path.join(repository, 'sub', 'staged.py'): ImportCache.hash_source(
+            b'from . import bar\n'),
+    }
+
+
+def test_directory_outside_git_repository(tmpdir, monkeypatch):
+    # Stop git looking for a repository above the temporary directory.
+    monkeypatch.setenv('GIT_CEILING_DIRECTORIES', str(tmpdir.dirpath()))
+
+    assert get_unchanged_blob_ids(str(tmpdir)) is None
@@ -1,5 +1,8 @@
 import os
+import shutil
+import time
 from typing import Tuple, List
+from unittest.mock import patch
 
 from layer_linter.dependencies.scanner import PackageScanner
 from layer_linter.module import SafeFilenameModule
@@ -46,6 +49,113 @@ class TestPackageScanner:
         for index, module in enumerate(sorted_modules):
             assert module.filename == sorted_expected_modules[index].filename
 
+    def test_modules_are_returned_in_stable_order(self):
+        package = SafeFilenameModule(
+            name='scannersuccess',
+            filename=os.path.join(self._get_package_directory('scannersuccess'), '__init__.py'),
+        )
+
+        modules = PackageScanner(package, max_workers=4).scan_for_modules()
+
+        # Depth first, with each package's modules before its subpackages, sorted by name.
+        assert [module.name for module in modules] == [
+            'scannersuccess',
+            'scannersuccess.four',
+            'scannersuccess.in',
+            'scannersuccess.in.class',
+            'scannersuccess.in.hyphenated-name',
+            'scannersuccess.one',
+            'scannersuccess.one.alpha',
+            'scannersuccess.one.beta',
+            'scannersuccess.one.gamma',
+            'scannersuccess.one.delta',
+            'scannersuccess.one.delta.green',
+            'scannersuccess.one.delta.red_blue',
+            'scannersuccess.two',
+            'scannersuccess.two.alpha',
+            'scannersuccess.two.beta',
+            'scannersuccess.two.gamma',
+        ]
+        assert PackageScanner(package, max_workers=1).scan_for_modules() == modules
+
+    def test_iter_modules(self):
+        package = SafeFilenameModule(
+            name='scannersuccess',
+            filename=os.path.join(self._get_package_directory('scannersuccess'), '__init__.py'),
+        )
+        scanner = PackageScanner(package)
+
+        assert list(scanner.iter_modules()) == scanner.scan_for_modules()
+
+    def test_excluded_directories_and_files(self):
+        package_directory = self._get_package_directory('scannersuccess')
+        package = SafeFilenameModule(
+            name='scannersuccess', filename=os.path.join(package_directory, '__init__.py'),
+        )
+        scanner = PackageScanner(
+            package,
+            exclude_directories=['delta', 'tw?'],
+            exclude_files=['alpha.py', 'one/gamma.py', '*-*'],
+        )
+
+        with patch.object(os, 'scandir', wraps=os.scandir) as mock_scandir:
+            modules = scanner.scan_for_modules()
+
+        assert [module.name for module in modules] == [
+            'scannersuccess',
+            'scannersuccess.four',
+            'scannersuccess.in',
+            'scannersuccess.in.class',
+            'scannersuccess.one',
+            'scannersuccess.one.beta',
+        ]
+        # Excluded directories should not be entered at all.
+        listed_directories = {call[0][0] for call in mock_scandir.call_args_list}
+        assert os.path.join(package_directory, 'two') not in listed_directories
+        assert os.path.join(package_directory, 'one', 'delta') not in listed_directories
+
+    def test_unchanged_directories_are_not_listed_again(self, tmpdir):
+        package_directory = self._copy_package_with_old_mtimes('scannersuccess', tmpdir)
+        package = SafeFilenameModule(
+            name='scannersuccess', filename=os.path.join(package_directory, '__init__.py'),
+        )
+        cache_dir = str(tmpdir.join('cache'))
+        modules = PackageScanner(package, cache_dir=cache_dir).scan_for_modules()
+
+        with patch.object(os, 'scandir', wraps=os.scandir) as mock_scandir:
+            rescanned_modules = PackageScanner(package, cache_dir=cache_dir).scan_for_modules()
+
+        assert rescanned_modules == modules
+        mock_scandir.assert_not_called()
+
+    def test_changed_directories_are_listed_again(self, tmpdir):
+        package_directory = self._copy_package_with_old_mtimes('scannersuccess', tmpdir)
+        package = SafeFilenameModule(
+            name='scannersuccess', filename=os.path.join(package_directory, '__init__.py'),
+        )
+        cache_dir = str(tmpdir.join('cache'))
+        PackageScanner(package, cache_dir=cache_dir).scan_for_modules()
+
+        new_module_directory = os.path.join(package_directory, 'two')
+        open(os.path.join(new_module_directory, 'delta.py'), 'w').close()
+        with patch.object(os, 'scandir', wraps=os.scandir) as mock_scandir:
+            modules = PackageScanner(package, cache_dir=cache_dir).scan_for_modules()
+
+        assert 'scannersuccess.two.delta' in [module.name for module in modules]
+        mock_scandir.assert_called_once_with(new_module_directory)
+
+    def _copy_package_with_old_mtimes(self, package_name: str, tmpdir) -> str:
+        """
+        Copy the package into the temporary directory, backdating the modification times
+        so that the directories aren't considered too recently modified to cache.
+        """
+        package_directory = str(tmpdir.join(package_name))
+        shutil.copytree(self._get_package_directory(package_name), package_directory)
+        old_time = time.time() - 60
+        for root, dirs, files in os.walk(package_directory):
+            os.utime(root, (old_time, old_time))
+        return package_directory
+
     def _get_package_directory(self, package_name: str) -> str:
         """
         Return absolute path to the package directory.
@@ -0,0 +1,142 @@
+from unittest import mock
+import os
+import time
+
+import pytest
+
+from layer_linter.dependencies import graph as graph_module
+from layer_linter.dependencies.analysis import DependencyAnalyzer
+from layer_linter.module import Module, SafeFilenameModule
+
+
+# Files must have been modified some time before the graph is built for their modification
+# times to be trusted.
+AN_HOUR_AGO = time.time() - 3600
+
+
+def write_module(package_directory, name, source, mtime=AN_HOUR_AGO):
+    filename = str(package_directory.join(name))
+    with open(filename, 'w') as file:
+        file.write(source)
+    os.utime(filename, (mtime, mtime))
+
+
+@pytest.fixture
+def package(tmpdir):
+    package_directory = tmpdir.mkdir('snapshotted')
+    write_module(package_directory, '__init__.py', '')
+    write_module(package_directory, 'one.py', 'from . import two\n')
+    write_module(package_directory, 'two.py', 'import os\n')
+    write_module(package_directory, 'three.py', 'import snapshotted.one\n')
+    return SafeFilenameModule('snapshotted', str(package_directory.join('__init__.py')))
+
+
+class TestGraphSnapshot:
+    def build_graph(self, package, cache_dir):
+        """
+        Return the graph, and the names of the modules that were analyzed to build it.
+        """
+        analyzers = []
+
+        def make_analyzer(**kwargs):
+            analyzer = DependencyAnalyzer(**kwargs)
+            analyzers.append(analyzer)
+            return analyzer
+
+        with mock.patch.object(graph_module, 'DependencyAnalyzer', side_effect=make_analyzer):
+            graph = graph_module.DependencyGraph(package, cache_dir=cache_dir)
+        analyzed_module_names = {
+            module.name for analyzer in analyzers for module in analyzer.modules
+        }
+        return graph, analyzed_module_names
+
+    def test_unchanged_modules_are_not_analyzed(self, package, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        self.build_graph(package, cache_dir)
+
+        graph, analyzed_module_names = self.build_graph(package, cache_dir)
+
+        assert analyzed_module_names == set()
+        assert graph.module_count == 4
+        assert graph.dependency_count == 2
+        assert graph.find_path(
+            downstream=Module('snapshotted.three'), upstream=Module('snapshotted.two'),
+        ) == (Module('snapshotted.three'), Module('snapshotted.one'), Module('snapshotted.two'))
+        assert Module('snapshotted.one') in graph
+        assert graph.get_descendants(Module('snapshotted')) == [
+            Module('snapshotted.one'), Module('snapshotted.three'), Module('snapshotted.two'),
+        ]
+
+    def test_changed_modules_are_analyzed_again(self, package, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        self.build_graph(package, cache_dir)
+        package_directory = tmpdir.join('snapshotted')
+        write_module(package_directory, 'one.py', 'import os\n', mtime=AN_HOUR_AGO + 1)
+        write_module(package_directory, 'two.py', 'from . import three\n', mtime=AN_HOUR_AGO + 1)
+
+        graph, analyzed_module_names = self.build_graph(package, cache_dir)
+
+        assert analyzed_module_names == {'snapshotted.one', 'snapshotted.two'}
+        assert graph.dependency_count == 2
+        assert graph.get_modules_directly_imported_by(Module('snapshotted.one')) == []
+        assert graph.find_path(
+            downstream=Module('snapshotted.two'), upstream=Module('snapshotted.one'),
+        ) == (Module('snapshotted.two'), Module('snapshotted.three'), Module('snapshotted.one'))
+
+        # The patched graph is saved in turn.
+        graph, analyzed_module_names = self.build_graph(package, cache_dir)
+
+        assert analyzed_module_names == set()
+        assert graph.get_modules_directly_imported_by(Module('snapshotted.two')) == [
+            Module('snapshotted.three'),
+        ]
+
+    def test_recently_modified_modules_are_analyzed_again(self, package, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        write_module(tmpdir.join('snapshotted'), 'two.py', '', mtime=time.time())
+        self.build_graph(package, cache_dir)
+
+        graph, analyzed_module_names = self.build_graph(package, cache_dir)
+
+        assert analyzed_module_names == {'snapshotted.two'}
+
+    def test_all_modules_are_analyzed_if_modules_are_added(self, package, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        self.build_graph(package, cache_dir)
+        write_module(tmpdir.join('snapshotted'), 'four.py', 'from .one import something\n')
+
+        graph, analyzed_module_names = self.build_graph(package, cache_dir)
+
+        assert analyzed_module_names == {
+            'snapshotted', 'snapshotted.one', 'snapshotted.two', 'snapshotted.three',
+            'snapshotted.four',
+        }
+        assert graph.dependency_count == 3
+
+    def test_unreadable_snapshot_is_ignored(self, package, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        self.build_graph(package, cache_dir)
+        for filename in os.listdir(cache_dir):
+            if filename.startswith('graph-'):
+                with open(os.path.join(cache_dir, filename), 'r+b') as file:
+                    file.truncate(100)
+
+        graph, analyzed_module_names = self.build_graph(package, cache_dir)
+
+        assert len(analyzed_module_names) == 4
+        assert graph.dependency_count == 2
+
+    def test_filenames_that_are_not_utf8(self, package, tmpdir):
+        cache_dir = str(tmpdir.join('cache'))
+        package_directory = os.path.dirname(package.filename)
+        filename = os.path.join(os.fsencode(package_directory), b'caf\xe9.py')
+        with open(filename, 'wb') as file:
+            file.write(b'from . import two\n')
+        os.utime(filename, (AN_HOUR_AGO, AN_HOUR_AGO))
+        self.build_graph(package, cache_dir)
+
+        graph, analyzed_module_names = self.build_graph(package, cache_dir)
+
+        assert analyzed_module_names == set()
+        assert graph.module_count == 5
+        assert graph.dependency_count == 3
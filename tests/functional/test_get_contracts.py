@@ -3,7 +3,8 @@ import sys
 
 import pytest
 
-from layer_linter.contract import get_contracts, Layer
+from layer_linter.contract import (
+    ContractParseError, get_contracts, get_exclude_patterns, Layer)
 from layer_linter.dependencies import ImportPath
 from layer_linter.module import Module
 
@@ -60,6 +61,35 @@ class TestGetContracts:
 
         assert str(e.value) == "Invalid container 'singlecontractfile.missing': no such package."
 
+    def test_exclude_section_is_not_a_contract(self):
+        self._initialize_test('layers_with_exclusions.yml')
+
+        contracts = get_contracts(self.filename_and_path, package_name='singlecontractfile')
+
+        assert [contract.name for contract in contracts] == ['Contract A']
+
+    def test_contract_named_exclude(self):
+        self._initialize_test('layers_with_exclude_contract.yml')
+
+        with pytest.raises(ContractParseError) as e:
+            get_contracts(self.filename_and_path, package_name='singlecontractfile')
+
+        assert str(e.value) == ("'exclude' is reserved for the directories and files to "
+                                "exclude, so it can't be the name of a contract.")
+
+    def test_exclude_patterns(self):
+        self._initialize_test('layers_with_exclusions.yml')
+
+        directories, files = get_exclude_patterns(self.filename_and_path)
+
+        assert directories == ['vendor', 'foo/generated']
+        assert files == ['*_pb2.py']
+
+    def test_no_exclude_patterns(self):
+        self._initialize_test()
+
+        assert get_exclude_patterns(self.filename_and_path) == ([], [])
+
     def _initialize_test(self, config_filename='layers.yml'):
         # Append the package directory to the path.
         dirname = os.path.dirname(__file__)
@@ -0,0 +1,130 @@
+import os
+import time
+
+from layer_linter.dependencies.cache import (
+    ImportCache, ScanManifest, read_json_file, write_json_file_atomically)
+
+
+OLD_MTIME_NS = int((time.time() - 60) * 1e9)
+
+
+class TestWriteJsonFileAtomically:
+    def test_round_trip(self, tmpdir):
+        filename = str(tmpdir.join('sub', 'data.json'))
+
+        write_json_file_atomically(filename, {'foo': [1, 2]})
+
+        assert read_json_file(filename) == {'foo': [1, 2]}
+        # No temporary files should be left behind.
+        assert os.listdir(str(tmpdir.join('sub'))) == ['data.json']
+
+    def test_read_missing_file(self, tmpdir):
+        assert read_json_file(str(tmpdir.join('missing.json'))) is None
+
+    def test_read_corrupt_file(self, tmpdir):
+        tmpdir.join('corrupt.json').write('{"foo": ')
+
+        assert read_json_file(str(tmpdir.join('corrupt.json'))) is None
+
+
+class TestScanManifest:
+    PACKAGE_DIRECTORY = os.path.join(os.sep, 'path', 'to', 'mypackage')
+    DIRECTORY = os.path.join(PACKAGE_DIRECTORY, 'one')
+    LISTING = (['__init__.py', 'alpha.py'], ['two'])
+
+    def test_listing_is_recalled_on_next_scan(self, tmpdir):
+        manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+        manifest.record_listing(self.DIRECTORY, OLD_MTIME_NS, self.LISTING)
+        manifest.save()
+
+        next_manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+
+        assert next_manifest.get_listing(self.DIRECTORY, OLD_MTIME_NS) == self.LISTING
+
+    def test_listing_is_not_recalled_if_mtime_changed(self, tmpdir):
+        manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+        manifest.record_listing(self.DIRECTORY, OLD_MTIME_NS, self.LISTING)
+        manifest.save()
+
+        next_manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+
+        assert next_manifest.get_listing(self.DIRECTORY, OLD_MTIME_NS + 1) is None
+
+    def test_recently_modified_directory_is_not_recorded(self, tmpdir):
+        manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+        recent_mtime_ns = int(time.time() * 1e9)
+        manifest.record_listing(self.DIRECTORY, recent_mtime_ns, self.LISTING)
+        manifest.save()
+
+        next_manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+
+        assert next_manifest.get_listing(self.DIRECTORY, recent_mtime_ns) is None
+
+    def test_manifests_are_separate_for_each_package(self, tmpdir):
+        manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+        manifest.record_listing(self.DIRECTORY, OLD_MTIME_NS, self.LISTING)
+        manifest.save()
+
+        other_manifest = ScanManifest(str(tmpdir), os.path.join(os.sep, 'path', 'to', 'other'))
+
+        assert other_manifest.get_listing(self.DIRECTORY, OLD_MTIME_NS) is None
+
+    def test_directories_not_recorded_are_dropped(self, tmpdir):
+        manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+        manifest.record_listing(self.DIRECTORY, OLD_MTIME_NS, self.LISTING)
+        manifest.save()
+        # Nothing recorded on the second scan, for example because the directory was removed.
+        ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY).save()
+
+        third_manifest = ScanManifest(str(tmpdir), self.PACKAGE_DIRECTORY)
+
+        assert third_manifest.get_listing(self.DIRECTORY, OLD_MTIME_NS) is None
+
+
+class TestImportCache:
+    RAW_IMPORTS = [(0, 'foo.bar', None), (2, 'baz', 'qux')]
+
+    def test_imports_are_recalled_on_next_run(self, tmpdir):
+        cache = ImportCache(str(tmpdir))
+        digest = ImportCache.hash_source(b'import foo.bar')
+        cache.set(digest, self.RAW_IMPORTS)
+        cache.save()
+
+        next_cache = ImportCache(str(tmpdir))
+
+        assert next_cache.get(digest) == self.RAW_IMPORTS
+        assert next_cache.get(ImportCache.hash_source(b'import other')) is None
+
+    def test_least_recently_used_entries_are_discarded(self, tmpdir):
+        cache = ImportCache(str(tmpdir), max_entries=2)
+        cache.set('a', [])
+        cache.set('b', [])
+        cache.get('a')
+        cache.set('c', [])
+        cache.save()
+
+        next_cache = ImportCache(str(tmpdir))
+
+        assert next_cache.get('a') == []
+        assert next_cache.get('b') is None
+        assert next_cache.get('c') == []
+
+    def test_entries_saved_by_other_runs_are_kept(self, tmpdir):
+        cache = ImportCache(str(tmpdir))
+        other_cache = ImportCache(str(tmpdir))
+        cache.set('a', self.RAW_IMPORTS)
+        other_cache.set('b', [])
+        other_cache.save()
+        cache.save()
+
+        next_cache = ImportCache(str(tmpdir))
+
+        assert next_cache.get('a') == self.RAW_IMPORTS
+        assert next_cache.get('b') == []
+
+    def test_file_is_not_written_if_nothing_added(self, tmpdir):
+        cache = ImportCache(str(tmpdir))
+        cache.get('a')
+        cache.save()
+
+        assert os.listdir(str(tmpdir)) == []
@@ -0,0 +1,172 @@
+import pytest
+
+from layer_linter.dependencies.engine import CompactGraphBuilder
+
+
+def build_graph(edges, node_count=None):
+    builder = CompactGraphBuilder()
+    builder.add_edges(edges)
+    if node_count is None:
+        node_count = max(max(edge) for edge in edges) + 1
+    return builder.build(node_count=node_count)
+
+
+class TestCompactGraph:
+    def test_successors_and_predecessors(self):
+        graph = build_graph([(0, 2), (0, 1), (2, 1), (3, 0)], node_count=5)
+
+        assert [list(graph.get_successors(node)) for node in range(5)] == [
+            [2, 1], [], [1], [0], [],
+        ]
+        assert [list(graph.get_predecessors(node)) for node in range(5)] == [
+            [3], [0, 2], [0], [], [],
+        ]
+
+    def test_duplicate_edges_are_ignored(self):
+        graph = build_graph([(0, 1), (1, 2), (0, 1)])
+
+        assert graph.edge_count == 2
+        assert list(graph.get_successors(0)) == [1]
+
+    def test_add_successors(self):
+        builder = CompactGraphBuilder()
+        builder.add_successors(2, [0, 1, 0])
+        builder.add_edge(0, 2)
+        builder.add_successors(2, [3, 1])
+
+        graph = builder.build(node_count=4)
+
+        assert builder.edge_count == graph.edge_count == 4
+        assert [list(graph.get_successors(node)) for node in range(4)] == [
+            [2], [], [0, 1, 3], [],
+        ]
+        assert [list(graph.get_predecessors(node)) for node in range(4)] == [
+            [2], [2], [0], [2],
+        ]
+
+    def test_topological_indexes(self):
+        # 1, 2 and 3 form a cycle, as do 4 and 5.
+        graph = build_graph([(0, 1), (1, 2), (2, 3), (3, 1), (3, 4), (4, 5), (5, 4), (6, 4)])
+
+        indexes = list(graph.get_topological_indexes())
+
+        assert indexes[1] == indexes[2] == indexes[3]
+        assert indexes[4] == indexes[5]
+        assert len(set(indexes)) == 4
+        assert indexes[0] < indexes[1] < indexes[4]
+        assert indexes[6] < indexes[4]
+
+    def test_topological_order(self):
+        # 1 and 2 form a cycle.
+        graph = build_graph([(3, 1), (1, 2), (2, 1), (2, 0)])
+
+        order = list(graph.get_topological_order())
+
+        assert order[0] == 3
+        assert set(order[1:3]) == {1, 2}
+        assert order[3] == 0
+        # The order is only worked out once.
+        assert graph.get_topological_order() is graph.get_topological_order()
+
+    def test_topological_indexes_of_long_chain(self):
+        # Long enough to exceed the recursion limit, if the components were found recursively.
+        graph = build_graph([(node, node + 1) for node in range(5000)])
+
+        assert list(graph.get_topological_indexes()) == list(range(5001))
+        assert graph.find_shortest_path(5000, 0) is None
+        assert len(graph.find_shortest_path(0, 5000)) == 5001
+
+    @pytest.mark.parametrize('source, target, expected_path', (
+        (0, 1, [0, 1]),
+        (0, 4, [0, 1, 2, 4]),
+        (4, 0, None),
+        (3, 3, [3]),
+        # A shortcut makes the path shorter.
+        (0, 5, [0, 3, 5]),
+        # Cycles don't prevent the search from finishing.
+        (5, 0, None),
+        (6, 5, [6, 5]),
+        (7, 6, [7, 5, 6]),
+    ))
+    def test_find_shortest_path(self, source, target, expected_path):
+        graph = build_graph([
+            (0, 1), (1, 2), (2, 4), (2, 3), (3, 5), (0, 3),
+            (5, 6), (6, 5), (6, 7), (7, 5),
+        ])
+
+        assert graph.find_shortest_path(source, target) == expected_path
+
+    def test_excluded_edges_are_not_used(self):
+        graph = build_graph([(0, 1), (1, 2), (0, 3), (3, 4), (4, 2)])
+
+        assert graph.find_shortest_path(0, 2) == [0, 1, 2]
+        assert graph.find_shortest_path(0, 2, excluded_edges={(1, 2)}) == [0, 3, 4, 2]
+        assert graph.find_shortest_path(0, 2, excluded_edges={(1, 2), (0, 3)}) is None
+
+    @pytest.mark.parametrize('sources, targets, expected_paths', (
+        ([0], {4}, {4: [0, 1, 2, 4]}),
+        # Each path starts from the nearest source.
+        ([0, 3], {4, 5}, {4: [0, 1, 2, 4], 5: [3, 5]}),
+        # Paths don't continue on through other targets.
+        ([0], {2, 4}, {2: [0, 1, 2]}),
+        ([0], {1, 5}, {1: [0, 1], 5: [0, 3, 5]}),
+        # A source that is also a target is a path on its own.
+        ([0, 6], {6}, {6: [6]}),
+        ([4], {0, 1}, {}),
+    ))
+    def test_find_shortest_paths(self, sources, targets, expected_paths):
+        graph = build_graph([
+            (0, 1), (1, 2), (2, 4), (2, 3), (3, 5), (0, 3),
+            (5, 6), (6, 5), (6, 7), (7, 5),
+        ])
+
+        assert graph.find_shortest_paths(sources, targets) == expected_paths
+
+    def test_find_shortest_paths_avoids_excluded_nodes_and_edges(self):
+        graph = build_graph([(0, 1), (1, 2), (0, 3), (3, 4), (4, 2), (3, 5)])
+
+        assert graph.find_shortest_paths([0], {2, 5}) == {2: [0, 1, 2], 5: [0, 3, 5]}
+        assert graph.find_shortest_paths([0], {2, 5}, excluded_nodes={1}) == {
+            2: [0, 3, 4, 2], 5: [0, 3, 5],
+        }
+        # Excluded nodes can still be the start or end of a path.
+        assert graph.find_shortest_paths([1], {2}, excluded_nodes={1, 2}) == {2: [1, 2]}
+        assert graph.find_shortest_paths(
+            [0], {2, 5}, excluded_nodes={1}, excluded_edges={(3, 5)}
+        ) == {2: [0, 3, 4, 2]}
+
+    def test_find_reachable_groups(self):
+        # 1, 2 and 3 form a cycle.
+        graph = build_graph([(0, 1), (1, 2), (2, 3), (3, 1), (3, 4), (5, 6)], node_count=8)
+
+        reachable_groups = graph.find_reachable_groups([
+            [0], [2, 5], [4], [6], [3], [7], [],
+        ])
+
+        assert reachable_groups == [
+            {0, 1, 2, 4}, {1, 2, 3, 4}, {2}, {3}, {1, 2, 4}, {5}, set(),
+        ]
+
+    def test_find_ancestors(self):
+        # 1 and 2 form a cycle.
+        graph = build_graph([(0, 1), (1, 2), (2, 1), (3, 2), (4, 0), (5, 6)])
+
+        assert graph.find_ancestors([2]) == {0, 1, 3, 4}
+        assert graph.find_ancestors([0, 4]) == set()
+        assert graph.find_ancestors([0, 6]) == {4, 5}
+        assert graph.find_ancestors([]) == set()
+
+    def test_replace_successors(self):
+        graph = build_graph([(0, 1), (1, 2), (2, 0), (3, 2)], node_count=5)
+
+        new_graph = graph.replace_successors({1: [3, 4, 3], 3: []})
+
+        assert new_graph.edge_count == 4
+        assert [list(new_graph.get_successors(node)) for node in range(5)] == [
+            [1], [3, 4], [0], [], [],
+        ]
+        assert [list(new_graph.get_predecessors(node)) for node in range(5)] == [
+            [2], [0], [], [1], [1],
+        ]
+        # The original graph is unchanged.
+        assert list(graph.get_successors(1)) == [2]
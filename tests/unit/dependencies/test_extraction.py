@@ -0,0 +1,134 @@
+import io
+import sys
+
+import pytest
+
+from layer_linter.dependencies.extraction import (
+    _extract_imports_lexically, _extract_imports_with_ast, extract_imports,
+    extract_leading_imports)
+
+
+@pytest.mark.parametrize('source, expected_raw_imports', (
+    (b'', []),
+    (b'x = 1\n', []),
+    (b'import a\n', [(0, 'a', None)]),
+    (b'import a.b as c, d\n', [(0, 'a.b', None), (0, 'd', None)]),
+    (b'import a . b\n', [(0, 'a.b', None)]),
+    (b'from a import b, c as d  # Comment.\n', [(0, 'a', 'b'), (0, 'a', 'c')]),
+    (b'from . import b\n', [(1, '', 'b')]),
+    (b'from .import b\n', [(1, '', 'b')]),
+    (b'from ...a.b import c\n', [(3, 'a.b', 'c')]),
+    (b'from a import *\n', [(0, 'a', '*')]),
+    (b'from a import (\n    b,  # Comment (with brackets).\n    c,\n)\n',
+     [(0, 'a', 'b'), (0, 'a', 'c')]),
+    (b'from a import b, \\\n    c\n', [(0, 'a', 'b'), (0, 'a', 'c')]),
+    (b'import a.\\\n    b\n', [(0, 'a.b', None)]),
+    (b'x = 1; import a; from b import c\n', [(0, 'a', None), (0, 'b', 'c')]),
+    (b'def f():\n    try:\n        import a\n    except ImportError:\n        a = None\n',
+     [(0, 'a', None)]),
+    (b'class A:\n    if True: from a import b\n', [(0, 'a', 'b')]),
+    (b'"""\nimport a\n"""\n# import b\nx = "import c"\nreimport = __import__("d")\n', []),
+    (b"x = f'{y!r} {{'\nimport a\n", [(0, 'a', None)]),
+    (b'\xef\xbb\xbfimport a\r\nimport b\r\n', [(0, 'a', None), (0, 'b', None)]),
+    (b'# -*- coding: latin-1 -*-\nx = "\xe9"\nimport a\n', [(0, 'a', None)]),
+))
+def test_extract_imports(source, expected_raw_imports):
+    assert _extract_imports_lexically(source) == expected_raw_imports
+    assert _extract_imports_with_ast(source) == expected_raw_imports
+    assert extract_imports(source) == expected_raw_imports
+
+
+@pytest.mark.parametrize('source', (
+    # The keyword is on a continued line.
+    b'from a \\\n    import b\n',
+    # The module name is split over lines.
+    b'from a.\\\n    b import c\n',
+    # A non-ASCII identifier.
+    'import caf\u00e9\n'.encode('utf-8'),
+    # An f-string that could contain its own quotes from Python 3.12.
+    b'x = f"{y["z"]}"\nimport a\n',
+))
+def test_ambiguous_sources_are_not_scanned(source):
+    assert _extract_imports_lexically(source) is None
+
+
+def test_ambiguous_sources_are_parsed():
+    assert extract_imports(b'from a \\\n    import b\n') == [(0, 'a', 'b')]
+
+
+def test_imports_nested_in_compound_statements_are_found():
+    source = b'''
+import a
+class A:
+    import b
+    async def f(self):
+        async with x:
+            import c
+        for y in z:
+            while True:
+                import d
+            else:
+                import e
+        try:
+            import f
+        except ImportError:
+            import g
+        else:
+            import h
+        finally:
+            import i
+    if x:
+        pass
+    elif y:
+        import j
+    else:
+        import k
+import l
+'''
+    expected_raw_imports = [(0, name, None) for name in 'abcdefghijkl']
+
+    assert _extract_imports_with_ast(source) == expected_raw_imports
+    assert _extract_imports_lexically(source) == expected_raw_imports
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10), reason='Match statements need Python 3.10.')
+def test_imports_nested_in_match_statements_are_found():
+    source = b'match x:\n    case 1:\n        import a\n    case _:\n        import b\n'
+
+    assert _extract_imports_with_ast(source) == [(0, 'a', None), (0, 'b', None)]
+
+
+def test_leading_imports_are_found_without_reading_the_rest_of_the_file():
+    file = io.BytesIO(b'''# -*- coding: utf-8 -*-
+"""
+Docstring.
+
+import a
+"""
+from __future__ import annotations
+__all__ = [
+    'TABLE',
+]
+import b
+try:
+    from c import d
+except ImportError:
+    d = None
+if TYPE_CHECKING:
+    import e
+TABLE = [
+    1,
+]
+import f
+def g():
+    import h
+''')
+
+    assert extract_leading_imports(file) == [
+        (0, '__future__', 'annotations'),
+        (0, 'b', None),
+        (0, 'c', 'd'),
+        (0, 'e', None),
+    ]
+    # Reading should stop at the first line that isn't part of the import section.
+    assert file.readline() == b'    1,\n'
@@ -1,24 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, Mock
 
 from layer_linter.dependencies import graph as graph_module
 from layer_linter.dependencies.path import ImportPath
+from layer_linter.dependencies.table import ModuleTable
 from layer_linter.module import Module
 
 
 class DependencyAnalyzerStub:
-    def __init__(self, modules, package):
+    def __init__(self, modules, package, **kwargs):
+        self.modules = list(modules)
+        self.module_table = ModuleTable(module.name for module in self.modules)
         self.import_paths = [
             ImportPath(importer=Module('foo.two'), imported=Module('foo.one')),
             ImportPath(importer=Module('foo.three'), imported=Module('foo.two')),
             ImportPath(importer=Module('foo.four'), imported=Module('foo.three')),
         ]
 
-    def determine_import_paths(self):
-        return self.import_paths
+    def iter_imported_ids(self):
+        ids = self.module_table.ids
+        for module in self.modules:
+            yield ids[module.name], [
+                ids[import_path.imported.name] for import_path in self.import_paths
+                if import_path.importer == module
+            ]
 
 
 class PackageScannerStub:
-    def __init__(self, package):
+    def __init__(self, package, **kwargs):
         self.modules = [
             Module('foo'),
             Module('foo.one'),
@@ -26,10 +35,12 @@ class PackageScannerStub:
             Module('foo.one.beta'),
             Module('foo.one.beta.green'),
             Module('foo.two'),
+            Module('foo.three'),
+            Module('foo.four'),
         ]
 
-    def scan_for_modules(self):
-        return self.modules
+    def iter_modules(self):
+        return iter(self.modules)
 
 
 @patch.object(graph_module, 'DependencyAnalyzer', new=DependencyAnalyzerStub)
@@ -87,6 +98,141 @@ class TestDependencyGraph:
 
         assert path is None
 
+    def test_compiled_ignore_paths_are_ignored(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        ignore_paths = graph.compile_import_paths([
+            ImportPath(importer=Module('foo.three'), imported=Module('foo.two')),
+            # Paths between modules that aren't in the graph are left out.
+            ImportPath(importer=Module('foo.five'), imported=Module('foo.four')),
+        ])
+
+        assert len(ignore_paths.edges) == 1
+        assert graph.find_path(
+            upstream=Module('foo.one'), downstream=Module('foo.four'),
+            ignore_paths=ignore_paths) is None
+        assert graph.find_path(
+            upstream=Module('foo.one'), downstream=Module('foo.two'),
+            ignore_paths=ignore_paths) == (Module('foo.two'), Module('foo.one'))
+
+    def test_find_shortest_paths(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        one, two, three, four = (
+            graph.get_module_id(Module(name))
+            for name in ('foo.one', 'foo.two', 'foo.three', 'foo.four')
+        )
+
+        paths = graph.find_shortest_paths(downstream_ids=[four, three], upstream_ids=[one])
+
+        assert paths == {one: (three, two, one)}
+
+    def test_find_shortest_paths_avoids_modules(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        one, two, three, four = (
+            graph.get_module_id(Module(name))
+            for name in ('foo.one', 'foo.two', 'foo.three', 'foo.four')
+        )
+
+        paths = graph.find_shortest_paths(
+            downstream_ids=[four], upstream_ids=[one, three], avoid_ids=[two],
+        )
+
+        assert paths == {three: (four, three)}
+
+    def test_find_shortest_paths_ignore_paths_are_ignored(self):
+        ignore_paths = (
+            ImportPath(
+                importer=Module('foo.three'), imported=Module('foo.two'),
+            ),
+        )
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        paths = graph.find_shortest_paths(
+            downstream_ids=[graph.get_module_id(Module('foo.four'))],
+            upstream_ids=[graph.get_module_id(Module('foo.one'))],
+            ignore_paths=ignore_paths,
+        )
+
+        assert paths == {}
+
+    def test_repeated_searches_are_cached(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+        one, two, three, four = (
+            graph.get_module_id(Module(name))
+            for name in ('foo.one', 'foo.two', 'foo.three', 'foo.four')
+        )
+        ignore_paths = graph.compile_import_paths([
+            ImportPath(importer=Module('foo.three'), imported=Module('foo.two')),
+        ])
+
+        first_paths = graph.find_shortest_paths(downstream_ids=[four], upstream_ids=[one, two])
+        first_paths.clear()
+        second_paths = graph.find_shortest_paths(downstream_ids=[four], upstream_ids=[two, one])
+        ignored_paths = graph.find_shortest_paths(
+            downstream_ids=[four], upstream_ids=[one, two],
+            ignore_paths=[ImportPath(importer=Module('foo.three'), imported=Module('foo.two'))],
+        )
+        compiled_ignored_paths = graph.find_shortest_paths(
+            downstream_ids=[four], upstream_ids=[one, two], ignore_paths=ignore_paths,
+        )
+
+        assert second_paths == {two: (four, three, two)}
+        assert ignored_paths == compiled_ignored_paths == {}
+        assert graph.search_count == 4
+        # The results don't depend on the order of the upstream modules, or whether ignored
+        # paths were compiled.
+        assert graph.search_cache_hit_count == 2
+
+    def test_concurrent_searches_are_counted(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+        downstream, upstream = Module('foo.four'), Module('foo.one')
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            paths = list(executor.map(
+                lambda _: graph.find_path(downstream=downstream, upstream=upstream),
+                range(100),
+            ))
+
+        assert len(set(paths)) == 1
+        assert graph.search_count == 100
+        # Threads that did the first search at the same time each miss the cache.
+        assert 96 <= graph.search_cache_hit_count <= 99
+
+    def test_least_recently_used_searches_are_dropped(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+        one, two, three = (Module(name) for name in ('foo.one', 'foo.two', 'foo.three'))
+
+        with patch.object(graph_module.DependencyGraph, 'MAX_CACHED_SEARCHES', 2):
+            graph.find_path(downstream=three, upstream=one)
+            graph.find_path(downstream=three, upstream=two)
+            graph.find_path(downstream=three, upstream=one)
+            # This search replaces the one from three to two, the least recently used.
+            graph.find_path(downstream=two, upstream=one)
+            assert graph.search_cache_hit_count == 1
+
+            graph.find_path(downstream=three, upstream=one)
+            graph.find_path(downstream=three, upstream=two)
+
+        assert graph.search_count == 6
+        assert graph.search_cache_hit_count == 2
+
+    def test_find_depended_on_groups(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        depended_on_groups = graph.find_depended_on_groups([
+            [graph.get_module_id(Module(name)) for name in group]
+            for group in (
+                ['foo.four'],
+                ['foo.one', 'foo.one.alpha'],
+                ['foo.three', 'foo.two'],
+                [],
+            )
+        ])
+
+        assert depended_on_groups == [{0, 1, 2}, {1}, {1, 2}, set()]
+
     def test_get_descendants_nested(self):
 
         graph = graph_module.DependencyGraph(self.PACKAGE)
@@ -102,21 +248,76 @@ class TestDependencyGraph:
 
         assert graph.get_descendants(Module('foo.two')) == []
 
+    def test_get_descendants_in_order(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        assert graph.get_descendants(Module('foo')) == [
+            Module('foo.four'),
+            Module('foo.one'),
+            Module('foo.one.alpha'),
+            Module('foo.one.beta'),
+            Module('foo.one.beta.green'),
+            Module('foo.three'),
+            Module('foo.two'),
+        ]
+
+    def test_get_descendants_ignores_names_with_same_prefix(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        # Module foo.one is not within foo.on.
+        assert graph.get_descendants(Module('foo.on')) == []
+
     def test_module_count(self):
         graph = graph_module.DependencyGraph(self.PACKAGE)
 
         # Assert the module count is the number of modules returned by
-        # PackageScanner.scan_for_modules.
-        assert graph.module_count == 6
+        # PackageScanner.iter_modules.
+        assert graph.module_count == 8
 
     def test_dependency_count(self):
         graph = graph_module.DependencyGraph(self.PACKAGE)
 
-        # Should be number of ImportPaths returned by DependencyAnalyzer.determine_import_paths.
+        # Should be number of imports returned by DependencyAnalyzer.iter_imported_ids.
         assert graph.dependency_count == 3
 
+    def test_get_module_id(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        module_id = graph.get_module_id(Module('foo.one.alpha'))
+
+        assert graph.get_module(module_id) == Module('foo.one.alpha')
+        assert graph.get_module_id(Module('foo.one.omega')) is None
+
+    def test_get_descendant_ids(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        assert graph.get_descendant_ids(Module('foo.one.beta')) == [
+            graph.get_module_id(Module('foo.one.beta.green')),
+        ]
+
+    def test_get_modules_that_directly_import(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        assert graph.get_modules_that_directly_import(Module('foo.two')) == [
+            Module('foo.three'),
+        ]
+        assert graph.get_modules_that_directly_import(Module('foo.four')) == []
+        assert graph.get_modules_that_directly_import(Module('foo.nonexistent')) == []
+
+    def test_find_downstream_modules(self):
+        graph = graph_module.DependencyGraph(self.PACKAGE)
+
+        assert graph.find_downstream_modules([Module('foo.one')]) == {
+            Module('foo.two'), Module('foo.three'), Module('foo.four'),
+        }
+        assert graph.find_downstream_modules([Module('foo.three'), Module('foo.nonexistent')]) == {
+            Module('foo.four'),
+        }
+        assert graph.find_downstream_modules([Module('foo.four')]) == set()
+
     def test_contains(self):
         graph = graph_module.DependencyGraph(self.PACKAGE)
 
         assert Module('foo.one.alpha') in graph
         assert Module('foo.one.omega') not in graph
+        assert 'foo.one.alpha' not in graph
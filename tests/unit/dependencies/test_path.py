@@ -1,3 +1,7 @@
+import pickle
+
+import pytest
+
 from layer_linter.dependencies.path import ImportPath
 from layer_linter.module import Module
 
@@ -26,3 +30,17 @@ class TestImportPath:
 
         assert hash(a) == hash(b)
         assert hash(a) != hash(c)
+
+    def test_is_immutable(self):
+        import_path = ImportPath(importer=Module('foo'), imported=Module('bar'))
+
+        with pytest.raises(AttributeError):
+            import_path.importer = Module('baz')
+
+    def test_pickle(self):
+        import_path = ImportPath(importer=Module('foo'), imported=Module('bar'))
+
+        unpickled = pickle.loads(pickle.dumps(import_path))
+
+        assert unpickled == import_path
+        assert unpickled.importer is import_path.importer
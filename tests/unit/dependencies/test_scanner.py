@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from layer_linter.dependencies.scanner import _iterate_in_background
+
+
+class TestIterateInBackground:
+    def test_items_are_yielded_in_order(self):
+        items = list(_iterate_in_background(range(100), batch_size=7, max_pending_batches=2))
+
+        assert items == list(range(100))
+
+    def test_empty_iterable(self):
+        assert list(_iterate_in_background([], batch_size=7, max_pending_batches=2)) == []
+
+    def test_exception_is_raised_in_caller(self):
+        def generate():
+            yield 1
+            yield 2
+            raise ValueError('Scanning failed.')
+
+        iterator = _iterate_in_background(generate(), batch_size=1, max_pending_batches=1)
+
+        assert next(iterator) == 1
+        assert next(iterator) == 2
+        with pytest.raises(ValueError, match='Scanning failed.'):
+            next(iterator)
+
+    def test_background_thread_stops_when_caller_stops(self):
+        finished = threading.Event()
+
+        def generate():
+            try:
+                for i in range(1000):
+                    yield i
+            finally:
+                finished.set()
+
+        iterator = _iterate_in_background(generate(), batch_size=1, max_pending_batches=1)
+        assert next(iterator) == 0
+        iterator.close()
+
+        assert finished.wait(timeout=5)
@@ -0,0 +1,112 @@
+import os
+
+from layer_linter.dependencies.engine import CompactGraphBuilder
+from layer_linter.dependencies.snapshot import GraphSnapshot
+
+
+def make_snapshot(module_names, edges):
+    builder = CompactGraphBuilder()
+    builder.add_edges(edges)
+    return GraphSnapshot(module_names, builder.build(node_count=len(module_names)))
+
+
+class TestGraphSnapshot:
+    def test_save_and_load(self, tmpdir):
+        filename = str(tmpdir.join('graph.bin'))
+        module_filename = str(tmpdir.join('module.py'))
+        tmpdir.join('module.py').write('')
+        os.utime(module_filename, (1000000, 1000000))
+        # Non-ASCII names take up more bytes than characters.
+        module_names = ['foo', 'foo.café', 'foo.two']
+        snapshot = make_snapshot(module_names, [(0, 1), (2, 1), (1, 2)])
+        snapshot.save(filename, 'key', filenames=[module_filename] * 3,
+                      git_blob_ids={module_filename: 'ab' * 20}, started_ns=10 ** 19)
+
+        loaded = GraphSnapshot.load(filename, 'key')
+
+        assert loaded.module_names == module_names
+        assert loaded.graph.edge_count == 3
+        assert [list(loaded.graph.get_successors(node)) for node in range(3)] == [
+            [1], [2], [1],
+        ]
+        assert [list(loaded.graph.get_predecessors(node)) for node in range(3)] == [
+            [], [0, 2], [1],
+        ]
+        assert loaded.graph.find_shortest_path(0, 2) == [0, 1, 2]
+        assert loaded.is_file_unchanged(0, module_filename)
+        assert loaded.is_file_unchanged(0, module_filename, blob_id='ab' * 20)
+
+    def test_changed_files(self, tmpdir):
+        filename = str(tmpdir.join('graph.bin'))
+        module_filename = str(tmpdir.join('module.py'))
+        tmpdir.join('module.py').write('')
+        os.utime(module_filename, (1000000, 1000000))
+        make_snapshot(['foo'], []).save(filename, 'key', filenames=[module_filename],
+                                        git_blob_ids={module_filename: 'ab' * 20},
+                                        started_ns=10 ** 19)
+        loaded = GraphSnapshot.load(filename, 'key')
+
+        tmpdir.join('module.py').write('import os')
+        os.utime(module_filename, (1000000, 1000000))
+
+        assert not loaded.is_file_unchanged(0, module_filename)
+        assert not loaded.is_file_unchanged(0, module_filename, blob_id='cd' * 20)
+        # A matching blob id means the contents are the same, whatever the file's size.
+        assert loaded.is_file_unchanged(0, module_filename, blob_id='ab' * 20)
+        assert not loaded.is_file_unchanged(0, str(tmpdir.join('missing.py')))
+
+    def test_moved_modules(self, tmpdir):
+        filename = str(tmpdir.join('graph.bin'))
+        module_filename = str(tmpdir.join('foo.py'))
+        tmpdir.join('foo.py').write('')
+        tmpdir.mkdir('foo').join('__init__.py').write('')
+        init_filename = str(tmpdir.join('foo', '__init__.py'))
+        for each_filename in (module_filename, init_filename):
+            os.utime(each_filename, (1000000, 1000000))
+        make_snapshot(['foo'], []).save(filename, 'key', filenames=[module_filename],
+                                        git_blob_ids={module_filename: 'ab' * 20},
+                                        started_ns=10 ** 19)
+        loaded = GraphSnapshot.load(filename, 'key')
+
+        # The same contents resolve relative imports differently in a package's __init__.py.
+        assert not loaded.is_file_unchanged(0, init_filename)
+        assert not loaded.is_file_unchanged(0, init_filename, blob_id='ab' * 20)
+
+    def test_recently_modified_files_are_not_trusted(self, tmpdir):
+        filename = str(tmpdir.join('graph.bin'))
+        module_filename = str(tmpdir.join('module.py'))
+        tmpdir.join('module.py').write('')
+        mtime_ns = os.stat(module_filename).st_mtime_ns
+        make_snapshot(['foo'], []).save(filename, 'key', filenames=[module_filename],
+                                        git_blob_ids={}, started_ns=mtime_ns + 10 ** 9)
+
+        loaded = GraphSnapshot.load(filename, 'key')
+
+        assert not loaded.is_file_unchanged(0, module_filename)
+
+    def test_snapshot_with_another_key_is_not_loaded(self, tmpdir):
+        filename = str(tmpdir.join('graph.bin'))
+        make_snapshot(['foo'], []).save(filename, 'key', filenames=['foo.py'],
+                                        git_blob_ids={}, started_ns=0)
+
+        assert GraphSnapshot.load(filename, 'another key') is None
+
+    def test_missing_or_invalid_snapshot_is_not_loaded(self, tmpdir):
+        filename = str(tmpdir.join('graph.bin'))
+
+        assert GraphSnapshot.load(filename, 'key') is None
+
+        tmpdir.join('graph.bin').write('')
+        assert GraphSnapshot.load(filename, 'key') is None
+
+        tmpdir.join('graph.bin').write_binary(b'LLGRAPH\0' + bytes(100))
+        assert GraphSnapshot.load(filename, 'key') is None
+
+    def test_truncated_snapshot_is_not_loaded(self, tmpdir):
+        filename = str(tmpdir.join('graph.bin'))
+        make_snapshot(['foo', 'bar'], [(0, 1)]).save(filename, 'key', filenames=['a', 'b'],
+                                                     git_blob_ids={}, started_ns=0)
+        with open(filename, 'r+b') as file:
+            file.truncate(os.path.getsize(filename) - 8)
+
+        assert GraphSnapshot.load(filename, 'key') is None
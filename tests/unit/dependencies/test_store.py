@@ -0,0 +1,41 @@
+import pytest
+
+from layer_linter.dependencies.store import SqliteImportStore
+
+
+class TestSqliteImportStore:
+    def test_raw_imports_are_returned_in_order(self):
+        store = SqliteImportStore()
+        store.append([(0, 'foo.one', None), (1, '', 'two')])
+        store.append([])
+        store.append([(2, 'three', 'alpha'), (0, 'foo.one', None)])
+        store.append([])
+
+        assert len(store) == 4
+        assert list(store) == [
+            [(0, 'foo.one', None), (1, '', 'two')],
+            [],
+            [(2, 'three', 'alpha'), (0, 'foo.one', None)],
+            [],
+        ]
+
+    def test_placeholders_can_be_set(self):
+        store = SqliteImportStore()
+        store.append([])
+        store.append([(0, 'foo.one', None)])
+        store.append([])
+
+        store[0] = [(1, '', 'two')]
+        store[2] = [(0, 'foo.two', None)]
+
+        assert list(store) == [
+            [(1, '', 'two')],
+            [(0, 'foo.one', None)],
+            [(0, 'foo.two', None)],
+        ]
+
+    def test_setting_position_out_of_range(self):
+        store = SqliteImportStore()
+
+        with pytest.raises(IndexError):
+            store[0] = [(1, '', 'two')]
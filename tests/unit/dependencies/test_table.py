@@ -0,0 +1,30 @@
+from layer_linter.dependencies.table import ModuleTable
+from layer_linter.module import Module
+
+
+class TestModuleTable:
+    def test_ids_are_assigned_in_order(self):
+        table = ModuleTable(['foo', 'foo.one'])
+
+        assert table.add('foo.two') == 2
+        assert table.names == ['foo', 'foo.one', 'foo.two']
+        assert len(table) == 3
+
+    def test_adding_existing_name_returns_its_id(self):
+        table = ModuleTable(['foo', 'foo.one'])
+
+        assert table.add('foo') == 0
+        assert len(table) == 2
+
+    def test_get_id(self):
+        table = ModuleTable(['foo', 'foo.one'])
+
+        assert table.get_id('foo.one') == 1
+        assert table.get_id('foo.two') is None
+        assert 'foo.one' in table
+        assert 'foo.two' not in table
+
+    def test_get_module(self):
+        table = ModuleTable(['foo', 'foo.one'])
+
+        assert table.get_module(1) is Module('foo.one')
@@ -33,10 +33,12 @@ def test_normalise_verbosity(verbosity, is_quiet, expected_result):
 @patch.object(cmdline, 'get_report_class')
 @patch.object(cmdline, 'DependencyGraph')
 @patch.object(cmdline, '_get_package')
+@patch.object(cmdline, '_get_exclude_patterns', return_value=([], []))
 @patch.object(cmdline, '_get_contracts')
+@patch.object(cmdline, '_read_config')
 @patch.object(cmdline, 'logging')
-def test_debug(mock_logging, mock_get_contracts, mock_get_package, mock_graph,
-               mock_get_report_class, is_debug):
+def test_debug(mock_logging, mock_read_config, mock_get_contracts, mock_get_exclude_patterns,
+               mock_get_package, mock_graph, mock_get_report_class, is_debug):
 
     _main('foo', is_debug=is_debug)
 
@@ -44,3 +46,97 @@ def test_debug(mock_logging, mock_get_contracts, mock_get_package, mock_graph,
         mock_logging.basicConfig.assert_called_once_with(level=mock_logging.DEBUG)
     else:
         mock_logging.basicConfig.assert_not_called()
+
+
+@patch.object(cmdline, 'get_report_class')
+@patch.object(cmdline, 'DependencyGraph')
+@patch.object(cmdline, '_get_package')
+@patch.object(cmdline, '_get_exclude_patterns', return_value=(['generated'], ['*_pb2.py']))
+@patch.object(cmdline, '_get_contracts', return_value=[])
+@patch.object(cmdline, '_read_config')
+def test_exclude_patterns_are_combined(mock_read_config, mock_get_contracts,
+                                       mock_get_exclude_patterns, mock_get_package, mock_graph,
+                                       mock_get_report_class):
+    _main('foo', exclude_directories=['vendor'], exclude_files=['*_test.py'])
+
+    mock_graph.assert_called_once_with(
+        package=mock_get_package.return_value,
+        cache_dir=None,
+        exclude_directories=['generated', 'vendor'],
+        exclude_files=['*_pb2.py', '*_test.py'],
+        jobs=1,
+        use_git_index=False,
+        use_bytecode=False,
+        max_file_size=None,
+        skip_large_files=False,
+        low_memory=False,
+    )
+
+
+@patch.object(cmdline, 'get_report_class')
+@patch.object(cmdline, 'DependencyGraph')
+@patch.object(cmdline, '_get_package')
+@patch.object(cmdline, 'read_contracts_file', return_value={
+    'exclude': {'directories': ['generated']},
+})
+def test_contracts_file_is_parsed_once(mock_read_contracts_file, mock_get_package, mock_graph,
+                                       mock_get_report_class):
+    _main('foo', config_filename='layers.yml')
+
+    mock_read_contracts_file.assert_called_once_with('layers.yml')
+    assert mock_graph.call_args[1]['exclude_directories'] == ['generated']
+
+
+@patch.object(cmdline, 'ConsolePrinter')
+@patch.object(cmdline, 'DependencyGraph')
+@patch.object(cmdline, '_get_package')
+def test_jobs_must_be_positive(mock_get_package, mock_graph, mock_console_printer):
+    result = _main('foo', jobs=0)
+
+    assert result == cmdline.EXIT_STATUS_ERROR
+    mock_console_printer.print_error.assert_called_once_with(
+        'The number of jobs must be at least 1.')
+    mock_graph.assert_not_called()
+
+
+@patch.object(cmdline, 'ConsolePrinter')
+@patch.object(cmdline, 'DependencyGraph')
+@patch.object(cmdline, '_get_package')
+def test_git_index_requires_cache_dir(mock_get_package, mock_graph, mock_console_printer):
+    result = _main('foo', use_git_index=True)
+
+    assert result == cmdline.EXIT_STATUS_ERROR
+    mock_console_printer.print_error.assert_called_once_with(
+        'Using the git index requires a cache directory.')
+    mock_graph.assert_not_called()
+
+
+@patch.object(cmdline, 'get_report_class')
+@patch.object(cmdline, 'DependencyGraph')
+@patch.object(cmdline, '_get_package')
+@patch.object(cmdline, '_get_exclude_patterns', return_value=([], []))
+@patch.object(cmdline, '_get_contracts', return_value=[])
+@patch.object(cmdline, '_read_config')
+def test_max_file_size_is_converted_to_bytes(mock_read_config, mock_get_contracts,
+                                             mock_get_exclude_patterns, mock_get_package,
+                                             mock_graph, mock_get_report_class):
+    _main('foo', max_file_size=5000, skip_large_files=True)
+
+    assert mock_graph.call_args[1]['max_file_size'] == 5120000
+    assert mock_graph.call_args[1]['skip_large_files'] is True
+
+
+@pytest.mark.parametrize('max_file_size, skip_large_files, expected_error', (
+    (-1, False, 'The maximum file size must not be negative.'),
+    (None, True, 'Skipping large files requires a maximum file size.'),
+))
+@patch.object(cmdline, 'ConsolePrinter')
+@patch.object(cmdline, 'DependencyGraph')
+@patch.object(cmdline, '_get_package')
+def test_invalid_max_file_size(mock_get_package, mock_graph, mock_console_printer,
+                               max_file_size, skip_large_files, expected_error):
+    result = _main('foo', max_file_size=max_file_size, skip_large_files=skip_large_files)
+
+    assert result == cmdline.EXIT_STATUS_ERROR
+    mock_console_printer.print_error.assert_called_once_with(expected_error)
+    mock_graph.assert_not_called()
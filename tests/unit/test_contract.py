@@ -27,10 +27,14 @@ class StubDependencyGraph:
                         }
                         ...
                      }
-                    A call to .find_path(downstream=downstream_module, upstream=upstream_module)
-                    will return the supplied path, if it is present in the dictionary. Otherwise,
-                    the stub will return None.
+                    Instead of a single path, a list of alternative paths may be supplied.
+                    A call to .find_shortest_paths(downstream_ids, upstream_ids) will
+                    return, for each upstream module, the shortest of the supplied paths to it
+                    from any of the downstream modules, leaving out any paths via the modules
+                    to avoid.
         modules:    List of all modules in the graph.
+
+    Each module is its own id.
     Usage:
 
         graph = StubDependencyGraph(
@@ -55,6 +59,7 @@ class StubDependencyGraph:
         self.descendants = descendants if descendants else {}
         self.paths = paths if paths else {}
         self.modules = modules if modules else []
+        self.searched_modules = []
 
     def get_descendants(self, module):
         try:
@@ -62,11 +67,48 @@ class StubDependencyGraph:
         except KeyError:
             return []
 
-    def find_path(self, downstream, upstream, ignore_paths=None):
-        try:
-            return self.paths[upstream][downstream]
-        except KeyError:
-            return None
+    def get_descendant_ids(self, module):
+        return self.get_descendants(module)
+
+    def get_module_id(self, module):
+        return module
+
+    def get_module(self, module_id):
+        return module_id
+
+    def compile_import_paths(self, import_paths):
+        return import_paths
+
+    def find_depended_on_groups(self, id_groups):
+        module_groups = [list(group) for group in id_groups]
+        return [
+            {
+                other_index for other_index, other_group in enumerate(module_groups)
+                if other_group is group or any(
+                    downstream_module in self.paths.get(upstream_module, {})
+                    for downstream_module in group for upstream_module in other_group
+                )
+            }
+            for group in module_groups
+        ]
+
+    def find_shortest_paths(self, downstream_ids, upstream_ids, ignore_paths=None,
+                            avoid_ids=None):
+        downstream_modules = list(downstream_ids)
+        self.searched_modules.extend(downstream_modules)
+        avoid_modules = set(avoid_ids) if avoid_ids else set()
+        shortest_paths = {}
+        for upstream_module in upstream_ids:
+            paths = [
+                path
+                for downstream_module, paths in self.paths.get(upstream_module, {}).items()
+                if downstream_module in downstream_modules
+                for path in (paths if isinstance(paths[0], list) else [paths])
+                if not avoid_modules.intersection(path[1:-1])
+            ]
+            if paths:
+                shortest_paths[upstream_module] = min(paths, key=len)
+        return shortest_paths
 
     def __contains__(self, item):
         return item in self.modules
@@ -258,6 +300,126 @@ class TestContractCheck:
             [Module('foo.two'), Module('foo.three')],
         ]
 
+    def test_broken_contract_via_other_layer_and_around_it(self):
+        # If there is a longer illegal import that doesn't go via another layer, we do want to
+        # report it, even though the shortest path goes via another layer.
+
+        contract = Contract(
+            name='Foo contract',
+            containers=(
+                'foo',
+            ),
+            layers=(
+                Layer('three'),
+                Layer('two'),
+                Layer('one'),
+            ),
+        )
+        graph = StubDependencyGraph(
+            descendants={},
+            paths={
+                Module('foo.three'): {
+                    Module('foo.two'): [Module('foo.two'), Module('foo.three')],
+                    Module('foo.one'): [
+                        [Module('foo.one'), Module('foo.two'), Module('foo.three')],
+                        [Module('foo.one'), Module('foo.utils'), Module('foo.helpers'),
+                         Module('foo.three')],
+                    ],
+                },
+                Module('foo.two'): {
+                    Module('foo.one'): [Module('foo.one'), Module('foo.two')],
+                },
+            },
+            modules=[
+                Module('foo.one'),
+                Module('foo.two'),
+                Module('foo.three'),
+            ]
+        )
+
+        contract.check_dependencies(graph)
+
+        assert contract.illegal_dependencies == [
+            [Module('foo.one'), Module('foo.two')],
+            [Module('foo.one'), Module('foo.utils'), Module('foo.helpers'), Module('foo.three')],
+            [Module('foo.two'), Module('foo.three')],
+        ]
+
+    def test_only_layers_that_depend_on_downstream_layers_are_searched(self):
+        contract = Contract(
+            name='Foo contract',
+            containers=(
+                'foo',
+            ),
+            layers=(
+                Layer('three'),
+                Layer('two'),
+                Layer('one'),
+            ),
+        )
+        graph = StubDependencyGraph(
+            descendants={
+                Module('foo.two'): [Module('foo.two.alpha')],
+            },
+            paths={
+                Module('foo.three'): {
+                    Module('foo.two.alpha'): [Module('foo.two.alpha'), Module('foo.three')],
+                },
+                Module('foo.one'): {
+                    # An allowed path.
+                    Module('foo.three'): [Module('foo.three'), Module('foo.one')],
+                },
+            },
+            modules=[
+                Module('foo.one'),
+                Module('foo.two'),
+                Module('foo.two.alpha'),
+                Module('foo.three'),
+            ]
+        )
+
+        contract.check_dependencies(graph)
+
+        assert contract.illegal_dependencies == [
+            [Module('foo.two.alpha'), Module('foo.three')],
+        ]
+        assert graph.searched_modules == [Module('foo.two'), Module('foo.two.alpha')]
+
+    def test_every_module_importing_a_downstream_module_is_reported(self):
+        contract = Contract(
+            name='Foo contract',
+            containers=(
+                'foo',
+            ),
+            layers=(
+                Layer('two'),
+                Layer('one'),
+            ),
+        )
+        graph = StubDependencyGraph(
+            descendants={
+                Module('foo.one'): [Module('foo.one.alpha'), Module('foo.one.beta')],
+            },
+            paths={
+                Module('foo.two'): {
+                    Module('foo.one'): [Module('foo.one'), Module('foo.two')],
+                    Module('foo.one.alpha'): [Module('foo.one.alpha'), Module('foo.two')],
+                    Module('foo.one.beta'): [
+                        Module('foo.one.beta'), Module('foo.another'), Module('foo.two'),
+                    ],
+                },
+            },
+            modules=[Module('foo.one'), Module('foo.two')]
+        )
+
+        contract.check_dependencies(graph)
+
+        assert contract.illegal_dependencies == [
+            [Module('foo.one'), Module('foo.two')],
+            [Module('foo.one.alpha'), Module('foo.two')],
+            [Module('foo.one.beta'), Module('foo.another'), Module('foo.two')],
+        ]
+
     @pytest.mark.parametrize('longer_first', (True, False))
     def test_only_shortest_violation_is_reported(self, longer_first):
         contract = Contract(
@@ -0,0 +1,61 @@
+import pickle
+
+import pytest
+
+from layer_linter.module import Module, SafeFilenameModule
+
+
+class TestModule:
+    def test_repr(self):
+        assert repr(Module('foo.bar')) == '<Module: foo.bar>'
+
+    def test_modules_are_interned(self):
+        assert Module('foo.bar') is Module('foo.bar')
+        assert Module('foo.bar') is not Module('foo.baz')
+
+    def test_equals(self):
+        assert Module('foo') == Module('foo')
+        assert Module('foo') != Module('bar')
+        # Non-Module instances should not be treated as equal.
+        assert Module('foo') != 'foo'
+
+    def test_hash(self):
+        assert hash(Module('foo')) == hash('foo')
+
+    def test_is_immutable(self):
+        module = Module('foo')
+
+        with pytest.raises(AttributeError):
+            module.name = 'bar'
+        with pytest.raises(AttributeError):
+            del module.name
+        assert module.name == 'foo'
+
+    def test_pickle_returns_interned_module(self):
+        module = Module('foo')
+
+        assert pickle.loads(pickle.dumps(module)) is module
+
+
+class TestSafeFilenameModule:
+    def test_is_not_interned(self):
+        module = SafeFilenameModule('foo', '/path/to/foo.py')
+
+        assert module is not SafeFilenameModule('foo', '/path/to/foo.py')
+        assert module is not Module('foo')
+
+    def test_equals_module_with_same_name(self):
+        module = SafeFilenameModule('foo', '/path/to/foo.py')
+
+        assert module == Module('foo')
+        assert hash(module) == hash(Module('foo'))
+        assert module.filename == '/path/to/foo.py'
+
+    def test_pickle(self):
+        module = SafeFilenameModule(name='foo', filename='/path/to/foo.py')
+
+        unpickled = pickle.loads(pickle.dumps(module))
+
+        assert isinstance(unpickled, SafeFilenameModule)
+        assert unpickled.filename == '/path/to/foo.py'
+        assert unpickled == module